@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+
+class AcquisitionResult(NamedTuple):
+    transcript: Any
+    source: Optional[str]
+    metadata: Any
+    timings: Dict[str, float]
+
+
+def _timed(name: str, func: Callable[..., Any], timings: Dict[str, float]):
+    def run(*args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = time.perf_counter() - started
+
+    return run
+
+
+def _consume_result(task: "asyncio.Task") -> None:
+    # A speculative download that nobody awaits must not log "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+async def acquire_transcript(
+    fetch_metadata: Callable[[], Any],
+    fetch_transcript: Callable[[], Any],
+    download_audio: Callable[[], Optional[str]],
+    transcribe_audio: Callable[[str], Any],
+    audio_deadline: Optional[float] = None,
+    run_blocking: Callable[..., Awaitable[Any]] = asyncio.to_thread,
+    discard_audio: Optional[Callable[[str], None]] = None,
+) -> AcquisitionResult:
+    """Fetch metadata and the transcript concurrently, falling back to audio.
+
+    The blocking callables run through `run_blocking(func, *args)`, worker
+    threads by default. `fetch_transcript` and `transcribe_audio` return
+    None on failure, `download_audio` returns the audio file path or None.
+    If `audio_deadline` (seconds) passes before the transcript API answers,
+    the audio download starts speculatively so the fallback path does not
+    have to wait for the API to fail first. Pass None to only download once
+    the transcript API has failed. When the transcript API wins anyway, the
+    speculative file is handed to `discard_audio` as soon as it lands.
+    """
+    timings: Dict[str, float] = {}
+    metadata_task = asyncio.create_task(
+        run_blocking(_timed("metadata", fetch_metadata, timings))
+    )
+    transcript_task = asyncio.create_task(
+        run_blocking(_timed("transcript_api", fetch_transcript, timings))
+    )
+    audio_task: Optional[asyncio.Task] = None
+    # The download thread cannot be interrupted; whichever side finishes last deletes the file
+    audio_claim = threading.Lock()
+    audio_state: Dict[str, Any] = {"abandoned": False, "path": None}
+
+    def download() -> Optional[str]:
+        path = download_audio()
+        with audio_claim:
+            if not audio_state["abandoned"]:
+                audio_state["path"] = path
+                return path
+        if path and discard_audio is not None:
+            discard_audio(path)
+        return None
+
+    def start_audio_download() -> asyncio.Task:
+        task = asyncio.create_task(
+            run_blocking(_timed("audio_download", download, timings))
+        )
+        task.add_done_callback(_consume_result)
+        return task
+
+    if audio_deadline is not None:
+        done, _ = await asyncio.wait({transcript_task}, timeout=audio_deadline)
+        if not done:
+            audio_task = start_audio_download()
+
+    transcript = await transcript_task
+    source = "youtube" if transcript else None
+
+    if transcript and audio_task is not None:
+        with audio_claim:
+            audio_state["abandoned"] = True
+            finished = audio_state["path"]
+        if finished and discard_audio is not None:
+            await run_blocking(discard_audio, finished)
+
+    if not transcript:
+        if audio_task is None:
+            audio_task = start_audio_download()
+        audio_file = await audio_task
+        if audio_file:
+            transcript = await run_blocking(
+                _timed("transcription", transcribe_audio, timings), audio_file
+            )
+            source = "assemblyai" if transcript else None
+
+    metadata = await metadata_task
+    return AcquisitionResult(transcript, source, metadata, timings)
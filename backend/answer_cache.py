@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """Per-video cache of LLM answers, matched by query-embedding similarity.
+
+    A lookup returns the answer of the most similar cached question for the
+    same video if its cosine similarity is at least `threshold`, so
+    paraphrases of a question already asked skip the LLM. `maxsize` bounds
+    the number of answers across all videos (least recently used go first)
+    and `ttl` is in seconds; `ttl=None` keeps answers until evicted.
+    """
+
+    def __init__(self, threshold: float = 0.92, maxsize: int = 4096, ttl: Optional[float] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # (video_id, question) -> (unit vector or None, answer, stored_at), in LRU order
+        self._data: "OrderedDict[Tuple[Hashable, str], Tuple[Optional[np.ndarray], Any, float]]" = (
+            OrderedDict()
+        )
+        # video_id -> (questions, stacked unit vectors); rebuilt lazily after changes
+        self._matrices: Dict[Hashable, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def _matrix(self, video_id: Hashable) -> Tuple[List[str], np.ndarray]:
+        if video_id not in self._matrices:
+            # Answers stored without a vector only serve exact lookups
+            questions = [
+                q for (v, q), item in self._data.items() if v == video_id and item[0] is not None
+            ]
+            vectors = [self._data[(video_id, q)][0] for q in questions]
+            self._matrices[video_id] = (
+                questions,
+                np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32),
+            )
+        return self._matrices[video_id]
+
+    def _drop(self, key: Tuple[Hashable, str]) -> None:
+        del self._data[key]
+        self._matrices.pop(key[0], None)
+
+    def get(self, video_id: Hashable, query_vector: Sequence[float]) -> Optional[Any]:
+        """Answer cached for the closest question above the threshold, if any."""
+        query = _unit(query_vector)
+        with self._lock:
+            questions, matrix = self._matrix(video_id)
+            if questions:
+                similarities = matrix @ query
+                for position in np.argsort(-similarities):
+                    if similarities[position] < self.threshold:
+                        break
+                    key = (video_id, questions[position])
+                    _, answer, stored_at = self._data[key]
+                    if self._expired(stored_at):
+                        self._drop(key)
+                        continue
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def get_exact(self, video_id: Hashable, question: str) -> Optional[Any]:
+        """Answer cached for this exact (normalized) question, without an embedding."""
+        key = (video_id, question)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self._expired(item[2]):
+                self._drop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(
+        self,
+        video_id: Hashable,
+        question: str,
+        query_vector: Optional[Sequence[float]],
+        answer: Any,
+    ) -> None:
+        """Store an answer; without a vector it is only found by `get_exact`."""
+        with self._lock:
+            key = (video_id, question)
+            vector = None if query_vector is None else _unit(query_vector)
+            self._data[key] = (vector, answer, time.monotonic())
+            self._data.move_to_end(key)
+            self._matrices.pop(video_id, None)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+
+    def invalidate(self, video_id: Hashable) -> int:
+        """Forget every answer for a video; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._data if key[0] == video_id]
+            for key in keys:
+                del self._data[key]
+            self._matrices.pop(video_id, None)
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
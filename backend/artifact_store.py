@@ -0,0 +1,64 @@
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+from state import SQLiteState, StateBackend
+
+
+class ArtifactStore:
+    """Generated artifacts (summaries, quizzes, ...) in a shared state backend.
+
+    Entries are keyed by (video_id, kind, prompt version, model), so a
+    worker never serves an artifact made by another prompt version or
+    model. Writing an artifact deletes the video's other versions of that
+    kind, so bumping a prompt version or switching models leaves no stale
+    rows behind. Values are JSON. A path opens a SQLite backend, which
+    every worker process on the node can share.
+    """
+
+    def __init__(self, state: Union[str, StateBackend]):
+        self.state = SQLiteState(state) if isinstance(state, str) else state
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(video_id: str, kind: str, version: Any, model: str) -> str:
+        return f"artifact:{video_id}:{kind}:{version}:{model}"
+
+    def get(self, video_id: str, kind: str, version: Any, model: str) -> Optional[Any]:
+        raw = self.state.get(self.key(video_id, kind, version, model))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)["value"]
+
+    def put(self, video_id: str, kind: str, version: Any, model: str, value: Any) -> None:
+        record = {"value": value, "created_at": time.time()}
+        key = self.key(video_id, kind, version, model)
+        self.state.set(key, json.dumps(record).encode("utf-8"))
+        # The new entry lands before the old ones go, so a reader always finds one
+        for stale in self.state.keys(f"artifact:{video_id}:{kind}:"):
+            if stale != key:
+                self.state.delete(stale)
+
+    def delete(self, video_id: str, kind: Optional[str] = None) -> None:
+        """Drop every version of a video's artifacts (of one `kind`, if given)."""
+        if kind is None:
+            self.state.delete_prefix(f"artifact:{video_id}:")
+        else:
+            self.state.delete_prefix(f"artifact:{video_id}:{kind}:")
+
+    def stats(self) -> Dict[str, Any]:
+        # Counters only: counting entries would scan the whole backend
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,73 @@
+"""Compare the segment-aware chunker with the previous RecursiveCharacterTextSplitter.
+
+Usage: python bench_chunking.py [segments ...]
+"""
+
+import random
+import sys
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from chunking import chunk_segments
+from segments import TranscriptSegments
+
+WORDS = "the a lecture model data function value gradient loss network layer".split()
+
+
+def synthetic_segments(n, seed=0):
+    rng = random.Random(seed)
+    start = 0.0
+    entries = []
+    for _ in range(n):
+        duration = rng.uniform(1.5, 6.0)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))
+        entries.append({"start": start, "duration": duration, "text": text})
+        start += duration
+    return entries
+
+
+def timed(func, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(sizes):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1500,
+        chunk_overlap=200,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+    print(f"{'segments':>9} {'splitter':>10} {'s':>8} {'chunks':>7} {'timed':>6}")
+    for n in sizes:
+        entries = synthetic_segments(n)
+
+        def legacy():
+            full_text = ""
+            for entry in entries:
+                minutes = int(entry["start"] // 60)
+                seconds = int(entry["start"] % 60)
+                full_text += f"[{minutes:02d}:{seconds:02d}] {entry['text']} "
+            return splitter.split_text(full_text)
+
+        def segment_aware():
+            return chunk_segments(
+                TranscriptSegments.from_entries(entries),
+                chunk_size=1500,
+                chunk_overlap=200,
+            )
+
+        legacy_time, legacy_chunks = timed(legacy)
+        new_time, new_chunks = timed(segment_aware)
+        print(f"{n:>9} {'recursive':>10} {legacy_time:>8.3f} {len(legacy_chunks):>7} {'no':>6}")
+        print(f"{n:>9} {'segments':>10} {new_time:>8.3f} {len(new_chunks):>7} {'yes':>6}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 50_000, 200_000])
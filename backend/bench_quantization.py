@@ -0,0 +1,84 @@
+"""Memory per video and recall@7 of quantized indexes against the flat index.
+
+Vectors are synthetic: each video is a cluster of chunk embeddings around
+its own topic direction, normalised like text-embedding-004 output.
+Re-ranking re-scores RERANK_FACTOR x k candidates with the float32
+vectors, which the app reads from the on-disk embedding cache, so it
+costs no index memory. Videos under PQ_MIN_TRAINING_POINTS chunks build
+SQ8 instead of PQ.
+
+Usage: python bench_quantization.py [videos] [chunks_per_video]
+"""
+
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from quantization import build_index, exact_distances
+
+DIM = 768
+K = 7
+RERANK_FACTOR = 4
+
+
+def synthetic_library(videos, chunks, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((videos, DIM)).astype(np.float32)
+    noise = rng.standard_normal((videos, chunks, DIM)).astype(np.float32)
+    vectors = topics[:, None, :] + 0.6 * noise
+    vectors /= np.linalg.norm(vectors, axis=2, keepdims=True)
+    return vectors
+
+
+def recall_at_k(exact, approx):
+    return np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exact, approx)])
+
+
+def search(index, vectors, queries, rerank):
+    if not rerank:
+        return index.search(queries, K)[1]
+    distances, candidates = index.search(queries, K * RERANK_FACTOR)
+    found = []
+    for query, ids, approximate in zip(queries, candidates, distances):
+        rescored = exact_distances(query, [vectors[i] for i in ids], approximate)
+        found.append([ids[i] for i in np.argsort(rescored)[:K]])
+    return found
+
+
+def main(videos=50, chunks=200):
+    library = synthetic_library(videos, chunks)
+    rng = np.random.default_rng(1)
+    configs = [
+        ("flat", False),
+        ("sq8", False),
+        ("sq8", True),
+        ("pq", False),
+        ("pq", True),
+    ]
+    print(f"{videos} videos x {chunks} chunks, dim {DIM}, k={K}")
+    print(f"{'index':>10} {'bytes/video':>12} {'build s':>8} {'recall@7':>9}")
+    for kind, rerank in configs:
+        total_bytes = 0
+        recalls = []
+        started = time.perf_counter()
+        for vectors in library:
+            queries = vectors[rng.choice(chunks, 10, replace=False)]
+            queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+            exact = faiss.IndexFlatL2(DIM)
+            exact.add(vectors)
+            index = build_index(vectors, kind)
+            total_bytes += len(faiss.serialize_index(index))
+            recalls.append(
+                recall_at_k(exact.search(queries, K)[1], search(index, vectors, queries, rerank))
+            )
+        name = kind + ("+rerank" if rerank else "")
+        print(
+            f"{name:>10} {total_bytes // videos:>12} "
+            f"{time.perf_counter() - started:>8.2f} {np.mean(recalls):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,74 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; keeps numbers and identifiers like `get_user_id`."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents, as an in-memory inverted index.
+
+    Postings map each term to `(document position, term frequency)` pairs, so
+    a query only touches the documents that contain one of its terms.
+    """
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        for position, document in enumerate(documents):
+            tokens = tokenize(document)
+            self.doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self.postings[term].append((position, frequency))
+        self.postings = dict(self.postings)
+        self.avg_length = (
+            sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def nbytes(self) -> int:
+        # Rough CPython footprint: a tuple per posting plus a dict slot and list per term
+        postings = sum(len(p) for p in self.postings.values())
+        return postings * 72 + len(self.postings) * 160 + len(self.doc_lengths) * 36
+
+    def idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self) - n + 0.5) / (n + 0.5))
+
+    def search(self, query: str, k: int = 7) -> List[Tuple[int, float]]:
+        """Top `k` (document position, score) pairs, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for position, frequency in postings:
+                norm = 1 - self.b + self.b * self.doc_lengths[position] / self.avg_length
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: int = 60, with_scores: bool = False
+) -> List[Any]:
+    """Fuse several best-first rankings of ids with RRF (score = sum 1 / (k + rank)).
+
+    Returns ids best first, or `(id, score)` pairs with `with_scores=True`.
+    """
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused if with_scores else [item for item, _ in fused]
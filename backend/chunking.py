@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, NamedTuple
+
+from segments import TranscriptSegments, format_timestamp
+
+
+class TranscriptChunk(NamedTuple):
+    text: str
+    start: float
+    end: float
+
+
+def _pieces(segments: TranscriptSegments, max_chars: int):
+    """Yield (start, end, rendered_text) per segment, splitting oversized ones.
+
+    A segment whose rendered text exceeds `max_chars` (long AssemblyAI
+    utterances, legacy single-segment transcripts) is cut on whitespace and
+    its time span is interpolated by character position.
+    """
+    for i in range(len(segments)):
+        start = float(segments.starts[i])
+        end = segments.end(i)
+        text = segments.segment_text(i)
+        rendered = f"[{format_timestamp(start)}] {text} "
+        if len(rendered) <= max_chars:
+            yield start, end, rendered
+            continue
+
+        words = text.split()
+        span = max(end - start, 0.0)
+        total = max(len(text), 1)
+        consumed = 0
+        piece: List[str] = []
+        piece_len = 0
+        piece_start = start
+        for word in words:
+            if piece and piece_len + len(word) + 1 > max_chars - 10:
+                piece_end = start + span * consumed / total
+                yield piece_start, piece_end, f"[{format_timestamp(piece_start)}] {' '.join(piece)} "
+                piece, piece_len, piece_start = [], 0, piece_end
+            piece.append(word)
+            piece_len += len(word) + 1
+            consumed += len(word) + 1
+        if piece:
+            yield piece_start, end, f"[{format_timestamp(piece_start)}] {' '.join(piece)} "
+
+
+def chunk_segments(
+    segments: TranscriptSegments, chunk_size: int = 1500, chunk_overlap: int = 200
+) -> List[TranscriptChunk]:
+    """Split a transcript into chunks on segment boundaries in one linear pass.
+
+    Chunk text is the legacy `[MM:SS] text ` rendering of whole segments, at
+    most `chunk_size` characters. Consecutive chunks share trailing segments
+    worth at most `chunk_overlap` characters. Each chunk carries the start
+    and end time (seconds) of the segments it covers.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+    pieces = list(_pieces(segments, chunk_size))
+    chunks: List[TranscriptChunk] = []
+    n = len(pieces)
+    first = 0
+    while first < n:
+        last = first
+        length = len(pieces[first][2])
+        while last + 1 < n and length + len(pieces[last + 1][2]) <= chunk_size:
+            last += 1
+            length += len(pieces[last][2])
+
+        chunks.append(
+            TranscriptChunk(
+                text="".join(p[2] for p in pieces[first : last + 1]).rstrip(),
+                start=pieces[first][0],
+                end=max(pieces[last][1], pieces[last][0]),
+            )
+        )
+        if last + 1 >= n:
+            break
+
+        # Step back over trailing segments that fit in the overlap budget
+        next_first = last + 1
+        overlap = 0
+        while next_first - 1 > first and overlap + len(pieces[next_first - 1][2]) <= chunk_overlap:
+            next_first -= 1
+            overlap += len(pieces[next_first][2])
+        first = next_first
+
+    return chunks
+
+
+def chunk_metadatas(chunks: List[TranscriptChunk]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "source": "transcript",
+            "chunk": i,
+            "total_chunks": len(chunks),
+            "start": chunk.start,
+            "end": chunk.end,
+        }
+        for i, chunk in enumerate(chunks)
+    ]
@@ -0,0 +1,88 @@
+import math
+from typing import List, NamedTuple, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+
+class ContextSpan(NamedTuple):
+    text: str
+    start: float
+    end: float
+    first: int
+    last: int
+    score: float
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def merge_overlapping(previous: str, following: str, max_overlap: int) -> str:
+    """Join two consecutive chunks, dropping the segments they share.
+
+    Consecutive chunks repeat whole `[MM:SS] text` segments, so the shared
+    part is the longest prefix of `following` ending on a segment boundary
+    (or at its end) that `previous` ends with, up to `max_overlap` chars.
+    """
+    limit = min(len(following), max_overlap)
+    cut = following.rfind(" [", 0, limit + 1) if limit < len(following) else len(following)
+    while cut > 0:
+        if previous.endswith(following[:cut]):
+            return previous + following[cut:]
+        cut = following.rfind(" [", 0, cut)
+    return f"{previous} {following}"
+
+
+def build_context(
+    hits: Sequence[Tuple[Document, float]], token_budget: int, max_overlap: int = 400
+) -> List[ContextSpan]:
+    """Merge retrieved chunks into contiguous spans that fit a token budget.
+
+    Hits on the same or adjacent chunks (by `metadata["chunk"]`) become one
+    span with their overlap removed. Spans are taken best score first while
+    they fit in `token_budget`; the best span is always kept, cut to the
+    budget if it is larger on its own.
+    """
+    by_position = {}
+    for doc, score in hits:
+        position = doc.metadata["chunk"]
+        if position not in by_position or score > by_position[position][1]:
+            by_position[position] = (doc, score)
+
+    spans: List[ContextSpan] = []
+    for position in sorted(by_position):
+        doc, score = by_position[position]
+        if spans and position == spans[-1].last + 1:
+            span = spans[-1]
+            spans[-1] = ContextSpan(
+                text=merge_overlapping(span.text, doc.page_content, max_overlap),
+                start=span.start,
+                end=doc.metadata.get("end", span.end),
+                first=span.first,
+                last=position,
+                score=max(span.score, score),
+            )
+        else:
+            spans.append(
+                ContextSpan(
+                    text=doc.page_content,
+                    start=doc.metadata.get("start", 0.0),
+                    end=doc.metadata.get("end", 0.0),
+                    first=position,
+                    last=position,
+                    score=score,
+                )
+            )
+
+    selected: List[ContextSpan] = []
+    used = 0
+    for span in sorted(spans, key=lambda span: span.score, reverse=True):
+        tokens = estimate_tokens(span.text)
+        if not selected and tokens > token_budget:
+            selected.append(span._replace(text=span.text[: token_budget * 4]))
+            break
+        if used + tokens <= token_budget:
+            selected.append(span)
+            used += tokens
+    return selected
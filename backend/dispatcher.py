@@ -0,0 +1,236 @@
+import asyncio
+import itertools
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from cache import TTLCache
+from sharding import HashRing, request_video_id
+
+# Headers that describe one connection and must not be forwarded
+HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+    "content-length",
+}
+
+
+def _forwardable(headers) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP}
+
+
+def create_dispatcher(
+    workers: List[str],
+    replicas: int = 128,
+    client: Optional[httpx.AsyncClient] = None,
+) -> FastAPI:
+    """Thin front for sharding mode: forwards each request to the worker owning its video.
+
+    Requests naming a video (`/videos/{id}/...`, or `video_id` / `video_url`
+    in a JSON body) go to its owner on a consistent-hash ring of `workers`;
+    the rest are spread round-robin. Job ids are not tied to a video, so
+    `/jobs/{id}` is sent to whichever worker knows the job. `/search/` and
+    `DELETE /videos/{id}` go to every worker, because each one's global
+    index holds the videos it processed: search results are merged by
+    score, and a delete also reaches a worker that indexed the video
+    before a rebalance. Responses, including server-sent event streams,
+    are relayed as they arrive.
+    `PUT /shard/workers` changes the membership and tells every worker
+    the new ring, so only the videos whose owner changed are paged out.
+    """
+    ring = HashRing(workers, replicas=replicas)
+    client = client or httpx.AsyncClient(timeout=None)
+    turns = itertools.count()
+    job_workers = TTLCache(maxsize=10000, ttl=3600)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+
+    def any_worker() -> Optional[str]:
+        nodes = ring.nodes
+        return nodes[next(turns) % len(nodes)] if nodes else None
+
+    async def job_worker(job_id: str) -> Optional[str]:
+        worker = job_workers.get(job_id)
+        if worker is not None:
+            return worker
+        for worker in ring.nodes:
+            try:
+                response = await client.get(f"{worker}/jobs/{job_id}")
+            except httpx.HTTPError:
+                continue
+            if response.status_code == 200:
+                job_workers.set(job_id, worker)
+                return worker
+        return None
+
+    async def forward(worker: str, request: Request, body: bytes):
+        upstream = client.build_request(
+            request.method,
+            f"{worker}{request.url.path}",
+            params=request.query_params,
+            headers=_forwardable(request.headers),
+            content=body,
+        )
+        response = await client.send(upstream, stream=True)
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers=_forwardable(response.headers),
+            background=BackgroundTask(response.aclose),
+        )
+
+    async def broadcast(request: Request, body: bytes) -> Dict[str, Any]:
+        """Send a request to every worker: worker -> response, or the error reaching it."""
+        nodes = ring.nodes
+        replies = await asyncio.gather(
+            *(
+                client.request(
+                    request.method,
+                    f"{worker}{request.url.path}",
+                    params=request.query_params,
+                    headers=_forwardable(request.headers),
+                    content=body,
+                )
+                for worker in nodes
+            ),
+            return_exceptions=True,
+        )
+        for worker, reply in zip(nodes, replies):
+            if isinstance(reply, Exception):
+                print(f"{request.method} {request.url.path} on {worker} failed: {reply}")
+        return dict(zip(nodes, replies))
+
+    def no_workers() -> JSONResponse:
+        return JSONResponse(content={"detail": "No workers configured."}, status_code=503)
+
+    def unreachable(replies: Dict[str, Any]) -> List[str]:
+        return [worker for worker, reply in replies.items() if isinstance(reply, Exception)]
+
+    @app.post("/search/")
+    async def search(request: Request):
+        if not ring.nodes:
+            return no_workers()
+        body = await request.body()
+        replies = await broadcast(request, body)
+        answered = [reply for reply in replies.values() if isinstance(reply, httpx.Response)]
+        ok = [reply.json() for reply in answered if reply.status_code == 200]
+        if not ok:
+            if answered:
+                # e.g. a missing query: every worker says the same
+                return JSONResponse(content=answered[0].json(), status_code=answered[0].status_code)
+            return JSONResponse(content={"detail": "No worker could search."}, status_code=502)
+
+        try:
+            max_videos = int((json.loads(body) or {}).get("max_videos", 5))
+        except (ValueError, TypeError, AttributeError):
+            max_videos = 5
+        # Workers sharing a data directory return the same videos; keep each one's best match
+        videos: Dict[str, Dict[str, Any]] = {}
+        for result in ok:
+            for video in result["results"]:
+                best = videos.get(video["video_id"])
+                if best is None or video["score"] > best["score"]:
+                    videos[video["video_id"]] = video
+        ranked = sorted(videos.values(), key=lambda video: video["score"], reverse=True)
+        return {
+            "results": ranked[:max_videos],
+            "took_ms": max(result["took_ms"] for result in ok),
+            "unavailable": unreachable(replies),
+        }
+
+    @app.delete("/videos/{video_id}")
+    async def delete_video(video_id: str, request: Request):
+        if not ring.nodes:
+            return no_workers()
+        replies = await broadcast(request, b"")
+        failed = unreachable(replies) + [
+            worker
+            for worker, reply in replies.items()
+            if isinstance(reply, httpx.Response) and reply.status_code != 200
+        ]
+        if failed:
+            return JSONResponse(
+                content={"detail": f"Delete did not reach: {', '.join(failed)}"}, status_code=502
+            )
+        return {
+            "video_id": video_id,
+            "removed_chunks": sum(reply.json()["removed_chunks"] for reply in replies.values()),
+        }
+
+    @app.get("/shard/workers")
+    async def get_workers():
+        return {"workers": ring.nodes, "replicas": ring.replicas}
+
+    @app.put("/shard/workers")
+    async def set_workers(request: Request):
+        body = await request.json()
+        workers = body.get("workers")
+        if not isinstance(workers, list) or not workers:
+            return JSONResponse(content={"detail": "A list of workers is required."}, status_code=400)
+
+        previous = ring.nodes
+        ring.set_nodes(workers)
+        released = {}
+        # Workers that left are told too, so they drop everything they held
+        for worker in dict.fromkeys(previous + ring.nodes):
+            try:
+                response = await client.put(f"{worker}/shard/ring", json={"workers": ring.nodes})
+                released[worker] = response.json().get("released", [])
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"Could not update the ring on {worker}: {e}")
+                released[worker] = None
+        return {"workers": ring.nodes, "released": released}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def dispatch(path: str, request: Request):
+        body = await request.body()
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+
+        parts = path.strip("/").split("/")
+        if parts[0] == "jobs" and len(parts) >= 2 and request.method == "GET":
+            worker = await job_worker(parts[1])
+            if worker is None:
+                return JSONResponse(content={"detail": "Job not found."}, status_code=404)
+        else:
+            video_id = request_video_id(path, payload)
+            worker = ring.owner(video_id) if video_id else any_worker()
+        if worker is None:
+            return no_workers()
+
+        try:
+            return await forward(worker, request, body)
+        except httpx.HTTPError as e:
+            print(f"Forwarding {request.method} /{path} to {worker} failed: {e}")
+            return JSONResponse(content={"detail": f"Worker unavailable: {worker}"}, status_code=502)
+
+    return app
+
+
+# uvicorn dispatcher:app, with one `uvicorn routes:app` per entry of SHARD_WORKERS
+app = create_dispatcher(
+    [worker.strip() for worker in os.getenv("SHARD_WORKERS", "").split(",") if worker.strip()],
+    replicas=int(os.getenv("SHARD_REPLICAS", "128")),
+)
@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Substrings of errors that mean "slow down" rather than "this will never work"
+RATE_LIMIT_MARKERS = ("429", "resource exhausted", "resourceexhausted", "rate limit", "quota")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class BatchEmbedder:
+    """Embeds texts in fixed-size batches with bounded parallel requests.
+
+    `embeddings` is any LangChain embeddings object (only `embed_documents`
+    is used). Batches that fail with a rate-limit error are retried with
+    exponential backoff and jitter; other errors propagate. A caller that
+    passes a `timings` list to `embed` gets one entry per batch of that call.
+
+    With an `EmbeddingCache`, only texts missing from the cache are sent to
+    the backend and the new vectors are written back.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        cache: Optional[Any] = None,
+    ):
+        if batch_size <= 0 or max_concurrency <= 0:
+            raise ValueError("batch_size and max_concurrency must be positive")
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+
+    def _embed_batch(
+        self, index: int, batch: Sequence[str]
+    ) -> Tuple[List[List[float]], Dict[str, Any]]:
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            try:
+                vectors = self.embeddings.embed_documents(list(batch))
+                break
+            except Exception as e:
+                if attempt >= self.max_retries or not is_rate_limit_error(e):
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+        timing = {
+            "batch": index,
+            "size": len(batch),
+            "retries": attempt,
+            "seconds": time.perf_counter() - started,
+        }
+        return vectors, timing
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        timings: Optional[List[Dict[str, Any]]] = None,
+    ) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix in input order.
+
+        `on_progress(done, total)` is called (from worker threads) after each
+        batch, with cache hits counted as done up front. Per-batch timings
+        are appended to `timings` in batch order; each call has its own, so
+        concurrent calls never mix them.
+        """
+        timings = timings if timings is not None else []
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        done = [0]
+        done_lock = threading.Lock()
+
+        def batch_done(size: int) -> None:
+            if on_progress is None:
+                return
+            with done_lock:
+                done[0] += size
+                on_progress(done[0], len(texts))
+
+        if self.cache is None:
+            return self._embed_uncached(texts, batch_done, timings)
+
+        cached = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        batch_done(len(texts) - len(missing))
+        if missing:
+            fresh = self._embed_uncached([texts[i] for i in missing], batch_done, timings)
+            self.cache.put_many([texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        return np.asarray(cached, dtype=np.float32)
+
+    def _embed_uncached(
+        self,
+        texts: Sequence[str],
+        batch_done: Callable[[int], None],
+        timings: List[Dict[str, Any]],
+    ) -> np.ndarray:
+        batches = [
+            texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)
+        ]
+
+        def run(index: int, batch: Sequence[str]) -> Tuple[List[List[float]], Dict[str, Any]]:
+            result = self._embed_batch(index, batch)
+            batch_done(len(batch))
+            return result
+
+        workers = min(self.max_concurrency, len(batches))
+        if workers == 1:
+            results = [run(i, b) for i, b in enumerate(batches)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(run, range(len(batches)), batches))
+        timings.extend(timing for _, timing in results)
+        return np.asarray([v for vectors, _ in results for v in vectors], dtype=np.float32)
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, SHA-256 of the text).
+
+    Vectors for each model live in one append-only float32 matrix file that is
+    read through a memory map; a SQLite index maps text hashes to matrix rows.
+    Writers allocate rows inside an immediate SQLite transaction, so several
+    worker processes can share one cache directory.
+    """
+
+    def __init__(self, directory: str, model: str):
+        self.directory = directory
+        self.model = model
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.matrix_path = os.path.join(directory, f"{slug}.f32")
+        self.index_path = os.path.join(directory, "index.db")
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta "
+                "(model TEXT PRIMARY KEY, dim INTEGER NOT NULL, rows INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(model TEXT NOT NULL, hash TEXT NOT NULL, row INTEGER NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+        self._load_dim()
+
+    def _load_dim(self) -> None:
+        with self._connect() as conn:
+            meta = conn.execute(
+                "SELECT dim FROM meta WHERE model = ?", (self.model,)
+            ).fetchone()
+        if meta:
+            self.dim = meta[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+
+    def _rows(self, rows: List[int]) -> np.ndarray:
+        needed = max(rows) + 1
+        if self._matrix is None or self._matrix.shape[0] < needed:
+            count = os.path.getsize(self.matrix_path) // (4 * self.dim)
+            self._matrix = np.memmap(
+                self.matrix_path, dtype=np.float32, mode="r", shape=(count, self.dim)
+            )
+        return np.array(self._matrix[rows])
+
+    def get_many(self, texts: Sequence[str], count: bool = True) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, or None for a miss. Updates hit/miss counters if `count`."""
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[str, int] = {}
+        if self.dim is None:
+            # Another process may have written the first vectors since we started
+            self._load_dim()
+        if self.dim is not None and hashes:
+            with self._connect() as conn:
+                unique = list(set(hashes))
+                for i in range(0, len(unique), 500):
+                    part = unique[i : i + 500]
+                    found.update(
+                        conn.execute(
+                            "SELECT hash, row FROM embeddings WHERE model = ? AND hash IN "
+                            f"({','.join('?' * len(part))})",
+                            (self.model, *part),
+                        ).fetchall()
+                    )
+
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            if found:
+                hit_positions = [i for i, h in enumerate(hashes) if h in found]
+                vectors = self._rows([found[hashes[i]] for i in hit_positions])
+                for position, vector in zip(hit_positions, vectors):
+                    results[position] = vector
+            if count:
+                hit_count = sum(1 for r in results if r is not None)
+                self.hits += hit_count
+                self.misses += len(texts) - hit_count
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        dim = vectors.shape[1]
+        new: Dict[str, int] = {}
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            meta = conn.execute(
+                "SELECT dim, rows FROM meta WHERE model = ?", (self.model,)
+            ).fetchone()
+            if meta and meta[0] != dim:
+                raise ValueError(
+                    f"Embedding dimension changed for {self.model}: {meta[0]} -> {dim}"
+                )
+            next_row = meta[1] if meta else 0
+
+            keep = []
+            for i, text in enumerate(texts):
+                h = text_hash(text)
+                if h in new:
+                    continue
+                exists = conn.execute(
+                    "SELECT 1 FROM embeddings WHERE model = ? AND hash = ?",
+                    (self.model, h),
+                ).fetchone()
+                if exists:
+                    continue
+                new[h] = next_row + len(keep)
+                keep.append(i)
+
+            if keep:
+                with open(self.matrix_path, "ab") as f:
+                    # Drop bytes a crashed writer may have left past the last committed row
+                    f.truncate(next_row * dim * 4)
+                    f.write(vectors[keep].tobytes())
+                conn.executemany(
+                    "INSERT INTO embeddings (model, hash, row) VALUES (?, ?, ?)",
+                    [(self.model, h, row) for h, row in new.items()],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (model, dim, rows) VALUES (?, ?, ?)",
+                    (self.model, dim, next_row + len(keep)),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self.dim = dim
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,365 @@
+import glob
+import math
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from quantization import index_description
+
+# Looks up the embedding of each chunk text, None for a miss (e.g. EmbeddingCache.get_many)
+VectorLookup = Callable[[Sequence[str]], List[Optional[np.ndarray]]]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class GlobalIndex:
+    """Cross-video semantic index over every processed chunk.
+
+    Vectors are L2-normalised and compared by inner product (cosine). Until
+    `train_threshold` vectors have been added the index is an exact
+    `IndexIDMap2(IndexFlatIP)`; the first flush past that migrates it to an
+    IVF index sized to the collection, which keeps search fast at hundreds
+    of thousands of chunks. `quantization` picks how the IVF lists store
+    vectors (`flat`, `sq8` or `pq`, as for the per-video indexes). Both
+    support `remove_ids`, so deleting a video never rebuilds the index.
+
+    Chunk rows in SQLite are the source of truth. Every add or remove
+    commits its rows together with one entry in a `log` table naming the
+    chunk ids it added or removed, so a change costs O(chunks changed).
+    The index itself is only written by `flush()`, as a snapshot file
+    covering the log up to some entry, after which those entries are
+    dropped; call it on a timer and at shutdown. Loading (lazily, on first
+    use) reads the newest snapshot and replays the entries after it, taking
+    the vectors of added chunks from `vectors` by chunk text. That replay
+    is also how chunks committed after the last flush come back after a
+    crash.
+
+    Every worker on a node opens the same directory. Writers are serialized
+    by a `BEGIN IMMEDIATE` transaction on global.db, which only covers the
+    row and log writes; each worker then replays the new log entries into
+    its own in-memory index before searching, and reloads the snapshot
+    (outside any write transaction) once another worker has flushed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        train_threshold: int = 20_000,
+        nprobe: int = 16,
+        quantization: str = "flat",
+        vectors: Optional[VectorLookup] = None,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.db_path = os.path.join(directory, "global.db")
+        self.train_threshold = train_threshold
+        self.nprobe = nprobe
+        self.quantization = quantization
+        self.vectors = vectors
+        self._lock = threading.RLock()
+        self.index: Optional[faiss.Index] = None
+        # Last log entry applied to the in-memory index; None until first loaded
+        self._seq: Optional[int] = None
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, "
+                "video_id TEXT NOT NULL, chunk INTEGER, start REAL, end REAL, text TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_video ON chunks (video_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS videos (video_id TEXT PRIMARY KEY, title TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS log (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "op TEXT NOT NULL, first_id INTEGER NOT NULL, last_id INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            # `snapshot`: last log entry in the snapshot file; `next_id`: ids are never reused
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('snapshot', 0)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('next_id', 1)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _snapshot_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{seq}.faiss")
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> int:
+        return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _read_snapshot(self) -> Tuple[Optional[faiss.Index], int]:
+        while True:
+            with self._connect() as conn:
+                seq = self._meta(conn, "snapshot")
+            if seq == 0:
+                return None, 0
+            path = self._snapshot_path(seq)
+            try:
+                index = faiss.read_index(path)
+            except RuntimeError:
+                if os.path.exists(path):
+                    raise
+                # Replaced by a newer flush between reading the version and the file
+                continue
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None:
+                ivf.nprobe = self.nprobe
+            return index, seq
+
+    def _refresh(
+        self, known: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+    ) -> None:
+        """Bring the in-memory index up to the last committed log entry."""
+        while True:
+            with self._lock:
+                conn = self._connect()
+                conn.isolation_level = None
+                try:
+                    # One read transaction, so the log matches the snapshot version
+                    conn.execute("BEGIN")
+                    if self._seq is not None and self._meta(conn, "snapshot") <= self._seq:
+                        self._replay(conn, known or {})
+                        return
+                finally:
+                    conn.close()
+            # Entries up to a newer snapshot may be gone from the log: start from the file,
+            # read without holding the lock searches need
+            index, seq = self._read_snapshot()
+            with self._lock:
+                if self._seq is None or seq > self._seq:
+                    self.index, self._seq = index, seq
+
+    def _replay(
+        self, conn: sqlite3.Connection, known: Dict[int, Tuple[np.ndarray, np.ndarray]]
+    ) -> None:
+        entries = conn.execute(
+            "SELECT seq, op, first_id, last_id FROM log WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        for seq, op, first, last in entries:
+            # Entries are idempotent: an add replaces whatever those ids held
+            if self.index is not None:
+                self.index.remove_ids(faiss.IDSelectorRange(first, last + 1))
+            if op == "add":
+                ids, vectors = known.get(seq) or self._lookup(conn, first, last)
+                if len(ids):
+                    if self.index is None:
+                        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+                    self.index.add_with_ids(vectors, ids)
+            self._seq = seq
+
+    def _lookup(
+        self, conn: sqlite3.Connection, first: int, last: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectors of the chunks still stored under ids first..last."""
+        rows = conn.execute(
+            "SELECT id, text FROM chunks WHERE id BETWEEN ? AND ? ORDER BY id", (first, last)
+        ).fetchall()
+        empty = (np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32))
+        if not rows:
+            # Removed again by a later entry
+            return empty
+        if self.vectors is None:
+            print(f"Global index: no vector lookup, skipping chunks {first}-{last}")
+            return empty
+        found = [
+            (chunk_id, vector)
+            for (chunk_id, _), vector in zip(rows, self.vectors([text for _, text in rows]))
+            if vector is not None
+        ]
+        if len(found) < len(rows):
+            print(f"Global index: {len(rows) - len(found)} chunks have no cached vector")
+        if not found:
+            return empty
+        ids = np.asarray([chunk_id for chunk_id, _ in found], dtype=np.int64)
+        return ids, _normalize(np.stack([vector for _, vector in found]))
+
+    @property
+    def ntotal(self) -> int:
+        self._refresh()
+        return 0 if self.index is None else int(self.index.ntotal)
+
+    def _maybe_train(self) -> None:
+        """Migrate the exact index to IVF once it is large enough."""
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            return
+        if self.index.ntotal < self.train_threshold:
+            return
+        id_map = faiss.downcast_index(self.index)
+        ids = faiss.vector_to_array(id_map.id_map).astype(np.int64)
+        vectors = id_map.index.reconstruct_n(0, id_map.ntotal)
+        d = vectors.shape[1]
+        nlist = max(1, min(int(4 * math.sqrt(len(ids))), len(ids) // 39))
+        codes = index_description(self.quantization, d, len(ids))
+        ivf = faiss.index_factory(d, f"IVF{nlist},{codes}", faiss.METRIC_INNER_PRODUCT)
+        if isinstance(ivf, faiss.IndexIVFPQ):
+            ivf.do_polysemous_training = False
+        ivf.train(vectors)
+        ivf.add_with_ids(vectors, ids)
+        ivf.nprobe = self.nprobe
+        self.index = ivf
+        print(f"Global index migrated to IVF{nlist},{codes} ({len(ids)} vectors)")
+
+    def _commit(self, change: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run one change to the rows and log, serialized across workers."""
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = change(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return result
+
+    def add(
+        self,
+        video_id: str,
+        vectors: np.ndarray,
+        metadatas: Sequence[Dict[str, Any]],
+        texts: Sequence[str],
+        title: Optional[str] = None,
+    ) -> None:
+        """Add (or replace) every chunk of a video."""
+        if len(texts) == 0:
+            return
+        vectors = _normalize(vectors)
+
+        def change(conn: sqlite3.Connection) -> Tuple[int, np.ndarray]:
+            self._remove(conn, video_id)
+            # Allocated inside the write transaction, so no other worker can take the same ids
+            first = self._meta(conn, "next_id")
+            ids = np.arange(first, first + len(texts), dtype=np.int64)
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'next_id'", (first + len(texts),))
+            conn.executemany(
+                "INSERT INTO chunks (id, video_id, chunk, start, end, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (int(i), video_id, m.get("chunk"), m.get("start"), m.get("end"), t)
+                    for i, m, t in zip(ids, metadatas, texts)
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, title) VALUES (?, ?)",
+                (video_id, title),
+            )
+            seq = conn.execute(
+                "INSERT INTO log (op, first_id, last_id) VALUES ('add', ?, ?)",
+                (first, first + len(texts) - 1),
+            ).lastrowid
+            return seq, ids
+
+        seq, ids = self._commit(change)
+        # Our own vectors are at hand; only other workers' adds need the lookup
+        self._refresh(known={seq: (ids, vectors)})
+
+    def remove(self, video_id: str) -> int:
+        """Delete a video's vectors in place; returns how many were removed."""
+        removed = self._commit(lambda conn: self._remove(conn, video_id))
+        self._refresh()
+        return removed
+
+    def _remove(self, conn: sqlite3.Connection, video_id: str) -> int:
+        first, last, count = conn.execute(
+            "SELECT MIN(id), MAX(id), COUNT(*) FROM chunks WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        conn.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
+        conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+        if count:
+            # A video's chunks are always one contiguous id range
+            conn.execute(
+                "INSERT INTO log (op, first_id, last_id) VALUES ('remove', ?, ?)", (first, last)
+            )
+        return int(count)
+
+    def flush(self) -> None:
+        """Write a snapshot of the index and drop the log entries it covers."""
+        self._refresh()
+        with self._lock:
+            with self._connect() as conn:
+                snapshot = self._meta(conn, "snapshot")
+            if self.index is None or self._seq <= snapshot:
+                return
+            self._maybe_train()
+            seq = self._seq
+            data = faiss.serialize_index(self.index)
+
+        path = self._snapshot_path(seq)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
+
+        def publish(conn: sqlite3.Connection) -> bool:
+            if self._meta(conn, "snapshot") >= seq:
+                return False
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'snapshot'", (seq,))
+            conn.execute("DELETE FROM log WHERE seq <= ?", (seq,))
+            return True
+
+        if not self._commit(publish):
+            # Another worker flushed a newer snapshot meanwhile
+            os.remove(path)
+            return
+        for stale in glob.glob(os.path.join(self.directory, "snapshot-*.faiss")):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+    def search(
+        self, query_vector: Sequence[float], k: int = 20, max_videos: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Top videos for a query, each with its best-matching chunks."""
+        self._refresh()
+        with self._lock:
+            if self.index is None or not self.index.ntotal:
+                return []
+            query = _normalize(np.asarray([query_vector], dtype=np.float32))
+            scores, ids = self.index.search(query, min(k, int(self.index.ntotal)))
+        hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+        if not hits:
+            return []
+
+        with self._connect() as conn:
+            rows = {
+                row[0]: row
+                for row in conn.execute(
+                    "SELECT c.id, c.video_id, c.chunk, c.start, c.end, c.text, v.title "
+                    "FROM chunks c LEFT JOIN videos v ON v.video_id = c.video_id "
+                    f"WHERE c.id IN ({','.join('?' * len(hits))})",
+                    [i for i, _ in hits],
+                )
+            }
+
+        videos: Dict[str, Dict[str, Any]] = {}
+        for chunk_id, score in hits:
+            row = rows.get(chunk_id)
+            if row is None:
+                continue
+            _, video_id, chunk, start, end, text, title = row
+            video = videos.setdefault(
+                video_id,
+                {"video_id": video_id, "video_title": title, "score": score, "chunks": []},
+            )
+            video["chunks"].append(
+                {"chunk": chunk, "start": start, "end": end, "score": score, "text": text}
+            )
+        return list(videos.values())[:max_videos]
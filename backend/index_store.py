@@ -0,0 +1,210 @@
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+import uuid
+import zlib
+from typing import Any, Dict, Optional
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from state import StateBackend
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.json"
+META_FILE = "meta.json"
+VERSION_FILE = "version"
+
+# Map flat index codes straight from the file when this FAISS build supports it
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+class IndexStore:
+    """Per-video FAISS indexes persisted under `{directory}/{video_id}/`.
+
+    The index is written with `faiss.write_index` and read back memory-mapped,
+    the docstore is plain JSON (no pickle) and `meta.json` carries small
+    per-video fields such as the title. Writes go to a temporary directory
+    that is renamed into place, so readers never see a half-written index.
+
+    With a shared `state` backend every saved index is also published there
+    as one blob under `index:{video_id}`, and a fresh version id for it
+    under `index_version:{video_id}`. The backend is then the source of
+    truth: a local copy is used only while its `version` file matches, is
+    replaced from the blob when another worker saved a newer index, and
+    is removed once the video was deleted elsewhere.
+    """
+
+    def __init__(self, directory: str, embeddings: Any, state: Optional[StateBackend] = None):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.state = state
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, video_id: str) -> str:
+        # Video ids come from request bodies; never let one escape the directory
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", video_id or ""):
+            raise ValueError(f"Invalid video id: {video_id!r}")
+        return os.path.join(self.directory, video_id)
+
+    def exists(self, video_id: str) -> bool:
+        try:
+            local = os.path.exists(os.path.join(self.path(video_id), INDEX_FILE))
+        except ValueError:
+            return False
+        if self.state is None:
+            return local
+        return self.state.exists(f"index:{video_id}")
+
+    def _local_version(self, video_id: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path(video_id), VERSION_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _fetch(self, video_id: str) -> bool:
+        """Make the local directory match the shared copy; False when there is none."""
+        target = self.path(video_id)
+        local = os.path.exists(os.path.join(target, INDEX_FILE))
+        if self.state is None:
+            return local
+        version = self.state.get(f"index_version:{video_id}")
+        if version is None:
+            # Deleted by another worker (or never published): the local copy is stale
+            if local:
+                shutil.rmtree(target, ignore_errors=True)
+            return False
+        if local and self._local_version(video_id) == version.decode("utf-8"):
+            return True
+
+        blob = self.state.get(f"index:{video_id}")
+        if blob is None:
+            return False
+        (length,) = struct.unpack_from("<Q", blob)
+        files = json.loads(zlib.decompress(blob[8 : 8 + length]))
+        staging = tempfile.mkdtemp(prefix=f".{video_id}-", dir=self.directory)
+        try:
+            with open(os.path.join(staging, INDEX_FILE), "wb") as f:
+                f.write(blob[8 + length :])
+            for name in (DOCSTORE_FILE, META_FILE):
+                with open(os.path.join(staging, name), "w", encoding="utf-8") as f:
+                    json.dump(files[name], f, ensure_ascii=False)
+            with open(os.path.join(staging, VERSION_FILE), "w", encoding="utf-8") as f:
+                f.write(files[VERSION_FILE])
+            # Indexes already loaded keep their memory-mapped files after the old copy is removed
+            if os.path.exists(target):
+                shutil.rmtree(target, ignore_errors=True)
+            try:
+                os.replace(staging, target)
+            except OSError:
+                # Another worker unpacked it first
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return True
+
+    def _publish(
+        self,
+        video_id: str,
+        version: str,
+        index_bytes: bytes,
+        documents: Any,
+        meta: Dict[str, Any],
+    ) -> None:
+        files = zlib.compress(
+            json.dumps(
+                {DOCSTORE_FILE: documents, META_FILE: meta, VERSION_FILE: version},
+                ensure_ascii=False,
+            ).encode("utf-8")
+        )
+        self.state.set(
+            f"index:{video_id}", struct.pack("<Q", len(files)) + files + index_bytes
+        )
+        # Written after the blob, so a worker that sees the new version also gets the new blob
+        self.state.set(f"index_version:{video_id}", version.encode("utf-8"))
+
+    def save(
+        self, video_id: str, vectorstore: FAISS, meta: Optional[Dict[str, Any]] = None
+    ) -> None:
+        staging = tempfile.mkdtemp(prefix=f".{video_id}-", dir=self.directory)
+        try:
+            faiss.write_index(vectorstore.index, os.path.join(staging, INDEX_FILE))
+            documents = []
+            for position in range(vectorstore.index.ntotal):
+                doc_id = vectorstore.index_to_docstore_id[position]
+                doc = vectorstore.docstore.search(doc_id)
+                documents.append(
+                    {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+                )
+            with open(os.path.join(staging, DOCSTORE_FILE), "w", encoding="utf-8") as f:
+                json.dump(documents, f, ensure_ascii=False)
+            with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta or {}, f, ensure_ascii=False)
+            version = uuid.uuid4().hex
+            with open(os.path.join(staging, VERSION_FILE), "w", encoding="utf-8") as f:
+                f.write(version)
+
+            target = self.path(video_id)
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if self.state is not None:
+            with open(os.path.join(target, INDEX_FILE), "rb") as f:
+                self._publish(video_id, version, f.read(), documents, meta or {})
+
+    def load(self, video_id: str) -> Optional[FAISS]:
+        """Load a persisted index, memory-mapped when possible; None if absent."""
+        try:
+            if not self._fetch(video_id):
+                return None
+        except ValueError:
+            return None
+        path = self.path(video_id)
+        index_path = os.path.join(path, INDEX_FILE)
+        try:
+            index = faiss.read_index(index_path, MMAP_FLAGS)
+        except RuntimeError:
+            index = faiss.read_index(index_path)
+
+        with open(os.path.join(path, DOCSTORE_FILE), "r", encoding="utf-8") as f:
+            documents = json.load(f)
+        docstore = InMemoryDocstore(
+            {
+                d["id"]: Document(page_content=d["page_content"], metadata=d["metadata"])
+                for d in documents
+            }
+        )
+        index_to_docstore_id = {i: d["id"] for i, d in enumerate(documents)}
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+    def load_meta(self, video_id: str) -> Dict[str, Any]:
+        self._fetch(video_id)
+        path = os.path.join(self.path(video_id), META_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def delete(self, video_id: str) -> None:
+        try:
+            shutil.rmtree(self.path(video_id), ignore_errors=True)
+        except ValueError:
+            return
+        if self.state is not None:
+            self.state.delete(f"index_version:{video_id}")
+            self.state.delete(f"index:{video_id}")
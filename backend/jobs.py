@@ -0,0 +1,454 @@
+import asyncio
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+def _copy(record: Dict[str, Any]) -> Dict[str, Any]:
+    # Records are JSON documents; hand out copies workers cannot mutate under the caller
+    return json.loads(json.dumps(record))
+
+
+class JobStore:
+    """SQLite persistence for job records, so queued work survives a restart.
+
+    Workers sharing the file coordinate through `owner` and `lease_until`:
+    a worker owns the jobs it submitted or adopted and keeps renewing their
+    lease; an unfinished job with no owner, or whose owner stopped renewing,
+    can be adopted by any worker, and only its owner may start it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    record TEXT NOT NULL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(
+        self,
+        record: Dict[str, Any],
+        owner: Optional[str] = None,
+        lease_until: Optional[float] = None,
+    ) -> None:
+        """Insert or update a record; `owner` and `lease_until` only apply to a new job."""
+        # Saves run on pool threads and may land out of order; an older version never wins
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created_at, record, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, record = excluded.record "
+                "WHERE json_extract(excluded.record, '$.version') "
+                ">= json_extract(jobs.record, '$.version')",
+                (
+                    record["id"],
+                    record["status"],
+                    record["created_at"],
+                    json.dumps(record),
+                    owner,
+                    lease_until,
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Queued and interrupted (running) jobs, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT record FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def orphaned(self, now: float) -> List[Dict[str, Any]]:
+        """Unfinished jobs without a live owner, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT record FROM jobs WHERE status IN ('queued', 'running') "
+                "AND (owner IS NULL OR lease_until < ?) ORDER BY created_at",
+                (now,),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def adopt(self, job_id: str, owner: str, lease_until: float, now: float) -> bool:
+        """Take over an orphaned job as queued; False if another worker holds it."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = ?, lease_until = ? "
+                "WHERE id = ? AND status IN ('queued', 'running') "
+                "AND (owner IS NULL OR lease_until < ?)",
+                (owner, lease_until, job_id, now),
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Mark an owned, queued job running; False if it was adopted elsewhere meanwhile."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'queued' AND owner = ?",
+                (job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, owner: str, lease_until: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                (lease_until, owner),
+            )
+
+    def release(self, owner: str) -> None:
+        """Hand a stopping worker's unfinished jobs back, so another one adopts them at once."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                (owner,),
+            )
+
+
+class JobProgress:
+    """Per-job stage reporter handed to job handlers; safe to call from any thread."""
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self.manager = manager
+        self.job_id = job_id
+
+    def __call__(self, stage: str, done: Optional[int] = None, total: Optional[int] = None) -> None:
+        self.manager._report(self.job_id, stage, done, total)
+
+
+class JobManager:
+    """Priority job queue drained by a fixed number of asyncio workers.
+
+    `handlers` maps a job kind to `async handler(payload, progress)`; its
+    return value becomes the job result and an exception (its `detail`, if
+    it has one) the job error. Higher `priority` runs first, ties in
+    submission order. Every change is written to the `JobStore` and bumps
+    the record's `version`, which `wait` and `events` use to follow a job.
+    Store reads and writes go through `run_io` (a thread by default), never
+    on the event loop. Only the `keep_finished` most recently finished jobs
+    stay in memory; older ones are read back from the store.
+
+    Several workers may share one store. Each job belongs to the worker
+    that submitted it, which renews its lease every `lease / 3` seconds,
+    and only the owner runs it. Jobs left behind by a worker that stopped
+    (or whose lease ran out because it died) are adopted and re-queued by
+    the others, at `start()` and on every renewal.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handlers: Dict[str, Callable[[Dict[str, Any], JobProgress], Awaitable[Any]]],
+        workers: int = 2,
+        run_io: Optional[Callable[..., Awaitable[Any]]] = None,
+        keep_finished: int = 1000,
+        lease: float = 60.0,
+        owner: Optional[str] = None,
+    ):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.keep_finished = keep_finished
+        self.lease = lease
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._run_io = run_io or asyncio.to_thread
+        self._saves: Set[asyncio.Task] = set()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Finished job ids, oldest first; past keep_finished they leave _jobs
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._active_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the workers on the running loop and adopt orphaned jobs."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._changed = asyncio.Event()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._keep_leases()))
+        await self._adopt_orphans()
+
+    async def stop(self) -> None:
+        """Stop the workers, finish pending writes and hand unfinished jobs back."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        await self.drain()
+        await self._run_io(self.store.release, self.owner)
+
+    async def _adopt_orphans(self) -> None:
+        now = time.time()
+        for record in await self._run_io(self.store.orphaned, now):
+            adopted = await self._run_io(
+                self.store.adopt, record["id"], self.owner, now + self.lease, now
+            )
+            if not adopted:
+                continue
+            with self._lock:
+                record = self._jobs.get(record["id"], record)
+                record["status"] = "queued"
+                self._jobs[record["id"]] = record
+                if record.get("key") is not None:
+                    self._active_keys[record["key"]] = record["id"]
+            self._enqueue(record)
+            print(f"Resumed job {record['id']} ({record['kind']})")
+
+    async def _keep_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self._run_io(self.store.renew, self.owner, time.time() + self.lease)
+                await self._adopt_orphans()
+            except Exception as e:
+                print(f"Could not renew job leases: {e}")
+
+    def _enqueue(self, record: Dict[str, Any]) -> None:
+        self._queue.put_nowait((-record["priority"], next(self._sequence), record["id"]))
+
+    async def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = 0,
+        key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Queue a job; with a `key`, an unfinished job with the same key is returned instead."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        await self.start()
+        with self._lock:
+            existing = self._active_keys.get(key) if key is not None else None
+            if existing is not None:
+                return _copy(self._jobs[existing])
+            now = time.time()
+            record = {
+                "id": uuid.uuid4().hex,
+                "kind": kind,
+                "key": key,
+                "status": "queued",
+                "priority": priority,
+                "payload": payload,
+                "stage": None,
+                "stages": {},
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "updated_at": now,
+                "version": 0,
+            }
+            self._jobs[record["id"]] = record
+            if key is not None:
+                self._active_keys[key] = record["id"]
+            snapshot = _copy(record)
+        await self._run_io(self.store.save, snapshot, self.owner, now + self.lease)
+        self._enqueue(record)
+        return snapshot
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is not None:
+                return _copy(record)
+        return await self._run_io(self.store.get, job_id)
+
+    async def wait(self, job_id: str, since: int = -1, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Long-poll: the job once its version is past `since`, it has finished or `timeout` passes."""
+        await self.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            changed = self._changed
+            record = await self.get(job_id)
+            if (
+                record is None
+                or record["version"] > since
+                or record["status"] in TERMINAL_STATUSES
+            ):
+                return record
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return record
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return await self.get(job_id)
+
+    async def events(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Dict[str, Any]]:
+        """Every new version of a job, ending with its finished record."""
+        since = -1
+        while True:
+            record = await self.wait(job_id, since, timeout=heartbeat)
+            if record is None:
+                return
+            if record["version"] > since:
+                since = record["version"]
+                yield record
+            if record["status"] in TERMINAL_STATUSES:
+                return
+
+    def _update(self, job_id: str, mutate: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            record = self._jobs[job_id]
+            mutate(record)
+            record["updated_at"] = time.time()
+            record["version"] += 1
+            snapshot = _copy(record)
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is not None and running is loop:
+            self._save_later(snapshot)
+            self._notify()
+            return
+        # Progress reported from a worker thread is already off the loop
+        self.store.save(snapshot)
+        if loop is not None:
+            loop.call_soon_threadsafe(self._notify)
+
+    def _save_later(self, record: Dict[str, Any]) -> None:
+        task = self._loop.create_task(self._run_io(self.store.save, record))
+        self._saves.add(task)
+
+        def saved(task: asyncio.Task) -> None:
+            self._saves.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Could not save job {record['id']}: {task.exception()}")
+
+        task.add_done_callback(saved)
+
+    async def drain(self) -> None:
+        """Wait for the job updates still being written (call before shutting the pools down)."""
+        while self._saves:
+            await asyncio.gather(*list(self._saves), return_exceptions=True)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _report(self, job_id: str, stage: str, done: Optional[int], total: Optional[int]) -> None:
+        def mutate(record: Dict[str, Any]) -> None:
+            now = time.time()
+            for name, info in record["stages"].items():
+                if name != stage and info["status"] == "running":
+                    info["status"] = "done"
+                    info["finished_at"] = now
+            info = record["stages"].setdefault(
+                stage, {"status": "running", "started_at": now, "finished_at": None}
+            )
+            if done is not None:
+                info["done"] = done
+            if total is not None:
+                info["total"] = total
+            record["stage"] = stage
+
+        self._update(job_id, mutate)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        record = self._jobs[job_id]
+        if not await self._run_io(self.store.claim, job_id, self.owner):
+            # Our lease lapsed and another worker adopted the job; get() reads it from the store
+            print(f"Job {job_id} was taken over by another worker")
+            with self._lock:
+                self._jobs.pop(job_id, None)
+                if record.get("key") is not None:
+                    self._active_keys.pop(record["key"], None)
+            return
+
+        def running(record: Dict[str, Any]) -> None:
+            record["status"] = "running"
+            record["started_at"] = time.time()
+
+        self._update(job_id, running)
+        try:
+            result = await self.handlers[record["kind"]](
+                record["payload"], JobProgress(self, job_id)
+            )
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            print(f"Job {job_id} failed: {error}")
+            self._finish(job_id, "failed", error=error)
+        else:
+            self._finish(job_id, "succeeded", result=result)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        def finish(record: Dict[str, Any]) -> None:
+            now = time.time()
+            for info in record["stages"].values():
+                if info["status"] == "running":
+                    info["status"] = "done" if status == "succeeded" else "failed"
+                    info["finished_at"] = now
+            record["status"] = status
+            record["result"] = result
+            record["error"] = error
+            record["finished_at"] = now
+            if record.get("key") is not None:
+                self._active_keys.pop(record["key"], None)
+
+        self._update(job_id, finish)
+        with self._lock:
+            self._finished[job_id] = None
+            while len(self._finished) > self.keep_finished:
+                evicted, _ = self._finished.popitem(last=False)
+                self._jobs.pop(evicted, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = [record["status"] for record in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "succeeded": statuses.count("succeeded"),
+            "failed": statuses.count("failed"),
+        }
@@ -16,6 +16,8 @@ from langchain_google_genai import (ChatGoogleGenerativeAI,
                                     GoogleGenerativeAIEmbeddings)
 from youtube_transcript_api import YouTubeTranscriptApi
 
+from segments import TranscriptSegments
+
 load_dotenv()
 
 # Initialize session state
@@ -110,13 +112,7 @@ def get_youtube_transcript(video_url):
             return "Transcript is empty"
         
         # Create a more structured transcript with timestamps
-        full_text = ""
-        for entry in transcript:
-            timestamp = entry["start"]
-            minutes = int(timestamp // 60)
-            seconds = int(timestamp % 60)
-            text = entry["text"]
-            full_text += f"[{minutes:02d}:{seconds:02d}] {text} "
+        full_text = TranscriptSegments.from_entries(transcript).render()
         
         update_status("Successfully retrieved transcript from YouTube")
         return full_text
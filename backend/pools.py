@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class WorkerPools:
+    """Bounded executors that keep blocking work off the event loop.
+
+    `run_io` is for calls that wait on the network or disk (yt-dlp,
+    AssemblyAI, FAISS and SQLite I/O) and runs them on at most `io_workers`
+    threads. `run_cpu` is for pure-Python CPU work that would hold the GIL
+    (chunking, BM25 indexing) and runs it on `cpu_workers` spawned
+    processes, so its arguments and result must be picklable. With
+    `cpu_workers=0` CPU work shares the I/O threads instead. The process
+    pool is started on first use.
+    """
+
+    def __init__(self, io_workers: int = 32, cpu_workers: int = 2):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.io_pool = ThreadPoolExecutor(
+            max_workers=io_workers, thread_name_prefix="tubetalk-io"
+        )
+        self._cpu_pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cpu_pool(self) -> Executor:
+        if self.cpu_workers <= 0:
+            return self.io_pool
+        with self._lock:
+            if self._cpu_pool is None:
+                # spawn, not fork: the parent has FAISS/OpenMP and gRPC threads running
+                self._cpu_pool = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._cpu_pool
+
+    async def run_io(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, partial(func, *args, **kwargs))
+
+    async def run_cpu(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "io_workers": self.io_workers,
+            "io_queued": self.io_pool._work_queue.qsize(),
+            "cpu_workers": self.cpu_workers,
+            "cpu_started": self._cpu_pool is not None,
+        }
@@ -0,0 +1,72 @@
+from typing import List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+QUANTIZATION_KINDS = ("flat", "sq8", "pq")
+
+# 256 centroids per PQ sub-quantizer, at FAISS's minimum of 39 training points each
+PQ_MIN_TRAINING_POINTS = 39 * 256
+
+
+def _pq_subquantizers(d: int) -> int:
+    """Largest divisor of d giving sub-vectors of at least 8 dimensions."""
+    for m in range(max(d // 8, 1), 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def index_description(kind: str, d: int, n: int, pq_m: Optional[int] = None) -> str:
+    """FAISS index_factory string for a quantization kind and collection size.
+
+    `sq8` stores one byte per dimension (4x smaller than float32). `pq`
+    stores `pq_m` one-byte codes per vector (`d // 8` by default, 96 bytes
+    for text-embedding-004). Training 256 centroids per sub-quantizer needs
+    about 39 points each, so a `pq` collection smaller than
+    `PQ_MIN_TRAINING_POINTS` falls back to `sq8`, which trains on any size.
+    """
+    if kind not in QUANTIZATION_KINDS:
+        raise ValueError(f"Unknown quantization kind: {kind}")
+    if kind == "flat":
+        return "Flat"
+    if kind == "sq8" or n < PQ_MIN_TRAINING_POINTS:
+        return "SQ8"
+    return f"PQ{pq_m or _pq_subquantizers(d)}x8"
+
+
+def build_index(
+    vectors: np.ndarray, kind: str = "flat", pq_m: Optional[int] = None
+) -> faiss.Index:
+    """Train (if needed) and fill an L2 index over `vectors`."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    index = faiss.index_factory(d, index_description(kind, d, n, pq_m=pq_m), faiss.METRIC_L2)
+    if isinstance(index, faiss.IndexPQ):
+        # index_factory turns on polysemous training, which is slow and only helps Hamming search
+        index.do_polysemous_training = False
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def exact_distances(
+    query: Sequence[float],
+    vectors: Sequence[Optional[np.ndarray]],
+    approximate: Sequence[float],
+) -> List[float]:
+    """Squared L2 distances of `query` to candidate vectors, for re-ranking.
+
+    Quantized indexes keep no float32 vectors, so the caller reads the
+    candidates' exact vectors from disk (e.g. the embedding cache) and
+    re-scores only those. A candidate without a vector keeps its
+    `approximate` distance from the index.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    return [
+        float(np.sum((np.asarray(vector, dtype=np.float32) - query) ** 2))
+        if vector is not None
+        else float(distance)
+        for vector, distance in zip(vectors, approximate)
+    ]
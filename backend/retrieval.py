@@ -0,0 +1,131 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from bm25 import BM25Index, reciprocal_rank_fusion
+from quantization import exact_distances
+
+RETRIEVAL_MODES = ("vector", "bm25", "hybrid")
+
+_WHITESPACE = re.compile(r"\s+")
+
+# (exact vector lookup by chunk text, over-fetch factor) for quantized indexes
+Rerank = Tuple[Callable[[Sequence[str]], List[Optional[np.ndarray]]], int]
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: trimmed, lower-cased, whitespace collapsed."""
+    return _WHITESPACE.sub(" ", query.strip().lower())
+
+
+def build_bm25(vectorstore: Any) -> BM25Index:
+    """BM25 index over a FAISS store's chunks, in index position order."""
+    return BM25Index([doc.page_content for doc in _documents(vectorstore)])
+
+
+def _documents(vectorstore: Any) -> List[Document]:
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        for position in range(len(vectorstore.index_to_docstore_id))
+    ]
+
+
+def _document_at(vectorstore: Any, position: int) -> Document:
+    return vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+
+
+def documents_at(vectorstore: Any, positions: Sequence[int]) -> List[Document]:
+    """Chunks at the given index positions, e.g. from a cached retrieval."""
+    return [_document_at(vectorstore, position) for position in positions]
+
+
+def _similarity_search(
+    vectorstore: Any,
+    query: str,
+    k: int,
+    embed_query: Optional[Callable[[str], List[float]]],
+    rerank: Optional[Rerank] = None,
+) -> List[Tuple[Document, float]]:
+    """Vector hits as (document, relevance); relevance = 1 / (1 + L2 distance)."""
+    if embed_query is None:
+        hits = vectorstore.similarity_search_with_score(query, k=k)
+    elif rerank is None:
+        hits = vectorstore.similarity_search_with_score_by_vector(embed_query(query), k=k)
+    else:
+        # Over-fetch from the quantized index, then re-score with the exact vectors
+        exact_vectors, factor = rerank
+        query_vector = embed_query(query)
+        candidates = vectorstore.similarity_search_with_score_by_vector(
+            query_vector, k=k * factor
+        )
+        distances = exact_distances(
+            query_vector,
+            exact_vectors([doc.page_content for doc, _ in candidates]),
+            [distance for _, distance in candidates],
+        )
+        ranked = sorted(zip(candidates, distances), key=lambda pair: pair[1])[:k]
+        hits = [(doc, distance) for (doc, _), distance in ranked]
+    return [(doc, 1.0 / (1.0 + max(float(distance), 0.0))) for doc, distance in hits]
+
+
+def retrieve_scored(
+    entry: Dict[str, Any],
+    query: str,
+    k: int = 7,
+    mode: str = "vector",
+    embed_query: Optional[Callable[[str], List[float]]] = None,
+    rerank: Optional[Rerank] = None,
+) -> List[Tuple[Document, float]]:
+    """Retrieve the top `k` chunks of a video entry as (document, score), best first.
+
+    `vector` embeds the query remotely and searches FAISS, `bm25` stays
+    entirely local, and `hybrid` fuses both rankings with reciprocal-rank
+    fusion. Scores are positive and higher is better, but only comparable
+    within one mode. Chunk positions are taken from `metadata["chunk"]`,
+    which matches the FAISS insertion order. `embed_query` replaces the
+    vector store's own query embedding (e.g. with a cached one). `rerank`
+    re-scores `factor` x `k` candidates of a quantized index with exact
+    vectors looked up by chunk text; it needs `embed_query`.
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    vectorstore = entry["vectorstore"]
+
+    if mode == "vector":
+        return _similarity_search(vectorstore, query, k, embed_query, rerank)
+
+    bm25 = entry.get("bm25")
+    if bm25 is None:
+        bm25 = entry["bm25"] = build_bm25(vectorstore)
+    if mode == "bm25":
+        lexical = bm25.search(query, k=k)
+        if not lexical:
+            # No query term occurs in the transcript; only the embedding can help
+            return _similarity_search(vectorstore, query, k, embed_query, rerank)
+        return [(_document_at(vectorstore, position), score) for position, score in lexical]
+
+    # Hybrid: fetch a deeper candidate list from each side before fusing
+    semantic = [
+        doc.metadata["chunk"]
+        for doc, _ in _similarity_search(vectorstore, query, 2 * k, embed_query, rerank)
+    ]
+    lexical = [position for position, _ in bm25.search(query, k=2 * k)]
+    fused = reciprocal_rank_fusion([semantic, lexical], with_scores=True)[:k]
+    return [(_document_at(vectorstore, position), score) for position, score in fused]
+
+
+def adaptive_k(
+    hits: Sequence[Tuple[Document, float]], score_ratio: float = 0.8, min_k: int = 1
+) -> List[Tuple[Document, float]]:
+    """Keep the hits scoring at least `score_ratio` x the best one (and at least `min_k`).
+
+    A question answered by one passage keeps one or two chunks; a broad
+    question whose hits score alike keeps all of them.
+    """
+    if not hits:
+        return []
+    cutoff = hits[0][1] * score_ratio
+    kept = [hit for hit in hits if hit[1] >= cutoff]
+    return list(hits[: max(len(kept), min_k)])
@@ -1,24 +1,80 @@
+import asyncio
 import json
 import os
 import re
-from typing import Any, Dict
-from urllib.parse import parse_qs, urlparse
+import time
+from contextlib import asynccontextmanager
+from functools import partial
 
 import assemblyai as aai
 import yt_dlp
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from fastapi.responses import JSONResponse, StreamingResponse
 from langchain_community.vectorstores import FAISS
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from pydantic import SecretStr
 from youtube_transcript_api import YouTubeTranscriptApi
 
+from acquisition import acquire_transcript
+from artifact_store import ArtifactStore
+from answer_cache import SemanticAnswerCache
+from bm25 import BM25Index
+from cache import TTLCache
+from chunking import chunk_metadatas, chunk_segments
+from context import build_context, estimate_tokens
+from embedding import BatchEmbedder
+from embedding_cache import EmbeddingCache
+from global_index import GlobalIndex
+from index_store import IndexStore
+from jobs import TERMINAL_STATUSES, JobManager, JobStore
+from pools import WorkerPools
+from quantization import build_index
+from retrieval import (
+    RETRIEVAL_MODES,
+    build_bm25,
+    adaptive_k,
+    documents_at,
+    normalize_query,
+    retrieve_scored,
+)
+from segments import TranscriptSegments
+from sharding import HashRing
+from singleflight import SingleFlight
+from state import open_state
+from summarize import WindowSummarizer, split_windows
+from streaming import SSE_HEADERS, sse_event, stream_llm, stream_text
+from transcript_store import TranscriptStore
+from video_metadata import (
+    VideoMetadataService,
+    choose_audio_format,
+    get_chapters,
+    get_title,
+)
+from video_store import MemoryBoundedStore
+from youtube import get_video_id
+
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume the jobs left queued or running by the last process
+    await job_manager.start()
+    flusher = asyncio.create_task(flush_global_index())
+    try:
+        yield
+    finally:
+        flusher.cancel()
+        await job_manager.stop()
+        await pools.run_io(global_index.flush)
+        pools.shutdown()
+        if shared_state is not None:
+            shared_state.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,9 +84,61 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Global state (in-memory, consider a database or cache for production)
-video_data_store: Dict[str, Dict[str, Any]] = {}
-summary_inmem_db: Dict[str, str | list[str | dict]] = {}
+# Global state (in-memory, bounded by a byte budget; evicted videos are paged back in from disk)
+VIDEO_STORE_MAX_BYTES = int(os.getenv("VIDEO_STORE_MAX_BYTES", str(1024**3)))
+SUMMARY_STORE_MAX_BYTES = int(os.getenv("SUMMARY_STORE_MAX_BYTES", str(64 * 1024**2)))
+video_data_store: MemoryBoundedStore = MemoryBoundedStore(
+    VIDEO_STORE_MAX_BYTES,
+    on_evict=lambda video_id, entry: spill_video_entry(video_id, entry),
+    loader=lambda video_id: load_video_entry(video_id),
+)
+# Transcripts longer than SUMMARY_DIRECT_CHARS are summarized map-reduce style: windows of
+# SUMMARY_WINDOW_CHARS are summarized in parallel and their notes (cached) feed the final prompt
+SUMMARY_DIRECT_CHARS = int(os.getenv("SUMMARY_DIRECT_CHARS", "50000"))
+SUMMARY_WINDOW_CHARS = int(os.getenv("SUMMARY_WINDOW_CHARS", "20000"))
+window_notes_store = MemoryBoundedStore(SUMMARY_STORE_MAX_BYTES)
+window_summarizer = WindowSummarizer(
+    window_notes_store,
+    max_concurrency=int(os.getenv("SUMMARY_MAP_CONCURRENCY", "8")),
+)
+
+# Persistent storage for everything that should survive a restart
+DATA_DIR = os.getenv("TUBETALK_DATA_DIR", os.path.join(os.getcwd(), "data"))
+
+# Transcripts, summaries/quizzes and indexes are shared by every worker: through SQLite
+# files in DATA_DIR on one node by default, or one STATE_BACKEND (memory://,
+# sqlite:///path/state.db or redis://host:6379/0) that workers on several nodes reach
+STATE_BACKEND = os.getenv("STATE_BACKEND", "")
+shared_state = open_state(STATE_BACKEND) if STATE_BACKEND else None
+transcript_store = TranscriptStore(shared_state or os.path.join(DATA_DIR, "transcripts.db"))
+
+# Summaries and quizzes, keyed by (video_id, kind, prompt version, model); bump a
+# version when its prompt changes and the old entries are no longer served (the
+# first new one written for a video replaces them)
+SUMMARY_PROMPT_VERSION = 1
+QUIZ_PROMPT_VERSION = 1
+artifact_store = ArtifactStore(shared_state or os.path.join(DATA_DIR, "artifacts.db"))
+
+# One yt-dlp extraction per video, shared by title, audio-format and chapter lookups
+metadata_service = VideoMetadataService(
+    maxsize=int(os.getenv("METADATA_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("METADATA_CACHE_TTL", "3600")),
+)
+
+# Concurrent identical process/summary/quiz/chat requests share one computation
+single_flight = SingleFlight()
+
+# Blocking work runs on bounded pools: threads for network/disk, processes for CPU-bound Python
+pools = WorkerPools(
+    io_workers=int(os.getenv("IO_WORKERS", "32")),
+    cpu_workers=int(os.getenv("CPU_WORKERS", "2")),
+)
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+LLM_MODEL = "gemini-1.5-flash"
+
+# Start the audio download speculatively if the transcript API is slower than this (seconds)
+AUDIO_SPECULATION_DEADLINE = float(os.getenv("AUDIO_SPECULATION_DEADLINE", "5"))
 
 # API Keys - read from environment variables
 gemini_api_key = SecretStr(os.getenv("GEMINI_API_KEY", ""))
@@ -48,7 +156,7 @@ def get_embeddings():
         )
     try:
         return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004", google_api_key=gemini_api_key
+            model=EMBEDDING_MODEL, google_api_key=gemini_api_key
         )
     except Exception as e:
         raise HTTPException(
@@ -63,7 +171,7 @@ def get_llm():
         )
     try:
         return ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
+            model=LLM_MODEL,
             api_key=gemini_api_key,
             temperature=0.2,
             max_tokens=1024,
@@ -77,56 +185,106 @@ def get_llm():
 embeddings = get_embeddings()
 llm = get_llm()
 
+# Chunks are embedded in batches with a bounded number of parallel requests
+batch_embedder = BatchEmbedder(
+    embeddings,
+    batch_size=int(os.getenv("EMBED_BATCH_SIZE", "100")),
+    max_concurrency=int(os.getenv("EMBED_MAX_CONCURRENCY", "4")),
+    max_retries=int(os.getenv("EMBED_MAX_RETRIES", "5")),
+    cache=EmbeddingCache(os.path.join(DATA_DIR, "embeddings"), EMBEDDING_MODEL),
+)
 
-# Helper function to extract YouTube video ID (reused)
-def get_video_id(url):
-    parsed_url = urlparse(url)
-    if parsed_url.hostname in ["www.youtube.com", "youtube.com"]:
-        return parse_qs(parsed_url.query).get("v", [None])[0]
-    elif parsed_url.hostname == "youtu.be":
-        return parsed_url.path[1:]
-    return None
+# Vector storage: flat float32, or int8 scalar / product quantized. Re-ranking re-scores
+# INDEX_RERANK_FACTOR x k quantized hits with the float32 vectors of the on-disk
+# embedding cache, so the indexes in memory stay small
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "flat")
+INDEX_RERANK = os.getenv("INDEX_RERANK", "false").lower() in ("1", "true", "yes")
+INDEX_RERANK_FACTOR = int(os.getenv("INDEX_RERANK_FACTOR", "4"))
+index_rerank = (
+    (partial(batch_embedder.cache.get_many, count=False), INDEX_RERANK_FACTOR)
+    if INDEX_RERANK and INDEX_QUANTIZATION != "flat"
+    else None
+)
+
+# Chat retrieval: "vector" (remote query embedding), "bm25" (local, lexical) or "hybrid" (RRF of both)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+
+# Chat context: up to RETRIEVAL_MAX_K hits, cut to those scoring within RETRIEVAL_SCORE_RATIO
+# of the best, then merged into contiguous spans under CHAT_CONTEXT_TOKEN_BUDGET
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "7"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "2"))
+RETRIEVAL_SCORE_RATIO = float(os.getenv("RETRIEVAL_SCORE_RATIO", "0.8"))
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Repeated chat questions: query vectors keyed by (model, normalized query) and
+# retrieved chunk positions keyed by (video_id, mode, normalized query)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+retrieval_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+# Chat answers per video, reused for paraphrased questions above a cosine threshold
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+)
+
+# Per-video FAISS indexes on disk, loaded lazily on first use (and published to the shared backend)
+index_store = IndexStore(os.path.join(DATA_DIR, "indexes"), embeddings, state=shared_state)
+
+# Cross-video ANN index every processed video is added to, for /search/; the workers
+# sharing DATA_DIR share it too (writes are serialized through its SQLite file). Changes
+# are logged and the index file is only rewritten every GLOBAL_INDEX_FLUSH_SECONDS
+global_index = GlobalIndex(
+    os.path.join(DATA_DIR, "global"),
+    train_threshold=int(os.getenv("GLOBAL_INDEX_TRAIN_THRESHOLD", "20000")),
+    nprobe=int(os.getenv("GLOBAL_INDEX_NPROBE", "16")),
+    quantization=INDEX_QUANTIZATION,
+    vectors=partial(batch_embedder.cache.get_many, count=False),
+)
+GLOBAL_INDEX_FLUSH_SECONDS = float(os.getenv("GLOBAL_INDEX_FLUSH_SECONDS", "300"))
+
+
+async def flush_global_index():
+    # The first pass loads the index (replaying changes not yet flushed) off the request path
+    while True:
+        try:
+            await pools.run_io(global_index.flush)
+        except Exception as e:
+            print(f"Global index flush failed: {e}")
+        await asyncio.sleep(GLOBAL_INDEX_FLUSH_SECONDS)
+
+
+# Get YouTube video metadata using yt-dlp (one cached extraction per video)
+def get_video_info(video_url):
+    video_id = get_video_id(video_url)
+    if not video_id:
+        return {}
+    return metadata_service.get_info(video_id, video_url)
 
 
 # Get YouTube video title using yt-dlp (reused, but no status updates now)
 def get_youtube_title(video_url):
     try:
-        video_id = get_video_id(video_url)
-        if not video_id:
+        info = get_video_info(video_url)
+        if not info:
             return "Unknown Title"
-
-        ydl_opts = {"quiet": True}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            if info:
-                title = info.get("title", "Unknown Title")
-            else:
-                title = "Unknown Title"
-            return title
+        return get_title(info)
     except Exception as e:
         return f"Unknown Title - {str(e)}"
 
 
-# Tool: Get YouTube Transcript (reused, no status updates, returns directly)
-def get_youtube_transcript(video_url):
-    video_id = get_video_id(video_url)
-    if not video_id:
-        return "Invalid YouTube URL"
-    try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        if not transcript or len(transcript) == 0:
-            return "Transcript is empty"
-
-        full_text = ""
-        for entry in transcript:
-            timestamp = entry["start"]
-            minutes = int(timestamp // 60)
-            seconds = int(timestamp % 60)
-            text = entry["text"]
-            full_text += f"[{minutes:02d}:{seconds:02d}] {text} "
-        return full_text
-    except Exception as e:
-        return f"Failed to get transcript: {str(e)}"
+# Fetch caption segments from the YouTube transcript API and store them
+def fetch_youtube_segments(video_id):
+    transcript = YouTubeTranscriptApi.get_transcript(video_id)
+    segments = TranscriptSegments.from_entries(transcript or [])
+    if segments:
+        transcript_store.put(video_id, "youtube", segments)
+    return segments
 
 
 # Tool: Download YouTube Audio (reused, no status updates, returns directly)
@@ -137,114 +295,312 @@ def download_audio(youtube_url):
             return "Invalid YouTube URL", None
         audio_dir = "audio"
         os.makedirs(audio_dir, exist_ok=True)
+        info = get_video_info(youtube_url)
         ydl_opts = {
-            "format": "bestaudio/best",
+            "format": choose_audio_format(info),
             "outtmpl": f"{audio_dir}/{video_id}.%(ext)s",
         }
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(youtube_url, download=True) or {}
+            # Re-use the cached extraction instead of hitting YouTube again
+            result = ydl.process_ie_result(dict(info), download=True) or {}
 
-            return f"{audio_dir}/{video_id}.{info.get('ext', 'unknown')}", info.get(
-                "title", "Unknown Title"
+            return f"{audio_dir}/{video_id}.{result.get('ext', 'unknown')}", get_title(
+                info
             )
 
     except Exception as e:
         return f"Audio download failed: {str(e)}", None
 
 
-# Tool: Transcribe Audio with AssemblyAI (reused, no status updates, returns directly)
-def get_transcription(youtube_url):
-    if not aai.settings.api_key:
-        return "AssemblyAI API key is required for transcription", None
-
-    video_id = get_video_id(youtube_url)
-    if not video_id:
-        return "Invalid YouTube URL", None
-
-    transcripts_dir = os.path.join(os.getcwd(), "transcripts")
-    os.makedirs(transcripts_dir, exist_ok=True)
-    transcript_path = os.path.join(transcripts_dir, f"{video_id}.txt")
-
-    if os.path.exists(transcript_path):
-        with open(transcript_path, "r", encoding="utf-8") as f:
-            transcript_text = f.read()
-        video_title = get_youtube_title(
-            youtube_url
-        )  # Fetch title even if transcript is cached
-        return transcript_text, video_title
-
-    audio_file, video_title = download_audio(youtube_url)
-    if isinstance(audio_file, str) and audio_file.startswith("Audio download failed"):
-        return audio_file, None
-
+# Transcribe a downloaded audio file with AssemblyAI and store the utterance segments
+def transcribe_audio_segments(video_id, audio_file, video_title=None):
     transcriber = aai.Transcriber()
     config = aai.TranscriptionConfig(
         speaker_labels=True, punctuate=True, format_text=True
     )
     transcript_obj = transcriber.transcribe(audio_file, config)
+    if not transcript_obj.text:
+        return None
+
+    if transcript_obj.utterances:
+        segments = TranscriptSegments.from_entries(
+            {
+                "start": u.start / 1000,
+                "duration": (u.end - u.start) / 1000,
+                "text": u.text,
+            }
+            for u in transcript_obj.utterances
+        )
+    else:
+        segments = TranscriptSegments.from_entries(
+            [{"start": 0.0, "text": transcript_obj.text}]
+        )
+    transcript_store.put(video_id, "assemblyai", segments, title=video_title)
+    return segments
 
-    if transcript_obj.text:
-        with open(transcript_path, "w", encoding="utf-8") as f:
-            f.write(transcript_obj.text)
-        return transcript_obj.text, video_title
 
-    return "Failed to generate transcript", None
+def import_legacy_transcript(video_id):
+    # Transcripts cached as flat files before the store existed are imported once
+    legacy_path = os.path.join(os.getcwd(), "transcripts", f"{video_id}.txt")
+    if transcript_store.get(video_id, "assemblyai") is None:
+        transcript_store.import_legacy_file(video_id, legacy_path)
 
 
-# Tool: Create FAISS Vector Store (reused and adapted, no status updates)
-def create_vectorstore(text, video_id):
+# Tool: Create FAISS Vector Store (chunks cut on segment boundaries, with timestamps)
+def create_vectorstore(
+    segments,
+    video_id,
+    video_title="Unknown Title",
+    transcript_chunks=None,
+    progress=None,
+):
     if embeddings is None:
         raise HTTPException(
             status_code=500, detail="Embeddings service not initialized."
         )
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1500,
-        chunk_overlap=200,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""],
+    if transcript_chunks is None:
+        transcript_chunks = chunk_segments(
+            segments, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        )
+    chunks = [chunk.text for chunk in transcript_chunks]
+    metadatas = chunk_metadatas(transcript_chunks)
+
+    timings = []
+    vectors = batch_embedder.embed(
+        chunks,
+        on_progress=partial(progress, "embedding") if progress else None,
+        timings=timings,
+    )
+    if progress:
+        progress("indexing")
+    print(
+        f"Embedded {len(chunks)} chunks in {len(timings)} batches "
+        f"({sum(t['seconds'] for t in timings):.2f}s total batch time)"
     )
-    chunks = text_splitter.split_text(text)
-
-    metadatas = [
-        {"source": "transcript", "chunk": i, "total_chunks": len(chunks)}
-        for i in range(len(chunks))
-    ]
 
-    vectorstore = FAISS.from_texts(
-        texts=chunks, embedding=embeddings, metadatas=metadatas
+    # One bulk add into the index instead of embedding through FAISS
+    vectorstore = FAISS.from_embeddings(
+        text_embeddings=list(zip(chunks, vectors.tolist())),
+        embedding=embeddings,
+        metadatas=metadatas,
     )
-    video_data_store[video_id]["vectorstore"] = vectorstore
+    if INDEX_QUANTIZATION != "flat":
+        vectorstore.index = build_index(vectors, INDEX_QUANTIZATION)
+    index_store.save(video_id, vectorstore, {"video_title": video_title})
+    global_index.add(video_id, vectors, metadatas, chunks, title=video_title)
+    invalidate_video_caches(video_id)
     print(f"Vector store CREATED for video_id: {video_id}")
+    return vectorstore
+
+
+# Query embedding, memoized on the normalized text
+def embed_query(query):
+    key = (EMBEDDING_MODEL, normalize_query(query))
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        vector = embeddings.embed_query(key[1])
+        query_embedding_cache.set(key, vector)
+    return vector
+
+
+async def aembed_query(query):
+    key = (EMBEDDING_MODEL, normalize_query(query))
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        vector = await embeddings.aembed_query(key[1])
+        query_embedding_cache.set(key, vector)
+    return vector
+
+
+# Retrieval for chat with an adaptive k, memoized as scored chunk positions per (video, mode, query).
+# Also returns the token count of all RETRIEVAL_MAX_K candidates, the fixed-k baseline.
+def retrieve_chunks(video_id, entry, query, mode, query_vector=None):
+    key = (video_id, mode, normalize_query(query))
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        positions, scores, candidate_tokens = cached
+        docs = documents_at(entry["vectorstore"], positions)
+        return list(zip(docs, scores)), candidate_tokens
+    candidates = retrieve_scored(
+        entry,
+        key[2],
+        k=RETRIEVAL_MAX_K,
+        mode=mode,
+        embed_query=embed_query if query_vector is None else lambda _: query_vector,
+        rerank=index_rerank,
+    )
+    candidate_tokens = sum(estimate_tokens(doc.page_content) for doc, _ in candidates)
+    hits = adaptive_k(candidates, RETRIEVAL_SCORE_RATIO, RETRIEVAL_MIN_K)
+    retrieval_cache.set(
+        key,
+        (
+            [doc.metadata["chunk"] for doc, _ in hits],
+            [score for _, score in hits],
+            candidate_tokens,
+        ),
+    )
+    return hits, candidate_tokens
+
+
+# Cached retrievals and answers come from an index; drop them when it is rebuilt or deleted
+def invalidate_video_caches(video_id):
+    retrieval_cache.pop_matching(lambda key: key[0] == video_id)
+    answer_cache.invalidate(video_id)
+
+
+# Page a persisted index (and its stored transcript) back into memory
+def load_video_entry(video_id):
+    vectorstore = index_store.load(video_id)
+    if vectorstore is None:
+        return None
+
+    entry = {
+        "vectorstore": vectorstore,
+        "bm25": build_bm25(vectorstore),
+        "video_title": index_store.load_meta(video_id).get(
+            "video_title", "Unknown Title"
+        ),
+    }
+    cached = transcript_store.get(video_id)
+    if cached:
+        entry["segments"] = cached["segments"]
+        entry["transcript"] = cached["segments"].render()
+    print(f"Vector store LOADED from disk for video_id: {video_id}")
+    return entry
+
+
+# Make sure an evicted video can be paged back in instead of being re-processed
+def spill_video_entry(video_id, entry):
+    if entry.get("vectorstore") is not None and not index_store.exists(video_id):
+        index_store.save(
+            video_id,
+            entry["vectorstore"],
+            {"video_title": entry.get("video_title", "Unknown Title")},
+        )
+    print(f"Video {video_id} evicted from memory")
 
 
-# Tool: Chat with Video (reused and adapted, no status updates)
-def chat_with_video(query, video_id):
+def load_video_state(video_id):
+    entry = video_data_store.get(video_id)
+    if entry and entry.get("vectorstore") is not None:
+        return entry
+    return None
+
+
+# Search every processed video at once through the global index
+async def search_videos(query, k=20, max_videos=5):
+    started = time.perf_counter()
+    query_vector = await aembed_query(query)
+    results = await pools.run_io(
+        global_index.search, query_vector, k=k, max_videos=max_videos
+    )
+    return {
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# Sharding mode: the dispatcher sends each video to the worker owning it on a consistent-hash
+# ring of SHARD_WORKERS, so this worker (SHARD_SELF) only keeps its own slice of indexes hot
+SHARD_SELF = os.getenv("SHARD_SELF", "")
+shard_ring = HashRing(
+    [worker.strip() for worker in os.getenv("SHARD_WORKERS", "").split(",") if worker.strip()],
+    replicas=int(os.getenv("SHARD_REPLICAS", "128")),
+)
+
+
+def owns_video(video_id):
+    return not SHARD_SELF or not len(shard_ring) or shard_ring.owner(video_id) == SHARD_SELF
+
+
+# After a rebalance, page out the videos that moved to another worker (their indexes are on disk)
+def release_unowned_videos():
+    released = []
+    for video_id in list(video_data_store):
+        if owns_video(video_id):
+            continue
+        entry = video_data_store.peek(video_id)
+        if entry is not None:
+            spill_video_entry(video_id, entry)
+        video_data_store.discard(video_id)
+        released.append(video_id)
+    return released
+
+
+# Remove a video from memory, disk and the global index
+def delete_video(video_id):
+    video_data_store.discard(video_id)
+    artifact_store.delete(video_id)
+    window_summarizer.forget(video_id)
+    index_store.delete(video_id)
+    transcript_store.delete(video_id)
+    metadata_service.invalidate(video_id)
+    invalidate_video_caches(video_id)
+    return global_index.remove(video_id)
+
+
+# Chat prompt for a question, or the cached answer: returns (cached_answer, prompt, query_vector)
+async def prepare_chat(query, video_id, retrieval_mode=None, bypass_cache=False):
     print(f"Chat request received for video_id: {video_id}")
     if llm is None:
         raise HTTPException(status_code=500, detail="LLM service not initialized.")
-    if (
-        video_id not in video_data_store
-        or "vectorstore" not in video_data_store[video_id]
-        or video_data_store[video_id]["vectorstore"] is None
-    ):
+    retrieval_mode = retrieval_mode or RETRIEVAL_MODE
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"retrieval_mode must be one of {', '.join(RETRIEVAL_MODES)}.",
+        )
+
+    # bm25 retrieval never waits for the query embedding: the answer cache is
+    # checked for the exact question only, and on a miss the embedding is started
+    # in the background so the new answer can still be stored for paraphrases
+    query_vector = None
+    cached_answer = None
+    if retrieval_mode != "bm25":
+        query_vector = await aembed_query(query)
+        if ANSWER_CACHE_ENABLED and not bypass_cache:
+            cached_answer = answer_cache.get(video_id, query_vector)
+    elif ANSWER_CACHE_ENABLED:
+        if not bypass_cache:
+            cached_answer = answer_cache.get_exact(video_id, normalize_query(query))
+        if cached_answer is None:
+            query_vector = asyncio.ensure_future(aembed_query(query))
+            # Retrieve a failed embedding's error so it is not reported as unhandled
+            query_vector.add_done_callback(lambda f: f.cancelled() or f.exception())
+    if cached_answer is not None:
+        print(f"Answer cache hit for video_id: {video_id}")
+        return cached_answer, None, query_vector
+
+    entry = await pools.run_io(load_video_state, video_id)
+    if entry is None:
         raise HTTPException(
             status_code=400,
             detail="No vector database available for this video. Process video first.",
         )
 
-    vectorstore = video_data_store[video_id]["vectorstore"]
-    video_title = video_data_store[video_id].get("video_title", "Unknown Title")
+    video_title = entry.get("video_title", "Unknown Title")
 
     try:
-        docs = vectorstore.similarity_search(query, k=7)
+        hits, candidate_tokens = await pools.run_io(
+            retrieve_chunks,
+            video_id,
+            entry,
+            query,
+            retrieval_mode,
+            None if retrieval_mode == "bm25" else query_vector,
+        )
+        spans = build_context(hits, CHAT_CONTEXT_TOKEN_BUDGET, max_overlap=2 * CHUNK_OVERLAP)
         context_parts = []
-        for i, doc in enumerate(docs):
-            context = doc.page_content
-            # metadata = doc.metadata
-            context_parts.append(f"Context {i+1}: {context}")
+        for i, span in enumerate(spans):
+            context_parts.append(f"Context {i+1}: {span.text}")
 
         context = "\n\n".join(context_parts)
+        context_tokens = sum(estimate_tokens(span.text) for span in spans)
+        print(
+            f"Chat context: {len(hits)} of {RETRIEVAL_MAX_K} chunks in {len(spans)} spans, "
+            f"{context_tokens} tokens ({candidate_tokens - context_tokens} tokens saved)"
+        )
 
         print(query)
 
@@ -267,7 +623,52 @@ You are an AI assistant specialized in answering questions about YouTube videos
 
 ### ✅ Your Answer:
 """
-        response = llm.invoke(prompt)
+        return None, prompt, query_vector
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error generating answer: {str(e)}"
+        )
+
+
+def remember_answer(video_id, query, query_vector, answer):
+    if not ANSWER_CACHE_ENABLED or query_vector is None:
+        return
+    question = normalize_query(query)
+    if isinstance(query_vector, asyncio.Future):
+        # bm25 chats: exact repeats hit right away, paraphrases once the background embedding is ready
+        answer_cache.set(video_id, question, None, answer)
+        query_vector.add_done_callback(
+            lambda f: f.cancelled()
+            or f.exception()
+            or answer_cache.set(video_id, question, f.result(), answer)
+        )
+        return
+    answer_cache.set(video_id, question, query_vector, answer)
+
+
+# Tool: Chat with Video (reused and adapted, no status updates)
+async def chat_with_video(query, video_id, retrieval_mode=None, bypass_cache=False):
+    key = (
+        "chat",
+        video_id,
+        retrieval_mode or RETRIEVAL_MODE,
+        normalize_query(query),
+        bypass_cache,
+    )
+    return await single_flight.do(
+        key, partial(_chat_with_video, query, video_id, retrieval_mode, bypass_cache)
+    )
+
+
+async def _chat_with_video(query, video_id, retrieval_mode, bypass_cache):
+    cached_answer, prompt, query_vector = await prepare_chat(
+        query, video_id, retrieval_mode, bypass_cache
+    )
+    if cached_answer is not None:
+        return cached_answer
+    try:
+        response = await llm.ainvoke(prompt)
+        remember_answer(video_id, query, query_vector, response.content)
         return response.content
     except Exception as e:
         raise HTTPException(
@@ -275,111 +676,185 @@ You are an AI assistant specialized in answering questions about YouTube videos
         )
 
 
-# Tool: Summarize YouTube Video (reused and adapted, no status updates)
-def summarize_video(video_id: str):
-    if summary_inmem_db.get(video_id):
-        return summary_inmem_db[video_id]
-    
+# What summary and quiz prompts are built from: the whole transcript when it fits
+# one call, otherwise notes from a parallel pass over transcript windows
+async def transcript_for_prompt(video_id, entry):
+    transcript = entry["transcript"]
+    if len(transcript) <= SUMMARY_DIRECT_CHARS:
+        return "Transcript", transcript
+    windows = await pools.run_cpu(
+        split_windows, transcript, entry.get("segments"), SUMMARY_WINDOW_CHARS
+    )
+    started = time.perf_counter()
+    notes = await window_summarizer.condense(
+        llm,
+        video_id,
+        entry.get("video_title", "Unknown Title"),
+        windows,
+        SUMMARY_DIRECT_CHARS,
+    )
+    print(
+        f"Window notes for {video_id}: {len(windows)} windows, {len(notes)} chars "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return "Notes on consecutive parts of the transcript", notes
+
+
+# Instructions shared by the summary, quiz and combined bundle prompts; a change here
+# needs SUMMARY_PROMPT_VERSION / QUIZ_PROMPT_VERSION bumped
+SUMMARY_INSTRUCTIONS = """1. Provide a concise, well-structured summary of the video (100 words).
+2. Begin with a one-sentence overview of what the video is about.
+3. Identify and summarize 3-5 key points or topics discussed in the video.
+4. Include any important conclusions or takeaways.
+5. Organize the summary with clear paragraph breaks and bullet points where appropriate.
+6. If timestamps are available in the transcript ([MM:SS]), include the most important ones."""
+QUIZ_INSTRUCTIONS = """1. Create 5 meaningful multiple-choice questions that test understanding of key concepts from the video.
+2. For each question, provide 4 options (A, B, C, D) with only one correct answer.
+3. Ensure questions vary in difficulty from basic recall to critical thinking.
+4. Make sure to follow this EXACT format for each question and answer:
+   - Each question should have options labeled exactly as "A. [option text]", "B. [option text]", etc.
+   - The correct answer should be just the letter (A, B, C, or D)."""
+QUIZ_FORMAT_EXAMPLE = """        {"question": "Question text here", "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"], "answer": "A"},
+        {"question": "Question text here", "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"], "answer": "C"},
+        ...and so on for all 5 questions"""
+
+
+# Summary prompt for a video, or the cached summary: returns (cached_summary, prompt)
+# `entry` skips the video store lookup, e.g. while the video is still being processed
+async def prepare_summary(video_id: str, entry=None):
+    cached_summary = await pools.run_io(
+        artifact_store.get, video_id, "summary", SUMMARY_PROMPT_VERSION, LLM_MODEL
+    )
+    if cached_summary is not None:
+        return cached_summary, None
+    # A combined summary and quiz call (e.g. the warm-up) already covers it
+    summary, _ = await single_flight.wait(("bundle", video_id), (None, None))
+    if summary is not None:
+        return summary, None
+
     if llm is None:
         raise HTTPException(status_code=500, detail="LLM service not initialized.")
-    if (
-        video_id not in video_data_store
-        or "transcript" not in video_data_store[video_id]
-        or not video_data_store[video_id]["transcript"]
-    ):
+    if entry is None:
+        # The entry may have to be paged in from disk
+        entry = await pools.run_io(video_data_store.get, video_id)
+    if not entry or not entry.get("transcript"):
         raise HTTPException(
             status_code=400, detail="No transcript available. Process video first."
         )
 
-    transcript = video_data_store[video_id]["transcript"]
-    video_title = video_data_store[video_id].get("video_title", "Unknown Title")
+    video_title = entry.get("video_title", "Unknown Title")
+    label, source = await transcript_for_prompt(video_id, entry)
 
     prompt = f"""
 You are an expert at summarizing YouTube videos.
 
 Video Title: {video_title}
 
-Transcript: {transcript[:50000]}
+{label}: {source}
 Instructions:
-1. Provide a concise, well-structured summary of the video (100 words).
-2. Begin with a one-sentence overview of what the video is about.
-3. Identify and summarize 3-5 key points or topics discussed in the video.
-4. Include any important conclusions or takeaways.
-5. Organize the summary with clear paragraph breaks and bullet points where appropriate.
-6. If timestamps are available in the transcript ([MM:SS]), include the most important ones.
+{SUMMARY_INSTRUCTIONS}
 
 Your summary:
 """
-    response = llm.invoke(prompt)
-    summary_inmem_db[video_id] = response.content
-    print(summary_inmem_db)
+    return None, prompt
+
+
+async def remember_summary(video_id: str, summary: str):
+    await pools.run_io(
+        artifact_store.put, video_id, "summary", SUMMARY_PROMPT_VERSION, LLM_MODEL, summary
+    )
+
+
+# Tool: Summarize YouTube Video (reused and adapted, no status updates)
+async def summarize_video(video_id: str, entry=None):
+    return await single_flight.do(
+        ("summary", video_id), partial(_summarize_video, video_id, entry)
+    )
+
+
+async def _summarize_video(video_id: str, entry=None):
+    cached_summary, prompt = await prepare_summary(video_id, entry)
+    if cached_summary is not None:
+        return cached_summary
+    response = await llm.ainvoke(prompt)
+    await remember_summary(video_id, response.content)
     return response.content
 
 
+# The JSON object in an LLM response, without surrounding code fences or prose
+def extract_json_text(text):
+    # Process the response to extract just the JSON part (from Streamlit code)
+    if isinstance(text, list):
+        text = " ".join(str(item) for item in text)  # Convert list to a string
+
+    json_match = re.search(r"```json\s*(.*?)\s*```", text, re.DOTALL)
+    if json_match:
+        return json_match.group(1)
+    json_match = re.search(r"({.*})", text, re.DOTALL)
+    if json_match:
+        return json_match.group(1)
+    return text
+
+
 # Tool: Generate Quiz from YouTube Video (reused and adapted, no status updates)
-def generate_quiz(video_id):
+async def generate_quiz(video_id, entry=None):
+    return await single_flight.do(
+        ("quiz", video_id), partial(_generate_quiz, video_id, entry)
+    )
+
+
+async def _generate_quiz(video_id, entry=None):
+    cached_quiz = await pools.run_io(
+        artifact_store.get, video_id, "quiz", QUIZ_PROMPT_VERSION, LLM_MODEL
+    )
+    if cached_quiz is not None:
+        return cached_quiz
+    _, quiz = await single_flight.wait(("bundle", video_id), (None, None))
+    if quiz is not None:
+        return quiz
+
     if llm is None:
         raise HTTPException(status_code=500, detail="LLM service not initialized.")
-    if (
-        video_id not in video_data_store
-        or "transcript" not in video_data_store[video_id]
-        or not video_data_store[video_id]["transcript"]
-    ):
+    if entry is None:
+        entry = await pools.run_io(video_data_store.get, video_id)
+    if not entry or not entry.get("transcript"):
         raise HTTPException(
             status_code=400, detail="No transcript available. Process video first."
         )
 
-    transcript = video_data_store[video_id]["transcript"]
-    video_title = video_data_store[video_id].get("video_title", "Unknown Title")
+    video_title = entry.get("video_title", "Unknown Title")
+    label, source = await transcript_for_prompt(video_id, entry)
 
     prompt = f"""
 You are an expert educator. Based on the following YouTube video transcript and title, please generate a five-question multiple choice quiz.
 
 Video Title: {video_title}
-Transcript: {transcript[:50000]}  # Use first 50K characters if transcript is too long
+{label}: {source}
 
 Instructions:
-1. Create 5 meaningful multiple-choice questions that test understanding of key concepts from the video.
-2. For each question, provide 4 options (A, B, C, D) with only one correct answer.
-3. Ensure questions vary in difficulty from basic recall to critical thinking.
-4. Make sure to follow this EXACT format for each question and answer:
-   - Each question should have options labeled exactly as "A. [option text]", "B. [option text]", etc.
-   - The correct answer should be just the letter (A, B, C, or D).
+{QUIZ_INSTRUCTIONS}
 5. Format the output as a valid JSON object with EXACTLY this structure - this is critical:
 
 {{
     "quiz": [
-        {{"question": "Question text here", "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"], "answer": "A"}},
-        {{"question": "Question text here", "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"], "answer": "C"}},
-        ...and so on for all 5 questions
+{QUIZ_FORMAT_EXAMPLE}
     ]
 }}
 
 IMPORTANT: Your response must be ONLY the JSON object with no additional text or explanations before or after it.
 """
-    response = llm.invoke(prompt)
-    quiz_text = response.content  # Get the raw text content from the LLM response
-
-    # Process the response to extract just the JSON part (from Streamlit code)
-    if isinstance(quiz_text, list):
-        quiz_text = " ".join(
-            str(item) for item in quiz_text
-        )  # Convert list to a string
-
-    # Now, process the response to extract the JSON part
-    json_match = re.search(r"```json\s*(.*?)\s*```", quiz_text, re.DOTALL)
-    if json_match:
-        quiz_text = json_match.group(1)
-    else:
-        json_match = re.search(r"({.*})", quiz_text, re.DOTALL)
-        if json_match:
-            quiz_text = json_match.group(1)
+    response = await llm.ainvoke(prompt)
+    quiz_text = extract_json_text(response.content)
 
     # Validate the JSON and parse it
     try:
         quiz_json_data = json.loads(
             quiz_text
         )  # This will raise an exception if invalid
+        # Only parsed quizzes are cached; a malformed one is regenerated next time
+        await pools.run_io(
+            artifact_store.put, video_id, "quiz", QUIZ_PROMPT_VERSION, LLM_MODEL, quiz_json_data
+        )
         return quiz_json_data  # Return the parsed JSON data
     except json.JSONDecodeError as e:
         print(f"Warning: Quiz content was not valid JSON after extraction. Error: {e}")
@@ -389,64 +864,283 @@ IMPORTANT: Your response must be ONLY the JSON object with no additional text or
         }  # Return raw text and error info
 
 
-# Intelligent Transcript Acquisition Logic (reused and adapted, no status updates)
-def smart_get_transcript(url):
-    transcript = get_youtube_transcript(url)
-    if (
-        transcript
-        and not transcript.startswith("Failed")
-        and not transcript.startswith("Invalid")
-        and not transcript.startswith("Transcript is empty")
-    ):
-        return transcript, get_youtube_title(url)
+# Summary and quiz from one LLM call, so the transcript is sent once: returns
+# (summary, quiz), or (None, None) when the response cannot be parsed
+async def _generate_bundle(video_id, entry):
+    video_title = entry.get("video_title", "Unknown Title")
+    label, source = await transcript_for_prompt(video_id, entry)
 
-    transcript, title = get_transcription(url)
-    if (
-        transcript
-        and not transcript.startswith("Failed")
-        and not transcript.startswith("Audio download failed")
-    ):
-        return transcript, title
+    prompt = f"""
+You are an expert at summarizing YouTube videos and an expert educator. Based on the following YouTube video transcript and title, please write a summary of the video and generate a five-question multiple choice quiz.
 
-    return None, None
+Video Title: {video_title}
+{label}: {source}
+
+Summary instructions:
+{SUMMARY_INSTRUCTIONS}
+
+Quiz instructions:
+{QUIZ_INSTRUCTIONS}
+
+Format the output as a valid JSON object with EXACTLY this structure - this is critical:
+
+{{
+    "summary": "The summary text, with line breaks written as \\n",
+    "quiz": [
+{QUIZ_FORMAT_EXAMPLE}
+    ]
+}}
+
+IMPORTANT: Your response must be ONLY the JSON object with no additional text or explanations before or after it.
+"""
+    response = await llm.ainvoke(prompt)
+    try:
+        data = json.loads(extract_json_text(response.content))
+    except json.JSONDecodeError as e:
+        print(f"Warning: Bundle content was not valid JSON after extraction. Error: {e}")
+        return None, None
+    if not isinstance(data.get("summary"), str) or not isinstance(data.get("quiz"), list):
+        print("Warning: Bundle content is missing the summary or the quiz.")
+        return None, None
+
+    # Same instructions as the separate prompts, so both are stored as the regular artifacts
+    summary, quiz = data["summary"], {"quiz": data["quiz"]}
+    await remember_summary(video_id, summary)
+    await pools.run_io(
+        artifact_store.put, video_id, "quiz", QUIZ_PROMPT_VERSION, LLM_MODEL, quiz
+    )
+    return summary, quiz
+
+
+# Fill in a missing summary and quiz. With `combined`, both missing come from one LLM
+# call; otherwise (or when that call fails, or either one is already being generated)
+# they are generated separately and concurrently
+async def generate_artifacts(video_id, entry, summary, quiz, combined=True):
+    in_flight = ("summary", video_id) in single_flight or ("quiz", video_id) in single_flight
+    if combined and summary is None and quiz is None and not in_flight:
+        summary, quiz = await single_flight.do(
+            ("bundle", video_id), partial(_generate_bundle, video_id, entry)
+        )
+    missing = {}
+    if summary is None:
+        missing["summary"] = summarize_video(video_id, entry)
+    if quiz is None:
+        missing["quiz"] = generate_quiz(video_id, entry)
+    generated = dict(zip(missing, await asyncio.gather(*missing.values())))
+    return generated.get("summary", summary), generated.get("quiz", quiz)
+
+
+# Everything a client shows for a processed video; see generate_artifacts for `combined`
+async def video_bundle(video_id, combined=True):
+    entry = await pools.run_io(video_data_store.get, video_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Video not processed.")
+
+    summary, quiz = await asyncio.gather(
+        pools.run_io(artifact_store.get, video_id, "summary", SUMMARY_PROMPT_VERSION, LLM_MODEL),
+        pools.run_io(artifact_store.get, video_id, "quiz", QUIZ_PROMPT_VERSION, LLM_MODEL),
+    )
+    transcript = entry.get("transcript")
+    if transcript and (summary is None or quiz is None):
+        if llm is None:
+            raise HTTPException(status_code=500, detail="LLM service not initialized.")
+        summary, quiz = await generate_artifacts(video_id, entry, summary, quiz, combined)
+
+    segments = entry.get("segments")
+    return {
+        "video_id": video_id,
+        "video_title": entry.get("video_title", "Unknown Title"),
+        "chapters": entry.get("chapters", []),
+        "transcript": {
+            "available": bool(transcript),
+            "indexed": entry.get("vectorstore") is not None,
+            "characters": len(transcript or ""),
+            "segments": len(segments) if segments is not None else 0,
+            "duration": segments.end(len(segments) - 1) if segments else None,
+        },
+        "summary": summary,
+        "quiz": quiz,
+    }
+
+
+# Adapters returning None on failure, used by the concurrent acquisition pipeline
+def _fetch_youtube_segments(video_id):
+    try:
+        return fetch_youtube_segments(video_id) or None
+    except Exception as e:
+        print(f"Failed to get transcript for {video_id}: {e}")
+        return None
+
+
+def _download_audio_file(url):
+    if not aai.settings.api_key:
+        return None
+    audio_file, title = download_audio(url)
+    if title is None:
+        return None
+    return audio_file
+
+
+def _discard_audio_file(audio_file):
+    # A speculative download lost the race to the captions
+    try:
+        os.remove(audio_file)
+    except FileNotFoundError:
+        pass
+
+
+def _transcribe_audio_file(video_id, audio_file):
+    try:
+        return transcribe_audio_segments(video_id, audio_file)
+    except Exception as e:
+        print(f"Failed to transcribe audio for {video_id}: {e}")
+        return None
+
+
+# Intelligent Transcript Acquisition Logic (returns TranscriptSegments and the title)
+async def smart_get_transcript(url):
+    # A stored transcript (from either source) costs one local lookup
+    video_id = get_video_id(url)
+    if not video_id:
+        return None, None
+    if aai.settings.api_key:
+        await pools.run_io(import_legacy_transcript, video_id)
+    cached = await pools.run_io(transcript_store.get, video_id)
+    if cached:
+        title = cached["title"]
+        if not title:
+            title = await pools.run_io(get_youtube_title, url)
+            if not title.startswith("Unknown Title"):
+                await pools.run_io(transcript_store.set_title, video_id, title)
+        return cached["segments"], title
+
+    result = await acquire_transcript(
+        fetch_metadata=partial(get_youtube_title, url),
+        fetch_transcript=partial(_fetch_youtube_segments, video_id),
+        download_audio=partial(_download_audio_file, url),
+        transcribe_audio=partial(_transcribe_audio_file, video_id),
+        audio_deadline=(
+            AUDIO_SPECULATION_DEADLINE
+            if aai.settings.api_key and AUDIO_SPECULATION_DEADLINE >= 0
+            else None
+        ),
+        run_blocking=pools.run_io,
+        discard_audio=_discard_audio_file,
+    )
+    print(f"Transcript acquisition for {video_id}: {result.source} {result.timings}")
+    if not result.transcript:
+        return None, None
+
+    title = result.metadata
+    if not title.startswith("Unknown Title"):
+        await pools.run_io(transcript_store.set_title, video_id, title)
+    return result.transcript, title
+
+
+# Summary and quiz are generated in the background as soon as a transcript is ready, so the
+# requests that usually follow /process_video/ find them cached or attach to the running call
+WARMUP_ARTIFACTS = [
+    kind.strip()
+    for kind in os.getenv("WARMUP_ARTIFACTS", "summary,quiz").split(",")
+    if kind.strip()
+]
+warmup_tasks = set()
+
+
+async def warm_up_artifacts(video_id, entry):
+    generators = {"summary": summarize_video, "quiz": generate_quiz}
+    kinds = [kind for kind in WARMUP_ARTIFACTS if kind in generators]
+    started = time.perf_counter()
+    if len(kinds) == len(generators):
+        # Both wanted: one combined call sends the transcript once, unless either is stored
+        try:
+            summary, quiz = await asyncio.gather(
+                pools.run_io(
+                    artifact_store.get, video_id, "summary", SUMMARY_PROMPT_VERSION, LLM_MODEL
+                ),
+                pools.run_io(artifact_store.get, video_id, "quiz", QUIZ_PROMPT_VERSION, LLM_MODEL),
+            )
+            await generate_artifacts(video_id, entry, summary, quiz)
+        except Exception as e:
+            print(f"Warm-up for {video_id} failed: {getattr(e, 'detail', e)}")
+    else:
+        results = await asyncio.gather(
+            *(generators[kind](video_id, entry) for kind in kinds), return_exceptions=True
+        )
+        for kind, result in zip(kinds, results):
+            if isinstance(result, BaseException):
+                print(f"Warm-up {kind} for {video_id} failed: {getattr(result, 'detail', result)}")
+    print(f"Warm-up for {video_id} ({', '.join(kinds)}) took {time.perf_counter() - started:.2f}s")
+
+
+def schedule_warmup(video_id, entry):
+    if not WARMUP_ARTIFACTS or llm is None:
+        return
+    # Keep a reference so the task is not garbage collected while it runs
+    task = asyncio.ensure_future(warm_up_artifacts(video_id, entry))
+    warmup_tasks.add(task)
+    task.add_done_callback(warmup_tasks.discard)
 
 
 # Direct video processing function (reused and adapted, no status updates, manages state)
-def process_video(url):
+# `progress(stage, done=None, total=None)` hears about each stage, e.g. from a job
+async def process_video(url, progress=None):
     video_id = get_video_id(url)
     if not video_id:
         raise HTTPException(status_code=400, detail="Invalid YouTube URL.")
+    # The "already processed" check below only sees finished work, so
+    # concurrent requests for a new video must share one run
+    return await single_flight.do(
+        ("process", video_id), partial(_process_video, url, video_id, progress)
+    )
 
-    # If video is already processed with vectorstore, return success immediately
-    if (
-        video_id in video_data_store
-        and "vectorstore" in video_data_store[video_id]
-        and video_data_store[video_id]["vectorstore"] is not None
-    ):
+
+async def _process_video(url, video_id, progress=None):
+    progress = progress or (lambda stage, done=None, total=None: None)
+
+    # If video is already processed with vectorstore (in memory or on disk), return success immediately
+    entry = await pools.run_io(load_video_state, video_id)
+    if entry is not None:
         return {
             "message": "Video already processed",
-            "video_title": video_data_store[video_id].get(
-                "video_title", "Unknown Title"
-            ),
+            "video_title": entry.get("video_title", "Unknown Title"),
             "video_id": video_id,
         }
 
-    if video_id not in video_data_store:
-        video_data_store[video_id] = {}
-
-    video_title = get_youtube_title(url)
-    video_data_store[video_id]["video_title"] = video_title
-
-    transcript, title = smart_get_transcript(url)
-    if title:  # In case AssemblyAI was used and title was fetched there
-        video_data_store[video_id]["video_title"] = title
+    # Built locally and published once complete, so eviction never sees a half-built entry
+    entry = {}
+    progress("transcript")
+    transcript, video_title = await smart_get_transcript(url)
+    entry["video_title"] = video_title or "Unknown Title"
+    # Chapters come from the cached metadata record, never from a new extraction
+    entry["chapters"] = get_chapters(metadata_service.cache.get(video_id) or {})
 
     if transcript:
-        video_data_store[video_id]["transcript"] = transcript
-        create_vectorstore(transcript, video_id)
+        # Segments stay array-backed; the legacy string is rendered once for the prompts
+        entry["segments"] = transcript
+        entry["transcript"] = transcript.render()
+        schedule_warmup(video_id, entry)
+        progress("chunking")
+        transcript_chunks = await pools.run_cpu(
+            chunk_segments, transcript, CHUNK_SIZE, CHUNK_OVERLAP
+        )
+        entry["vectorstore"] = await pools.run_io(
+            create_vectorstore,
+            transcript,
+            video_id,
+            entry["video_title"],
+            transcript_chunks,
+            progress,
+        )
+        # Same texts in the same order as the FAISS docstore
+        entry["bm25"] = await pools.run_cpu(
+            BM25Index, [chunk.text for chunk in transcript_chunks]
+        )
+        # Sizing the entry, and spilling whatever it evicts, happens off the loop
+        await pools.run_io(video_data_store.__setitem__, video_id, entry)
         return {
             "message": "Video processing complete",
-            "video_title": video_title,
+            "video_title": entry["video_title"],
             "video_id": video_id,
         }
     else:
@@ -456,9 +1150,38 @@ def process_video(url):
         )
 
 
+# Background jobs: POST /jobs/process returns at once and the pipeline runs on a job worker
+async def process_video_job(payload, progress):
+    return await process_video(payload["video_url"], progress=progress)
+
+
+job_manager = JobManager(
+    JobStore(os.path.join(DATA_DIR, "jobs.db")),
+    handlers={"process": process_video_job},
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    run_io=pools.run_io,
+    keep_finished=int(os.getenv("JOB_KEEP_FINISHED", "1000")),
+    lease=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+)
+
+
 # --- FastAPI Routes ---
 
 
+def int_field(body, name, default, minimum=None):
+    """Reads an integer from a JSON body, raising a 400 for anything else."""
+    value = body.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer.")
+    try:
+        number = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer.")
+    if minimum is not None and number < minimum:
+        raise HTTPException(status_code=400, detail=f"{name} must be at least {minimum}.")
+    return number
+
+
 @app.post("/process_video/")
 async def process_video_route(request: Request):
     """Processes a YouTube video by fetching the transcript and creating a vector store."""
@@ -469,7 +1192,7 @@ async def process_video_route(request: Request):
         if not video_url:
             raise HTTPException(status_code=400, detail="Video URL is required.")
 
-        result = process_video(video_url)
+        result = await process_video(video_url)
         return JSONResponse(content=result)
     except HTTPException as e:
         return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
@@ -477,6 +1200,55 @@ async def process_video_route(request: Request):
         return JSONResponse(content={"detail": str(e)}, status_code=500)
 
 
+@app.post("/jobs/process")
+async def submit_process_job_route(request: Request):
+    """Queues a video for processing and returns the job right away."""
+    try:
+        body = await request.json()
+        video_url = body.get("video_url")
+        if not video_url:
+            raise HTTPException(status_code=400, detail="Video URL is required.")
+        video_id = get_video_id(video_url)
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Invalid YouTube URL.")
+
+        # A video already queued or running is not queued twice
+        job = await job_manager.submit(
+            "process",
+            {"video_url": video_url, "video_id": video_id},
+            priority=int_field(body, "priority", 0),
+            key=f"process:{video_id}",
+        )
+        return JSONResponse(content=job, status_code=202)
+    except HTTPException as e:
+        return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=500)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_route(job_id: str, since: int = -1, wait: float = 0.0):
+    """Job status with per-stage progress; `wait` seconds long-polls for a version newer than `since`."""
+    job = await job_manager.wait(job_id, since=since, timeout=min(max(wait, 0.0), 60.0))
+    if job is None:
+        return JSONResponse(content={"detail": "Job not found."}, status_code=404)
+    return JSONResponse(content=job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_route(job_id: str):
+    """Streams every job update as server-sent events until the job finishes."""
+    if await job_manager.get(job_id) is None:
+        return JSONResponse(content={"detail": "Job not found."}, status_code=404)
+
+    async def events():
+        async for job in job_manager.events(job_id):
+            finished = job["status"] in TERMINAL_STATUSES
+            yield sse_event(job, event="done" if finished else "progress")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.post("/chat_with_video/")
 async def chat_with_video_route(request: Request):
     """Chats with a processed YouTube video using a query."""
@@ -490,7 +1262,12 @@ async def chat_with_video_route(request: Request):
         if not query:
             raise HTTPException(status_code=400, detail="Query is required.")
 
-        answer = chat_with_video(query, video_id)
+        answer = await chat_with_video(
+            query,
+            video_id,
+            body.get("retrieval_mode"),
+            bypass_cache=bool(body.get("bypass_cache", False)),
+        )
         return JSONResponse(content={"answer": answer})
     except HTTPException as e:
         # Explicitly return detail from HTTPException in JSON response for 4xx errors
@@ -503,6 +1280,47 @@ async def chat_with_video_route(request: Request):
         )
 
 
+@app.post("/chat_with_video/stream")
+async def chat_with_video_stream_route(request: Request):
+    """Streams the chat answer as server-sent events while it is generated."""
+    try:
+        body = await request.json()
+        video_id = body.get("video_id")
+        query = body.get("query")
+
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Video ID is required.")
+        if not query:
+            raise HTTPException(status_code=400, detail="Query is required.")
+
+        # Validation, cache lookup and retrieval happen before the stream opens,
+        # so their errors still get a proper status code
+        cached_answer, prompt, query_vector = await prepare_chat(
+            query,
+            video_id,
+            body.get("retrieval_mode"),
+            bool(body.get("bypass_cache", False)),
+        )
+        if cached_answer is not None:
+            events = stream_text(cached_answer)
+        else:
+            events = stream_llm(
+                llm,
+                prompt,
+                partial(remember_answer, video_id, query, query_vector),
+            )
+        return StreamingResponse(
+            events, media_type="text/event-stream", headers=SSE_HEADERS
+        )
+    except HTTPException as e:
+        return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
+    except Exception as e:
+        print(f"Server error in chat_with_video_stream_route: {e}")
+        return JSONResponse(
+            content={"detail": "Internal server error"}, status_code=500
+        )
+
+
 @app.post("/summarize_video/")
 async def summarize_video_route(request: Request):
     """Summarizes a processed YouTube video."""
@@ -514,7 +1332,7 @@ async def summarize_video_route(request: Request):
         if not video_id:
             raise HTTPException(status_code=400, detail="Video ID is required.")
 
-        summary = summarize_video(video_id)
+        summary = await summarize_video(video_id)
         print(f"summarize_video: summarized video")
         return JSONResponse(content={"summary": summary})
     except HTTPException as e:
@@ -523,6 +1341,36 @@ async def summarize_video_route(request: Request):
         return JSONResponse(content={"detail": str(e)}, status_code=500)
 
 
+@app.post("/summarize_video/stream")
+async def summarize_video_stream_route(request: Request):
+    """Streams the video summary as server-sent events while it is generated."""
+    try:
+        body = await request.json()
+        video_id = body.get("video_id")
+
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Video ID is required.")
+
+        if ("summary", video_id) in single_flight:
+            # A summary is already being generated (e.g. by the warm-up): wait for it
+            events = stream_text(await summarize_video(video_id))
+            return StreamingResponse(
+                events, media_type="text/event-stream", headers=SSE_HEADERS
+            )
+        cached_summary, prompt = await prepare_summary(video_id)
+        if cached_summary is not None:
+            events = stream_text(cached_summary)
+        else:
+            events = stream_llm(llm, prompt, partial(remember_summary, video_id))
+        return StreamingResponse(
+            events, media_type="text/event-stream", headers=SSE_HEADERS
+        )
+    except HTTPException as e:
+        return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=500)
+
+
 @app.post("/generate_quiz/")
 async def generate_quiz_route(request: Request):
     """Generates a quiz for a processed YouTube video."""
@@ -533,7 +1381,7 @@ async def generate_quiz_route(request: Request):
         if not video_id:
             raise HTTPException(status_code=400, detail="Video ID is required.")
 
-        quiz = generate_quiz(video_id)
+        quiz = await generate_quiz(video_id)
         return JSONResponse(content={"quiz": quiz})
     except HTTPException as e:
         return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
@@ -541,6 +1389,84 @@ async def generate_quiz_route(request: Request):
         return JSONResponse(content={"detail": str(e)}, status_code=500)
 
 
+@app.get("/videos/{video_id}/bundle")
+async def video_bundle_route(video_id: str, combined: bool = True):
+    """Returns metadata, transcript status, summary and quiz of a processed video at once."""
+    try:
+        return JSONResponse(content=await video_bundle(video_id, combined=combined))
+    except HTTPException as e:
+        return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=500)
+
+
+@app.post("/search/")
+async def search_route(request: Request):
+    """Searches the transcripts of every processed video."""
+    try:
+        body = await request.json()
+        query = body.get("query")
+        if not query:
+            raise HTTPException(status_code=400, detail="Query is required.")
+
+        k = int_field(body, "k", 20, minimum=1)
+        max_videos = int_field(body, "max_videos", 5, minimum=1)
+        result = await search_videos(query, k=k, max_videos=max_videos)
+        return JSONResponse(content=result)
+    except HTTPException as e:
+        return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=500)
+
+
+@app.delete("/videos/{video_id}")
+async def delete_video_route(video_id: str):
+    """Deletes a processed video and its vectors from every index."""
+    try:
+        removed = await pools.run_io(delete_video, video_id)
+        return JSONResponse(content={"video_id": video_id, "removed_chunks": removed})
+    except Exception as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=500)
+
+
+@app.put("/shard/ring")
+async def shard_ring_route(request: Request):
+    """Sets the worker list of the sharding ring and releases videos this worker no longer owns."""
+    try:
+        body = await request.json()
+        workers = body.get("workers")
+        if not isinstance(workers, list):
+            raise HTTPException(status_code=400, detail="A list of workers is required.")
+
+        shard_ring.set_nodes(workers)
+        released = await pools.run_io(release_unowned_videos)
+        print(f"Shard ring now {shard_ring.nodes}; released {len(released)} videos")
+        return JSONResponse(content={"workers": shard_ring.nodes, "released": released})
+    except HTTPException as e:
+        return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=500)
+
+
+@app.get("/cache_stats/")
+async def cache_stats():
+    """Hit/miss counters for the caches in front of remote services."""
+    return {
+        "embeddings": batch_embedder.cache.stats(),
+        "metadata": metadata_service.cache.stats(),
+        "video_store": video_data_store.stats(),
+        "artifacts": artifact_store.stats(),
+        "window_notes": window_notes_store.stats(),
+        "query_embeddings": query_embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "answers": answer_cache.stats(),
+        "pools": pools.stats(),
+        "single_flight": single_flight.stats(),
+        "jobs": job_manager.stats(),
+        "shard": {"self": SHARD_SELF, **shard_ring.stats()},
+    }
+
+
 @app.get("/health/")
 async def health_check():
     """Health check endpoint."""
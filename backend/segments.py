@@ -0,0 +1,127 @@
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    secs = int(seconds % 60)
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class TranscriptSegments:
+    """Array-backed transcript: start/duration arrays plus one joined text buffer.
+
+    Segment `i` is `text[offsets[i]:offsets[i + 1]]`; segments are joined with a
+    single space, so `offsets[i + 1] - 1` is the end of segment `i` for every
+    segment but the last. Starts are assumed non-decreasing, which lets time
+    and offset lookups use binary search.
+    """
+
+    __slots__ = ("starts", "durations", "text", "offsets")
+
+    SEPARATOR = " "
+
+    def __init__(
+        self,
+        starts: np.ndarray,
+        durations: np.ndarray,
+        text: str,
+        offsets: np.ndarray,
+    ):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.durations = np.asarray(durations, dtype=np.float32)
+        self.text = text
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]]) -> "TranscriptSegments":
+        """Build from `{"start", "duration", "text"}` dicts in one linear pass."""
+        starts: List[float] = []
+        durations: List[float] = []
+        texts: List[str] = []
+        offsets = [0]
+        position = 0
+        sep = len(cls.SEPARATOR)
+        for entry in entries:
+            text = entry["text"]
+            starts.append(float(entry["start"]))
+            durations.append(float(entry.get("duration", 0.0)))
+            texts.append(text)
+            position += len(text) + sep
+            offsets.append(position)
+        return cls(
+            np.array(starts, dtype=np.float64),
+            np.array(durations, dtype=np.float32),
+            cls.SEPARATOR.join(texts),
+            np.array(offsets, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+
+    def segment_text(self, i: int) -> str:
+        return self.text[self.offsets[i] : self.offsets[i + 1] - len(self.SEPARATOR)]
+
+    def end(self, i: int) -> float:
+        return float(self.starts[i] + self.durations[i])
+
+    def time_to_index(self, seconds: float) -> int:
+        """Index of the segment playing at `seconds` (clamped to the first one)."""
+        return max(int(np.searchsorted(self.starts, seconds, side="right")) - 1, 0)
+
+    def offset_to_index(self, offset: int) -> int:
+        """Index of the segment containing character `offset` of `text`."""
+        index = int(np.searchsorted(self.offsets, offset, side="right")) - 1
+        return min(max(index, 0), len(self) - 1)
+
+    def time_to_offset(self, seconds: float) -> int:
+        return int(self.offsets[self.time_to_index(seconds)])
+
+    def offset_to_time(self, offset: int) -> float:
+        return float(self.starts[self.offset_to_index(offset)])
+
+    def to_entries(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "start": float(self.starts[i]),
+                "duration": float(self.durations[i]),
+                "text": self.segment_text(i),
+            }
+            for i in range(len(self))
+        ]
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "start": self.starts.tolist(),
+            "duration": self.durations.tolist(),
+            "text": self.text,
+            "offsets": self.offsets.tolist(),
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "TranscriptSegments":
+        return cls(
+            np.array(payload["start"], dtype=np.float64),
+            np.array(payload["duration"], dtype=np.float32),
+            payload["text"],
+            np.array(payload["offsets"], dtype=np.int64),
+        )
+
+    def render(self) -> str:
+        """Render in the legacy `[MM:SS] text ` format the prompts expect."""
+        return "".join(
+            f"[{format_timestamp(self.starts[i])}] {self.segment_text(i)} "
+            for i in range(len(self))
+        )
+
+    def nbytes(self) -> int:
+        return (
+            self.starts.nbytes
+            + self.durations.nbytes
+            + self.offsets.nbytes
+            + len(self.text.encode("utf-8"))
+        )
@@ -0,0 +1,76 @@
+import bisect
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from youtube import get_video_id
+
+
+def request_video_id(path: str, body: Any) -> Optional[str]:
+    """The video a request is about: `/videos/{id}/...`, or `video_id` / `video_url` in its body."""
+    parts = path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "videos":
+        return parts[1]
+    if isinstance(body, dict):
+        if body.get("video_id"):
+            return str(body["video_id"])
+        if body.get("video_url"):
+            return get_video_id(str(body["video_url"]))
+    return None
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring assigning video ids to workers.
+
+    Each worker is placed at `replicas` points on a 64-bit ring and a key
+    belongs to the first point at or after its hash. Adding or removing a
+    worker only moves the keys between its points and their neighbours,
+    about 1/N of them, and every other key keeps its owner.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self._points: List[Tuple[int, str]] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self.replicas):
+            bisect.insort(self._points, (_hash(f"{node}#{i}"), node))
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        self._points = [point for point in self._points if point[1] != node]
+
+    def set_nodes(self, nodes: Iterable[str]) -> None:
+        """Move to a new membership, touching only the workers that joined or left."""
+        nodes = list(dict.fromkeys(nodes))
+        for node in [node for node in self._nodes if node not in nodes]:
+            self.remove(node)
+        for node in nodes:
+            self.add(node)
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        position = bisect.bisect_left(self._points, (_hash(key), ""))
+        return self._points[position % len(self._points)][1]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"nodes": self.nodes, "replicas": self.replicas}
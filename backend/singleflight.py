@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def _consume_result(task: "asyncio.Task") -> None:
+    # Every waiter may have been cancelled; the outcome must still count as retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls that share a key.
+
+    The first caller for a key starts the computation as a task; callers
+    arriving while it is in flight await the same task and get the same
+    result or exception. The key is released as soon as the task finishes,
+    so later calls compute afresh (and hit whatever cache the computation
+    filled). A cancelled caller does not cancel the shared computation.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task"] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            task.add_done_callback(_consume_result)
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def wait(self, key: Hashable, default: Any = None) -> Any:
+        """Result of the call in flight for `key`, or `default` when none is."""
+        task = self._inflight.get(key)
+        if task is None:
+            return default
+        self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: "asyncio.Task") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
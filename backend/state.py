@@ -0,0 +1,310 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+
+class StateBackend:
+    """Byte-valued key/value store that API workers share.
+
+    Transcripts, generated artifacts and serialized indexes are kept here
+    under prefixed keys (`transcript:`, `artifact:`, `index:`), so any
+    worker, on any node that reaches the same backend, sees what another
+    one produced. `ttl` is in seconds; None keeps the value until deleted.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self, prefix: str = "") -> List[str]:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        for key in self.keys(prefix):
+            self.delete(key)
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryState(StateBackend):
+    """In-process backend: shared by the threads of one worker only."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key, time.time())
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl is not None else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self, prefix: str = "") -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [
+                key
+                for key in list(self._data)
+                if key.startswith(prefix) and self._live(key, now) is not None
+            ]
+
+
+class SQLiteState(StateBackend):
+    """Backend in one SQLite file (WAL mode), shared by every worker on a node."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), expires_at),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def exists(self, key: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key FROM state WHERE substr(key, 1, ?) = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (len(prefix), prefix, time.time()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+class RedisError(Exception):
+    pass
+
+
+def _glob_escape(text: str) -> str:
+    return "".join("\\" + c if c in "*?[]\\" else c for c in text)
+
+
+class RedisState(StateBackend):
+    """Backend on any server speaking the Redis protocol (RESP2).
+
+    Uses only GET, SET (with PX), DEL, EXISTS and SCAN over one socket guarded by a
+    lock, so no client library is needed. A dropped connection is
+    re-opened once per command.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        username: Optional[str] = None,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.username = username
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader: Any = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        try:
+            if self.password:
+                auth = [self.username, self.password] if self.username else [self.password]
+                self._roundtrip("AUTH", *auth)
+            if self.db:
+                self._roundtrip("SELECT", str(self.db))
+        except BaseException:
+            self._drop()
+            raise
+
+    def _drop(self) -> None:
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def _roundtrip(self, *args: Any) -> Any:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def execute(self, *args: Any) -> Any:
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._open()
+                    return self._roundtrip(*args)
+                except (ConnectionError, OSError):
+                    self._drop()
+                    if attempt:
+                        raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            self.execute("SET", key, value)
+        else:
+            self.execute("SET", key, value, "PX", str(max(int(ttl * 1000), 1)))
+
+    def delete(self, key: str) -> None:
+        self.execute("DEL", key)
+
+    def exists(self, key: str) -> bool:
+        return self.execute("EXISTS", key) > 0
+
+    def _scan(self, prefix: str) -> Iterator[str]:
+        cursor = "0"
+        while True:
+            cursor, batch = self.execute(
+                "SCAN", cursor, "MATCH", _glob_escape(prefix) + "*", "COUNT", "500"
+            )
+            cursor = cursor.decode("utf-8")
+            for key in batch:
+                yield key.decode("utf-8")
+            if cursor == "0":
+                return
+
+    def keys(self, prefix: str = "") -> List[str]:
+        # SCAN may return a key more than once
+        return sorted(set(self._scan(prefix)))
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = self.keys(prefix)
+        for start in range(0, len(keys), 500):
+            self.execute("DEL", *keys[start : start + 500])
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+
+def open_state(url: str) -> StateBackend:
+    """Backend for a `STATE_BACKEND` URL.
+
+    `memory://`, `sqlite:///path/to/state.db` (relative paths as
+    `sqlite://state.db`) or `redis://[[user]:password@]host[:port][/db]`.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryState()
+    if parsed.scheme == "sqlite":
+        path = unquote(parsed.netloc + parsed.path)
+        if not path:
+            raise ValueError(f"SQLite state URL needs a path: {url}")
+        return SQLiteState(path)
+    if parsed.scheme == "redis":
+        db = parsed.path.strip("/")
+        return RedisState(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parsed.password) if parsed.password else None,
+            username=unquote(parsed.username) if parsed.username else None,
+        )
+    raise ValueError(f"Unknown state backend: {url}")
@@ -0,0 +1,54 @@
+import inspect
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """One server-sent event with a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    # Multi-part message content: keep the text parts
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+    )
+
+
+async def stream_llm(
+    llm: Any, prompt: str, on_complete: Callable[[str], None]
+) -> AsyncIterator[str]:
+    """Forward an LLM's streamed tokens as SSE events.
+
+    Emits a `data: {"token": ...}` event per chunk as it arrives and a final
+    `done` event carrying the whole text, after `on_complete` has stored it
+    (awaited if it returns an awaitable). A failure mid-stream becomes an
+    `error` event, since the 200 status is already sent.
+    """
+    parts = []
+    try:
+        async for chunk in llm.astream(prompt):
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield sse_event({"token": text})
+        text = "".join(parts)
+        stored = on_complete(text)
+        if inspect.isawaitable(stored):
+            await stored
+        yield sse_event({"answer": text}, event="done")
+    except Exception as e:
+        print(f"Error while streaming LLM response: {e}")
+        yield sse_event({"detail": str(e)}, event="error")
+
+
+def stream_text(text: str) -> Iterator[str]:
+    """A ready answer (e.g. from a cache) as the same event sequence."""
+    yield sse_event({"token": text})
+    yield sse_event({"answer": text, "cached": True}, event="done")
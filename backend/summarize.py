@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+from typing import Any, List, MutableMapping, Optional
+
+from chunking import TranscriptChunk, chunk_segments
+from segments import TranscriptSegments, format_timestamp
+from singleflight import SingleFlight
+
+# Bump when the window prompt changes so stale cached notes are not reused
+WINDOW_PROMPT_VERSION = 1
+
+
+def split_windows(
+    transcript: str, segments: Optional[TranscriptSegments], window_chars: int
+) -> List[TranscriptChunk]:
+    """Cut a transcript into consecutive windows of at most `window_chars`.
+
+    Windows end on segment boundaries when segments are available, and on
+    whitespace in the rendered transcript otherwise.
+    """
+    if segments is not None and len(segments):
+        return chunk_segments(segments, chunk_size=window_chars, chunk_overlap=0)
+    windows = []
+    position = 0
+    while position < len(transcript):
+        end = min(position + window_chars, len(transcript))
+        if end < len(transcript):
+            space = transcript.rfind(" ", position, end)
+            end = space if space > position else end
+        windows.append(TranscriptChunk(transcript[position:end].strip(), 0.0, 0.0))
+        position = end
+    return [window for window in windows if window.text]
+
+
+def window_prompt(video_title: str, window: TranscriptChunk, index: int, total: int) -> str:
+    return f"""
+You are taking notes on part {index + 1} of {total} of a YouTube video transcript.
+
+Video Title: {video_title}
+
+Transcript part: {window.text}
+
+Instructions:
+1. Write dense notes (at most 200 words) covering every topic, definition, example and conclusion in this part.
+2. Keep the most important timestamps ([MM:SS]) next to the points they belong to.
+3. Do not add an introduction or refer to "this part"; only the notes.
+
+Notes:
+"""
+
+
+def format_notes(windows: List[TranscriptChunk], notes: List[str]) -> str:
+    """Window notes in order, each headed by its time range when known."""
+    parts = []
+    for i, (window, text) in enumerate(zip(windows, notes)):
+        if window.end > window.start:
+            header = f"Part {i + 1} [{format_timestamp(window.start)} - {format_timestamp(window.end)}]"
+        else:
+            header = f"Part {i + 1}"
+        parts.append(f"{header}:\n{text.strip()}")
+    return "\n\n".join(parts)
+
+
+class WindowSummarizer:
+    """Map step of hierarchical summarization, with per-window note caching.
+
+    Each window is summarized by its own LLM call, at most `max_concurrency`
+    at a time, so a long transcript costs about one window call of latency
+    per `max_concurrency` windows. Notes are stored in `store` under
+    `(video_id, window digest)`, so the summary, the quiz and later
+    re-summaries of the same video reuse them; concurrent requests for a
+    window whose notes are still being written share the one call.
+    """
+
+    def __init__(self, store: MutableMapping, max_concurrency: int = 8):
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self._inflight = SingleFlight()
+
+    @staticmethod
+    def key(video_id: str, window: TranscriptChunk) -> tuple:
+        digest = hashlib.sha1(
+            f"{WINDOW_PROMPT_VERSION}\0{window.text}".encode("utf-8")
+        ).hexdigest()
+        return (video_id, digest)
+
+    async def notes(
+        self, llm: Any, video_id: str, video_title: str, windows: List[TranscriptChunk]
+    ) -> List[str]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def call(key: tuple, index: int, window: TranscriptChunk) -> str:
+            async with semaphore:
+                response = await llm.ainvoke(
+                    window_prompt(video_title, window, index, len(windows))
+                )
+            self.store[key] = response.content
+            return response.content
+
+        async def summarize(index: int, window: TranscriptChunk) -> str:
+            key = self.key(video_id, window)
+            cached = self.store.get(key)
+            if cached is not None:
+                return cached
+            return await self._inflight.do(key, lambda: call(key, index, window))
+
+        return list(
+            await asyncio.gather(*(summarize(i, w) for i, w in enumerate(windows)))
+        )
+
+    async def condense(
+        self,
+        llm: Any,
+        video_id: str,
+        video_title: str,
+        windows: List[TranscriptChunk],
+        max_chars: int,
+    ) -> str:
+        """Window notes merged into one text of at most about `max_chars`.
+
+        When the notes of a very long video are themselves too long, they
+        are grouped into windows again and summarized one more level up.
+        """
+        notes = format_notes(windows, await self.notes(llm, video_id, video_title, windows))
+        while len(notes) > max_chars:
+            groups = split_windows(notes, None, max(max_chars // self.max_concurrency, 1000))
+            condensed = format_notes(
+                groups, await self.notes(llm, video_id, video_title, groups)
+            )
+            if len(groups) <= 1 or len(condensed) >= len(notes):
+                break
+            notes = condensed
+        return notes
+
+    def forget(self, video_id: str) -> None:
+        for key in [key for key in list(self.store) if key[0] == video_id]:
+            if hasattr(self.store, "discard"):
+                self.store.discard(key)
+            else:
+                self.store.pop(key, None)
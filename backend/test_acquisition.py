@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from acquisition import acquire_transcript
+
+
+def test_metadata_and_transcript_run_concurrently():
+    def slow(value):
+        def run():
+            time.sleep(0.2)
+            return value
+
+        return run
+
+    started = time.perf_counter()
+    result = asyncio.run(
+        acquire_transcript(
+            fetch_metadata=slow("Title"),
+            fetch_transcript=slow("[00:00] hi "),
+            download_audio=lambda: None,
+            transcribe_audio=lambda path: None,
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    assert result.transcript == "[00:00] hi "
+    assert result.source == "youtube"
+    assert result.metadata == "Title"
+    assert elapsed < 0.35
+
+
+def test_slow_failing_transcript_api_overlaps_audio_download():
+    events = []
+
+    def fetch_transcript():
+        time.sleep(0.3)
+        return None
+
+    def download_audio():
+        events.append("download")
+        time.sleep(0.3)
+        return "audio/v1.webm"
+
+    started = time.perf_counter()
+    result = asyncio.run(
+        acquire_transcript(
+            fetch_metadata=lambda: "Title",
+            fetch_transcript=fetch_transcript,
+            download_audio=download_audio,
+            transcribe_audio=lambda path: f"transcribed {path}",
+            audio_deadline=0.05,
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    assert events == ["download"]
+    assert result.transcript == "transcribed audio/v1.webm"
+    assert result.source == "assemblyai"
+    assert elapsed < 0.5
+    assert set(result.timings) >= {"transcript_api", "audio_download", "transcription"}
+
+
+def test_fast_transcript_never_downloads_audio():
+    events = []
+
+    result = asyncio.run(
+        acquire_transcript(
+            fetch_metadata=lambda: "Title",
+            fetch_transcript=lambda: "text",
+            download_audio=lambda: events.append("download"),
+            transcribe_audio=lambda path: None,
+            audio_deadline=1.0,
+        )
+    )
+
+    assert result.transcript == "text"
+    assert events == []
+
+
+def test_speculative_audio_is_discarded_when_the_transcript_api_wins():
+    def fetch_transcript():
+        time.sleep(0.1)
+        return "text"
+
+    def slow_download():
+        time.sleep(0.2)
+        return "audio/slow.webm"
+
+    def fast_download():
+        return "audio/fast.webm"
+
+    async def scenario(download_audio, discarded):
+        result = await acquire_transcript(
+            fetch_metadata=lambda: "Title",
+            fetch_transcript=fetch_transcript,
+            download_audio=download_audio,
+            transcribe_audio=lambda path: None,
+            audio_deadline=0.01,
+            discard_audio=discarded.append,
+        )
+        # Let a download still running after the captions arrived finish
+        await asyncio.sleep(0.3)
+        return result
+
+    # The download finishing after the captions, then before them
+    for download_audio in (slow_download, fast_download):
+        discarded = []
+        result = asyncio.run(scenario(download_audio, discarded))
+        assert result.source == "youtube"
+        assert discarded == [download_audio()]
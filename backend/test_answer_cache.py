@@ -0,0 +1,48 @@
+import time
+
+from answer_cache import SemanticAnswerCache
+
+
+def test_near_duplicate_question_hits():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.set("v1", "what is this about", [1.0, 0.0, 0.0], "It is about cats.")
+    assert cache.get("v1", [0.98, 0.1, 0.0]) == "It is about cats."
+    assert cache.get("v1", [0.0, 1.0, 0.0]) is None
+    assert cache.get("v2", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_closest_question_wins():
+    cache = SemanticAnswerCache(threshold=0.5)
+    cache.set("v1", "a", [1.0, 0.2], "A")
+    cache.set("v1", "b", [0.2, 1.0], "B")
+    assert cache.get("v1", [0.3, 1.0]) == "B"
+
+
+def test_ttl_maxsize_and_invalidate():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=0.01)
+    cache.set("v1", "q", [1.0, 0.0], "old")
+    time.sleep(0.02)
+    assert cache.get("v1", [1.0, 0.0]) is None
+    assert len(cache) == 0
+
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=2)
+    cache.set("v1", "a", [1.0, 0.0], "A")
+    cache.set("v1", "b", [0.0, 1.0], "B")
+    cache.set("v2", "a", [1.0, 0.0], "A2")
+    assert cache.get("v1", [1.0, 0.0]) is None
+    assert cache.get("v1", [0.0, 1.0]) == "B"
+    assert cache.invalidate("v1") == 1
+    assert cache.get("v1", [0.0, 1.0]) is None
+    assert cache.get("v2", [1.0, 0.0]) == "A2"
+
+
+def test_exact_lookup_without_vector():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.set("v1", "what is this about", None, "It is about cats.")
+    assert cache.get_exact("v1", "what is this about") == "It is about cats."
+    assert cache.get_exact("v1", "what is that about") is None
+    # Not yet embedded: invisible to similarity lookups until a vector is stored
+    assert cache.get("v1", [1.0, 0.0]) is None
+    cache.set("v1", "what is this about", [1.0, 0.0], "It is about cats.")
+    assert cache.get("v1", [0.98, 0.1]) == "It is about cats."
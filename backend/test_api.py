@@ -0,0 +1,549 @@
+"""Offline API tests: routes.py with fake embeddings, LLM and transcript source."""
+
+import asyncio
+import importlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from segments import TranscriptSegments
+from test_embedding import FakeEmbeddings
+
+
+class BagOfWordsEmbeddings(FakeEmbeddings):
+    """Hashed bag-of-words vectors, so texts sharing words are actually similar."""
+
+    def __init__(self):
+        super().__init__(dim=256)
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=f"answer #{len(self.prompts)}")
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    async def astream(self, prompt):
+        content = self.invoke(prompt).content
+        for word in content.split(" "):
+            yield SimpleNamespace(content=word + " ")
+
+
+class QuizLLM(FakeLLM):
+    def invoke(self, prompt):
+        super().invoke(prompt)
+        return SimpleNamespace(content='```json\n{"quiz": [{"question": "q", "answer": "A"}]}\n```')
+
+
+def fake_transcript(video_id):
+    return TranscriptSegments.from_entries(
+        {"start": i * 5.0, "duration": 5.0, "text": f"{video_id} sentence number {i} about topic"}
+        for i in range(300)
+    )
+
+
+@pytest.fixture(scope="module")
+def routes(tmp_path_factory):
+    os.environ["GEMINI_API_KEY"] = "test-key"
+    os.environ["TUBETALK_DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    # Tests count LLM calls; the warm-up test turns it back on
+    os.environ["WARMUP_ARTIFACTS"] = ""
+    sys.modules.pop("routes", None)
+    module = importlib.import_module("routes")
+
+    fake = BagOfWordsEmbeddings()
+    module.embeddings = fake
+    module.batch_embedder.embeddings = fake
+    module.index_store.embeddings = fake
+    module.llm = FakeLLM()
+    module.fetch_youtube_segments = fake_transcript
+    module.metadata_service.extractor = lambda url: {"title": "Fake Title"}
+    module.pools.cpu_workers = 1
+    yield module
+    module.pools.shutdown()
+    sys.modules.pop("routes", None)
+
+
+@pytest.fixture()
+def client(routes):
+    return TestClient(routes.app)
+
+
+def process(client, video_id):
+    response = client.post(
+        "/process_video/", json={"video_url": f"https://www.youtube.com/watch?v={video_id}"}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_process_and_chat(client, routes):
+    result = process(client, "vidAAAAAAAA")
+    assert result == {
+        "message": "Video processing complete",
+        "video_title": "Fake Title",
+        "video_id": "vidAAAAAAAA",
+    }
+    assert process(client, "vidAAAAAAAA")["message"] == "Video already processed"
+
+    response = client.post(
+        "/chat_with_video/", json={"video_id": "vidAAAAAAAA", "query": "sentence number 3"}
+    )
+    assert response.status_code == 200
+    assert response.json()["answer"].startswith("answer #")
+
+
+def test_chat_lazily_loads_index_after_eviction(client, routes):
+    process(client, "vidBBBBBBBB")
+    routes.video_data_store.discard("vidBBBBBBBB")
+
+    response = client.post(
+        "/chat_with_video/", json={"video_id": "vidBBBBBBBB", "query": "topic"}
+    )
+    assert response.status_code == 200
+    assert "vidBBBBBBBB sentence" in routes.llm.prompts[-1]
+
+
+def test_chat_retrieval_modes(client, routes):
+    process(client, "vidDDDDDDDD")
+    for mode in ("bm25", "hybrid"):
+        response = client.post(
+            "/chat_with_video/",
+            json={
+                "video_id": "vidDDDDDDDD",
+                "query": "number 42",
+                "retrieval_mode": mode,
+                "bypass_cache": True,
+            },
+        )
+        assert response.status_code == 200, response.text
+        assert "sentence number 42 about" in routes.llm.prompts[-1]
+
+    response = client.post(
+        "/chat_with_video/",
+        json={"video_id": "vidDDDDDDDD", "query": "q", "retrieval_mode": "fuzzy"},
+    )
+    assert response.status_code == 400
+
+
+def test_repeated_chat_hits_query_and_retrieval_caches(client, routes):
+    process(client, "vidEEEEEEEE")
+    for query in ("What is sentence 7?", "  what IS   sentence 7? "):
+        response = client.post(
+            "/chat_with_video/",
+            json={"video_id": "vidEEEEEEEE", "query": query, "bypass_cache": True},
+        )
+        assert response.status_code == 200
+        assert "sentence number 7 about" in routes.llm.prompts[-1]
+    assert routes.retrieval_cache.get(("vidEEEEEEEE", "vector", "what is sentence 7?"))
+
+    # A different mode misses the retrieval cache but reuses the query vector
+    client.post(
+        "/chat_with_video/",
+        json={
+            "video_id": "vidEEEEEEEE",
+            "query": "What is sentence 7?",
+            "retrieval_mode": "hybrid",
+            "bypass_cache": True,
+        },
+    )
+    stats = client.get("/cache_stats/").json()
+    assert stats["retrieval"]["hits"] >= 1
+    assert 0 < stats["query_embeddings"]["hit_ratio"] <= 1
+
+    # Rebuilding the index drops the video's cached retrievals
+    routes.create_vectorstore(fake_transcript("vidEEEEEEEE"), "vidEEEEEEEE")
+    assert not any(key[0] == "vidEEEEEEEE" for key in routes.retrieval_cache._data)
+
+
+def test_paraphrased_question_served_from_answer_cache(client, routes):
+    process(client, "vidFFFFFFFF")
+
+    def ask(query, **extra):
+        response = client.post(
+            "/chat_with_video/", json={"video_id": "vidFFFFFFFF", "query": query, **extra}
+        )
+        assert response.status_code == 200
+        return response.json()["answer"]
+
+    calls = len(routes.llm.prompts)
+    first = ask("what is this video about")
+    assert ask("This video is about what?") == first
+    assert len(routes.llm.prompts) == calls + 1
+
+    assert ask("what is this video about", bypass_cache=True) != first
+    assert len(routes.llm.prompts) == calls + 2
+    assert client.get("/cache_stats/").json()["answers"]["hits"] >= 1
+
+    client.delete("/videos/vidFFFFFFFF")
+    assert routes.answer_cache.get("vidFFFFFFFF", routes.embed_query("what is this video about")) is None
+
+
+def test_bm25_chat_does_not_wait_for_the_query_embedding(client, routes, monkeypatch):
+    process(client, "vidQQQQQQQQ")
+    embed = routes.aembed_query
+
+    async def slow_embed(query):
+        await asyncio.sleep(1.0)
+        return await embed(query)
+
+    monkeypatch.setattr(routes, "aembed_query", slow_embed)
+    payload = {"video_id": "vidQQQQQQQQ", "query": "What is sentence 9?", "retrieval_mode": "bm25"}
+    calls = len(routes.llm.prompts)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=routes.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            started = time.perf_counter()
+            first = (await ac.post("/chat_with_video/", json=payload)).json()["answer"]
+
+            # The same question is an exact hit, still without embedding
+            repeat = {**payload, "query": "  what is SENTENCE 9? "}
+            assert (await ac.post("/chat_with_video/", json=repeat)).json()["answer"] == first
+            assert time.perf_counter() - started < 1.0
+            assert len(routes.llm.prompts) == calls + 1
+
+            # Once the background embedding lands, paraphrases in vector mode hit too
+            await asyncio.sleep(1.5)
+            paraphrase = {"video_id": "vidQQQQQQQQ", "query": "what is sentence 9"}
+            assert (await ac.post("/chat_with_video/", json=paraphrase)).json()["answer"] == first
+
+    asyncio.run(scenario())
+
+
+def read_events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+
+def test_streamed_chat_and_summary_fill_the_caches(client, routes):
+    process(client, "vidGGGGGGGG")
+    payload = {"video_id": "vidGGGGGGGG", "query": "what happens at sentence 99"}
+    response = client.post("/chat_with_video/stream", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    tokens = [data["token"] for event, data in events if event == "message"]
+    assert len(tokens) == 2
+    assert events[-1][0] == "done"
+    answer = events[-1][1]["answer"]
+    assert answer == "".join(tokens)
+
+    # The streamed answer was cached, so the blocking endpoint reuses it
+    assert client.post("/chat_with_video/", json=payload).json()["answer"] == answer
+    cached = read_events(client.post("/chat_with_video/stream", json=payload))
+    assert cached[-1] == ("done", {"answer": answer, "cached": True})
+
+    events = read_events(
+        client.post("/summarize_video/stream", json={"video_id": "vidGGGGGGGG"})
+    )
+    summary = events[-1][1]["answer"]
+    response = client.post("/summarize_video/", json={"video_id": "vidGGGGGGGG"})
+    assert response.json()["summary"] == summary
+
+    response = client.post("/chat_with_video/stream", json={"video_id": "nope", "query": "q"})
+    assert response.status_code == 400
+
+
+def test_chat_is_served_while_a_video_is_processing(client, routes, monkeypatch):
+    process(client, "vidAAAAAAAA")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_transcript(video_id):
+        started.set()
+        release.wait(10)
+        return fake_transcript(video_id)
+
+    monkeypatch.setattr(routes, "fetch_youtube_segments", slow_transcript)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=routes.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            processing = asyncio.create_task(
+                ac.post(
+                    "/process_video/",
+                    json={"video_url": "https://www.youtube.com/watch?v=vidHHHHHHHH"},
+                )
+            )
+            try:
+                assert await asyncio.to_thread(started.wait, 10)
+                response = await ac.post(
+                    "/chat_with_video/",
+                    json={"video_id": "vidAAAAAAAA", "query": "topic", "bypass_cache": True},
+                )
+                assert response.status_code == 200
+                assert not processing.done()
+            finally:
+                release.set()
+            assert (await processing).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests_for_a_new_video_are_coalesced(routes, monkeypatch):
+    fetches = []
+
+    def slow_transcript(video_id):
+        fetches.append(video_id)
+        time.sleep(0.2)
+        return fake_transcript(video_id)
+
+    monkeypatch.setattr(routes, "fetch_youtube_segments", slow_transcript)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=routes.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            url = "https://www.youtube.com/watch?v=vidIIIIIIII"
+            responses = await asyncio.gather(
+                *(ac.post("/process_video/", json={"video_url": url}) for _ in range(5))
+            )
+            assert [r.status_code for r in responses] == [200] * 5
+
+            calls = len(routes.llm.prompts)
+            summaries = await asyncio.gather(
+                *(ac.post("/summarize_video/", json={"video_id": "vidIIIIIIII"}) for _ in range(5))
+            )
+            assert len({r.json()["summary"] for r in summaries}) == 1
+            assert len(routes.llm.prompts) == calls + 1
+
+    asyncio.run(scenario())
+    assert fetches == ["vidIIIIIIII"]
+
+
+def test_summary_and_quiz_are_warmed_up_after_processing(routes, monkeypatch):
+    class SlowBundleLLM(FakeLLM):
+        def invoke(self, prompt):
+            super().invoke(prompt)
+            quiz = [{"question": "q", "answer": "A"}]
+            return SimpleNamespace(content=json.dumps({"summary": "the summary", "quiz": quiz}))
+
+        async def ainvoke(self, prompt):
+            await asyncio.sleep(0.2)
+            return self.invoke(prompt)
+
+    slow_llm = SlowBundleLLM()
+    monkeypatch.setattr(routes, "llm", slow_llm)
+    monkeypatch.setattr(routes, "WARMUP_ARTIFACTS", ["summary", "quiz"])
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=routes.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            url = "https://www.youtube.com/watch?v=vidMMMMMMMM"
+            assert (await ac.post("/process_video/", json={"video_url": url})).status_code == 200
+            # The combined generation started while the video was being indexed
+            assert ("bundle", "vidMMMMMMMM") in routes.single_flight
+
+            payload = {"video_id": "vidMMMMMMMM"}
+            summary, streamed, quiz = await asyncio.gather(
+                ac.post("/summarize_video/", json=payload),
+                ac.post("/summarize_video/stream", json=payload),
+                ac.post("/generate_quiz/", json=payload),
+            )
+            assert summary.json()["summary"] == "the summary"
+            assert read_events(streamed)[-1][1]["answer"] == "the summary"
+            assert quiz.json()["quiz"] == {"quiz": [{"question": "q", "answer": "A"}]}
+            # Only the one warm-up call reached the model, with the transcript once
+            assert len(slow_llm.prompts) == 1
+            assert "Summary instructions" in slow_llm.prompts[0]
+
+    asyncio.run(scenario())
+
+
+def test_process_job_reports_stages(routes):
+    async def scenario():
+        transport = httpx.ASGITransport(app=routes.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            response = await ac.post(
+                "/jobs/process",
+                json={"video_url": "https://www.youtube.com/watch?v=vidJJJJJJJJ"},
+            )
+            assert response.status_code == 202
+            job = response.json()
+            assert job["status"] == "queued"
+
+            events = read_events(await ac.get(f"/jobs/{job['id']}/events"))
+            assert events[-1][0] == "done"
+            job = (await ac.get(f"/jobs/{job['id']}", params={"wait": 5})).json()
+
+            assert (await ac.get("/jobs/unknown")).status_code == 404
+            bad = await ac.post("/jobs/process", json={"video_url": "https://example.com"})
+            assert bad.status_code == 400
+            bad = await ac.post(
+                "/jobs/process",
+                json={"video_url": "https://www.youtube.com/watch?v=vidJJJJJJJJ", "priority": "high"},
+            )
+            assert bad.status_code == 400
+            return job
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "succeeded"
+    assert job["result"]["message"] == "Video processing complete"
+    assert list(job["stages"]) == ["transcript", "chunking", "embedding", "indexing"]
+    assert all(stage["status"] == "done" for stage in job["stages"].values())
+    assert job["stages"]["embedding"]["done"] == job["stages"]["embedding"]["total"]
+
+
+def test_long_transcripts_are_summarized_map_reduce(client, routes, monkeypatch):
+    process(client, "vidKKKKKKKK")
+    transcript = routes.video_data_store["vidKKKKKKKK"]["transcript"]
+    monkeypatch.setattr(routes, "SUMMARY_DIRECT_CHARS", len(transcript) // 2)
+    monkeypatch.setattr(routes, "SUMMARY_WINDOW_CHARS", len(transcript) // 5)
+
+    calls = len(routes.llm.prompts)
+    response = client.post("/summarize_video/", json={"video_id": "vidKKKKKKKK"})
+    assert response.status_code == 200
+    window_calls = len(routes.llm.prompts) - calls - 1
+    assert window_calls >= 5
+    # The whole transcript reached the model, not just a prefix
+    last_segment = "vidKKKKKKKK sentence number 299"
+    assert any(last_segment in p for p in routes.llm.prompts[-window_calls - 1 : -1])
+    assert "Notes on consecutive parts" in routes.llm.prompts[-1]
+
+    # The quiz reuses the cached window notes: one more call in total
+    calls = len(routes.llm.prompts)
+    assert client.post("/generate_quiz/", json={"video_id": "vidKKKKKKKK"}).status_code == 200
+    assert len(routes.llm.prompts) == calls + 1
+    assert "Notes on consecutive parts" in routes.llm.prompts[-1]
+
+
+def test_summary_and_quiz_are_persisted_per_prompt_version(client, routes, monkeypatch):
+    process(client, "vidLLLLLLLL")
+    quiz_llm = QuizLLM()
+    monkeypatch.setattr(routes, "llm", quiz_llm)
+    payload = {"video_id": "vidLLLLLLLL"}
+    summary = client.post("/summarize_video/", json=payload).json()["summary"]
+    quiz = client.post("/generate_quiz/", json=payload).json()["quiz"]
+    assert quiz == {"quiz": [{"question": "q", "answer": "A"}]}
+    assert len(quiz_llm.prompts) == 2
+
+    # A fresh store on the same file (a restart, or another worker) serves both
+    fresh = routes.ArtifactStore(os.path.join(routes.DATA_DIR, "artifacts.db"))
+    monkeypatch.setattr(routes, "artifact_store", fresh)
+    assert client.post("/summarize_video/", json=payload).json()["summary"] == summary
+    assert client.post("/generate_quiz/", json=payload).json()["quiz"] == quiz
+    assert len(quiz_llm.prompts) == 2
+
+    # A new prompt version is a miss, without any cleanup
+    monkeypatch.setattr(routes, "QUIZ_PROMPT_VERSION", routes.QUIZ_PROMPT_VERSION + 1)
+    client.post("/generate_quiz/", json=payload)
+    assert len(quiz_llm.prompts) == 3
+    assert client.post("/summarize_video/", json=payload).json()["summary"] == summary
+    assert len(quiz_llm.prompts) == 3
+
+
+def test_bundle_generates_summary_and_quiz_in_one_call(client, routes, monkeypatch):
+    class BundleLLM(FakeLLM):
+        def invoke(self, prompt):
+            super().invoke(prompt)
+            quiz = [{"question": "q", "options": ["A. a", "B. b", "C. c", "D. d"], "answer": "B"}]
+            return SimpleNamespace(content=json.dumps({"summary": "line one\nline two", "quiz": quiz}))
+
+    bundle_llm = BundleLLM()
+    monkeypatch.setattr(routes, "llm", bundle_llm)
+    process(client, "vidNNNNNNNN")
+
+    response = client.get("/videos/vidNNNNNNNN/bundle")
+    assert response.status_code == 200
+    bundle = response.json()
+    assert bundle["video_title"] == "Fake Title"
+    assert bundle["transcript"]["available"] and bundle["transcript"]["indexed"]
+    assert bundle["transcript"]["segments"] == 300
+    assert bundle["transcript"]["duration"] == 1500.0
+    assert bundle["summary"] == "line one\nline two"
+    assert bundle["quiz"]["quiz"][0]["answer"] == "B"
+    # One call carried both instructions and the transcript once
+    assert len(bundle_llm.prompts) == 1
+    assert "Summary instructions" in bundle_llm.prompts[0]
+    assert bundle_llm.prompts[0].count("vidNNNNNNNN sentence number 0 ") == 1
+
+    # The separate endpoints and a second bundle read the stored artifacts
+    payload = {"video_id": "vidNNNNNNNN"}
+    assert client.post("/summarize_video/", json=payload).json()["summary"] == bundle["summary"]
+    assert client.post("/generate_quiz/", json=payload).json()["quiz"] == bundle["quiz"]
+    assert client.get("/videos/vidNNNNNNNN/bundle").json() == bundle
+    assert len(bundle_llm.prompts) == 1
+
+
+def test_bundle_falls_back_to_separate_calls(client, routes):
+    process(client, "vidOOOOOOOO")
+    calls = len(routes.llm.prompts)
+    bundle = client.get("/videos/vidOOOOOOOO/bundle").json()
+    # The fake LLM's answer is not JSON: one combined attempt, then summary and quiz calls
+    assert len(routes.llm.prompts) == calls + 3
+    assert bundle["summary"].startswith("answer #")
+    assert bundle["quiz"]["error"] == "JSONDecodeError"
+
+    process(client, "vidPPPPPPPP")
+    calls = len(routes.llm.prompts)
+    client.get("/videos/vidPPPPPPPP/bundle", params={"combined": "false"})
+    assert len(routes.llm.prompts) == calls + 2
+    assert all("Summary instructions" not in p for p in routes.llm.prompts[-2:])
+
+    assert client.get("/videos/nope/bundle").status_code == 404
+
+
+def test_rebalance_releases_videos_owned_by_other_workers(client, routes, monkeypatch):
+    process(client, "vidQQQQQQQQ")
+    monkeypatch.setattr(routes, "SHARD_SELF", "http://me")
+    monkeypatch.setattr(routes, "shard_ring", routes.HashRing(["http://me"]))
+    assert routes.owns_video("vidQQQQQQQQ")
+
+    response = client.put("/shard/ring", json={"workers": ["http://other"]})
+    assert response.status_code == 200
+    assert "vidQQQQQQQQ" in response.json()["released"]
+    assert routes.video_data_store.peek("vidQQQQQQQQ") is None
+
+    # A request that still reaches this worker is served from disk
+    payload = {"video_id": "vidQQQQQQQQ", "query": "sentence 3", "bypass_cache": True}
+    assert client.post("/chat_with_video/", json=payload).status_code == 200
+    assert client.put("/shard/ring", json={"workers": "http://me"}).status_code == 400
+
+
+def test_chat_unknown_video(client):
+    response = client.post("/chat_with_video/", json={"video_id": "nope", "query": "q"})
+    assert response.status_code == 400
+
+
+def test_search_and_delete(client, routes):
+    process(client, "vidCCCCCCCC")
+    response = client.post("/search/", json={"query": "vidCCCCCCCC sentence number 12"})
+    assert response.status_code == 200
+    body = response.json()
+    assert "took_ms" in body
+    assert body["results"][0]["video_id"] == "vidCCCCCCCC"
+    assert body["results"][0]["chunks"][0]["start"] is not None
+
+    response = client.delete("/videos/vidCCCCCCCC")
+    assert response.json()["removed_chunks"] > 0
+    body = client.post("/search/", json={"query": "vidCCCCCCCC"}).json()
+    assert all(r["video_id"] != "vidCCCCCCCC" for r in body["results"])
+
+
+def test_search_rejects_invalid_limits(client, routes):
+    for body in ({"k": "x"}, {"k": 0}, {"k": 2.5}, {"max_videos": -1}, {"max_videos": None}):
+        response = client.post("/search/", json={"query": "anything", **body})
+        assert response.status_code == 400
@@ -0,0 +1,49 @@
+from artifact_store import ArtifactStore
+
+
+def test_round_trip_is_shared_across_instances(tmp_path):
+    path = str(tmp_path / "artifacts.db")
+    store = ArtifactStore(path)
+    assert store.get("vid", "quiz", 1, "model-a") is None
+    store.put("vid", "quiz", 1, "model-a", {"quiz": [{"question": "q", "answer": "A"}]})
+
+    # Another process opening the same file sees the artifact
+    other = ArtifactStore(path)
+    assert other.get("vid", "quiz", 1, "model-a") == {"quiz": [{"question": "q", "answer": "A"}]}
+    assert other.get("vid", "quiz", 1, "model-b") is None
+    assert other.get("vid", "summary", 1, "model-a") is None
+    assert other.stats()["hits"] == 1
+
+
+def test_new_versions_and_models_replace_superseded_entries(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts.db"))
+    store.put("vid", "summary", 1, "model", "old summary")
+    store.put("vid", "quiz", 1, "model", {"quiz": []})
+    store.put("other", "summary", 1, "model", "other summary")
+
+    # A bumped prompt version is never served the old entry
+    assert store.get("vid", "summary", 2, "model") is None
+    store.put("vid", "summary", 2, "model", "new summary")
+    assert store.get("vid", "summary", 2, "model") == "new summary"
+    assert store.get("vid", "summary", 1, "model") is None
+
+    store.put("vid", "summary", 2, "model-b", "other model summary")
+    assert store.get("vid", "summary", 2, "model-b") == "other model summary"
+    assert store.get("vid", "summary", 2, "model") is None
+    # Other kinds and videos are left alone
+    assert store.get("vid", "quiz", 1, "model") == {"quiz": []}
+    assert store.get("other", "summary", 1, "model") == "other summary"
+    assert len(store.state.keys("artifact:")) == 3
+
+
+def test_delete(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts.db"))
+    store.put("vid", "summary", 1, "model", "summary")
+    store.put("vid", "quiz", 1, "model", {"quiz": []})
+    store.put("vid", "quiz", 2, "model", {"quiz": []})
+    store.delete("vid", "quiz")
+    assert store.get("vid", "quiz", 1, "model") is None
+    assert store.get("vid", "quiz", 2, "model") is None
+    assert store.get("vid", "summary", 1, "model") == "summary"
+    store.delete("vid")
+    assert store.state.keys("artifact:") == []
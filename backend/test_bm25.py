@@ -0,0 +1,37 @@
+from bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_identifiers_and_numbers():
+    assert tokenize("Call get_user_id() in Python 3.12!") == [
+        "call", "get_user_id", "in", "python", "3", "12"
+    ]
+
+
+def test_exact_term_ranks_first():
+    index = BM25Index([
+        "we talk about cooking pasta",
+        "the flag is --no-cache-dir for pip install",
+        "pip is a package manager and pip installs packages",
+        "unrelated chatter about the weather",
+    ])
+    hits = index.search("no-cache-dir flag", k=2)
+    assert hits[0][0] == 1
+    assert all(score > 0 for _, score in hits)
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = BM25Index(["the cat", "the dog", "the bird", "the zebra"])
+    assert index.idf("zebra") > index.idf("the")
+    assert index.search("the zebra", k=1)[0][0] == 3
+
+
+def test_no_matching_terms():
+    index = BM25Index(["alpha", "beta"])
+    assert index.search("gamma") == []
+    assert BM25Index([]).search("anything") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 3, 4]])
+    assert fused[0] == 2
+    assert set(fused) == {1, 2, 3, 4}
@@ -0,0 +1,64 @@
+import pytest
+
+from chunking import chunk_metadatas, chunk_segments
+from segments import TranscriptSegments
+
+
+def make_segments(n, text="word " * 10):
+    return TranscriptSegments.from_entries(
+        {"start": i * 3.0, "duration": 3.0, "text": f"{i} {text.strip()}"}
+        for i in range(n)
+    )
+
+
+def test_chunks_respect_size_and_cover_every_segment():
+    segments = make_segments(500)
+    chunks = chunk_segments(segments, chunk_size=1500, chunk_overlap=200)
+
+    assert all(len(chunk.text) <= 1500 for chunk in chunks)
+    assert chunks[0].start == 0.0
+    assert chunks[-1].end == segments.end(len(segments) - 1)
+    joined = " ".join(chunk.text for chunk in chunks)
+    for i in range(len(segments)):
+        assert f"] {i} word" in joined
+
+
+def test_consecutive_chunks_overlap_on_segment_boundaries():
+    chunks = chunk_segments(make_segments(200), chunk_size=500, chunk_overlap=120)
+
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.start < previous.end
+        assert current.start > previous.start
+        first_segment = current.text.split("] ", 1)[1].split(" ", 1)[0]
+        assert f"] {first_segment} word" in previous.text
+
+
+def test_oversized_segment_is_split_with_interpolated_times():
+    segments = TranscriptSegments.from_entries(
+        [{"start": 0.0, "duration": 100.0, "text": "lorem " * 1000}]
+    )
+    chunks = chunk_segments(segments, chunk_size=1500, chunk_overlap=0)
+
+    assert len(chunks) > 1
+    assert all(len(chunk.text) <= 1500 for chunk in chunks)
+    assert chunks[0].start == 0.0
+    assert chunks[-1].end == 100.0
+    assert [c.start for c in chunks] == sorted(c.start for c in chunks)
+
+
+def test_metadata_carries_timestamps():
+    chunks = chunk_segments(make_segments(50), chunk_size=300, chunk_overlap=50)
+    metadatas = chunk_metadatas(chunks)
+
+    assert metadatas[0] == {
+        "source": "transcript",
+        "chunk": 0,
+        "total_chunks": len(chunks),
+        "start": chunks[0].start,
+        "end": chunks[0].end,
+    }
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        chunk_segments(make_segments(3), chunk_size=100, chunk_overlap=100)
@@ -0,0 +1,57 @@
+from langchain_core.documents import Document
+
+from chunking import chunk_metadatas, chunk_segments
+from context import build_context, estimate_tokens, merge_overlapping
+from retrieval import adaptive_k
+from test_chunking import make_segments
+
+
+def make_hits(chunks, positions, scores=None):
+    metadatas = chunk_metadatas(chunks)
+    scores = scores or [1.0] * len(positions)
+    return [
+        (Document(page_content=chunks[p].text, metadata=metadatas[p]), score)
+        for p, score in zip(positions, scores)
+    ]
+
+
+def test_merge_overlapping_drops_shared_segments():
+    chunks = chunk_segments(make_segments(60), chunk_size=500, chunk_overlap=120)
+    merged = merge_overlapping(chunks[0].text, chunks[1].text, max_overlap=240)
+    assert all(merged.count(f"] {i} word") <= 1 for i in range(60))
+    assert merged.startswith(chunks[0].text)
+    assert merged.endswith(chunks[1].text)
+    assert len(merged) < len(chunks[0].text) + len(chunks[1].text)
+
+    assert merge_overlapping("[00:00] a", "[00:09] b", max_overlap=100) == "[00:00] a [00:09] b"
+
+
+def test_adjacent_hits_become_one_span():
+    chunks = chunk_segments(make_segments(200), chunk_size=500, chunk_overlap=120)
+    hits = make_hits(chunks, [3, 2, 7, 3], [0.9, 0.8, 0.7, 0.5])
+    spans = build_context(hits, token_budget=10_000, max_overlap=240)
+
+    assert [(s.first, s.last) for s in spans] == [(2, 3), (7, 7)]
+    assert spans[0].score == 0.9
+    assert spans[0].start == chunks[2].start and spans[0].end == chunks[3].end
+    unmerged = sum(estimate_tokens(chunks[p].text) for p in (2, 3, 7))
+    assert sum(estimate_tokens(s.text) for s in spans) < unmerged
+
+
+def test_token_budget_keeps_best_spans():
+    chunks = chunk_segments(make_segments(200), chunk_size=500, chunk_overlap=120)
+    hits = make_hits(chunks, [0, 5, 10], [0.5, 0.9, 0.7])
+    budget = estimate_tokens(chunks[5].text) + estimate_tokens(chunks[10].text)
+    spans = build_context(hits, token_budget=budget)
+    assert [s.first for s in spans] == [5, 10]
+
+    spans = build_context(hits, token_budget=10)
+    assert len(spans) == 1 and spans[0].first == 5 and len(spans[0].text) == 40
+
+
+def test_adaptive_k_cuts_on_relative_score():
+    hits = [("a", 1.0), ("b", 0.95), ("c", 0.5), ("d", 0.4)]
+    assert adaptive_k(hits, score_ratio=0.8) == hits[:2]
+    assert adaptive_k(hits, score_ratio=0.8, min_k=3) == hits[:3]
+    assert adaptive_k(hits, score_ratio=0.1) == hits
+    assert adaptive_k([], score_ratio=0.8) == []
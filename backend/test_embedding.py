@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from embedding import BatchEmbedder
+
+
+class FakeEmbeddings(Embeddings):
+    """Local embedding backend: deterministic vectors, optional rate limiting."""
+
+    def __init__(self, dim=8, fail_first=0, delay=0.0):
+        self.dim = dim
+        self.fail_first = fail_first
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % 2**32)
+        return rng.standard_normal(self.dim).tolist()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append(len(texts))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = self.fail_first > 0
+            if fail:
+                self.fail_first -= 1
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise RuntimeError("429 Resource has been exhausted")
+            return [self._vector(t) for t in texts]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def test_batches_keep_input_order_and_bound_concurrency():
+    fake = FakeEmbeddings(delay=0.02)
+    embedder = BatchEmbedder(fake, batch_size=10, max_concurrency=3)
+    texts = [f"chunk {i}" for i in range(95)]
+
+    timings = []
+    vectors = embedder.embed(texts, timings=timings)
+
+    assert vectors.shape == (95, 8)
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors[42], fake._vector("chunk 42"), rtol=1e-6)
+    assert sorted(fake.calls) == [5] + [10] * 9
+    assert 1 < fake.max_active <= 3
+    assert [t["batch"] for t in timings] == list(range(10))
+
+
+def test_rate_limited_batches_are_retried():
+    fake = FakeEmbeddings(fail_first=2)
+    embedder = BatchEmbedder(fake, batch_size=4, max_concurrency=1, base_delay=0.001)
+
+    timings = []
+    vectors = embedder.embed([f"t{i}" for i in range(4)], timings=timings)
+
+    assert vectors.shape == (4, 8)
+    assert timings[0]["retries"] == 2
+
+
+def test_non_rate_limit_errors_propagate():
+    class Broken(FakeEmbeddings):
+        def embed_documents(self, texts):
+            raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        BatchEmbedder(Broken(), base_delay=0.001).embed(["a"])
+
+
+def test_vectors_bulk_load_into_faiss():
+    fake = FakeEmbeddings()
+    texts = [f"chunk {i}" for i in range(20)]
+    vectors = BatchEmbedder(fake, batch_size=7).embed(texts)
+
+    store = FAISS.from_embeddings(
+        text_embeddings=list(zip(texts, vectors.tolist())),
+        embedding=fake,
+        metadatas=[{"chunk": i} for i in range(20)],
+    )
+
+    assert store.similarity_search("chunk 13", k=1)[0].metadata == {"chunk": 13}
+
+
+def test_concurrent_calls_keep_their_own_timings():
+    embedder = BatchEmbedder(FakeEmbeddings(delay=0.01), batch_size=2, max_concurrency=2)
+    timings = {}
+
+    def run(n):
+        timings[n] = []
+        embedder.embed([f"call {n} text {i}" for i in range(2 * n)], timings=timings[n])
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in (1, 3, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {n: [t["batch"] for t in timings[n]] for n in timings} == {
+        1: [0],
+        3: [0, 1, 2],
+        5: [0, 1, 2, 3, 4],
+    }
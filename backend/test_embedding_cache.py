@@ -0,0 +1,38 @@
+import numpy as np
+
+from embedding import BatchEmbedder
+from embedding_cache import EmbeddingCache
+from test_embedding import FakeEmbeddings
+
+
+def test_only_misses_are_embedded(tmp_path):
+    fake = FakeEmbeddings()
+    cache = EmbeddingCache(str(tmp_path), "models/fake")
+    embedder = BatchEmbedder(fake, batch_size=4, cache=cache)
+
+    first = embedder.embed(["a", "b", "c"])
+    second = embedder.embed(["b", "c", "d"])
+
+    assert sum(fake.calls) == 4
+    np.testing.assert_array_equal(first[1:], second[:2])
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 4
+
+
+def test_cache_persists_across_instances(tmp_path):
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    EmbeddingCache(str(tmp_path), "models/fake").put_many(["x", "y", "z"], vectors)
+
+    reopened = EmbeddingCache(str(tmp_path), "models/fake")
+    found = reopened.get_many(["z", "missing", "x"])
+
+    np.testing.assert_array_equal(found[0], vectors[2])
+    assert found[1] is None
+    np.testing.assert_array_equal(found[2], vectors[0])
+
+
+def test_models_are_isolated(tmp_path):
+    EmbeddingCache(str(tmp_path), "model-a").put_many(["x"], np.ones((1, 4)))
+    other = EmbeddingCache(str(tmp_path), "model-b")
+
+    assert other.get_many(["x"]) == [None]
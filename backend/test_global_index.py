@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from global_index import GlobalIndex
+
+# Stands in for the embedding cache every chunk vector also lands in
+CACHE = {}
+
+
+def cached(texts):
+    return [CACHE.get(text) for text in texts]
+
+
+def open_index(tmp_path, **kwargs):
+    return GlobalIndex(str(tmp_path), vectors=cached, **kwargs)
+
+
+def video_vectors(seed, n=30, d=32):
+    rng = np.random.default_rng(seed)
+    topic = rng.standard_normal(d)
+    return (topic + 0.2 * rng.standard_normal((n, d))).astype(np.float32), topic
+
+
+def add_video(index, video_id, seed, n=30):
+    vectors, topic = video_vectors(seed, n)
+    metadatas = [{"chunk": i, "start": i * 10.0, "end": i * 10.0 + 10} for i in range(n)]
+    texts = [f"{video_id} chunk {i}" for i in range(n)]
+    CACHE.update(zip(texts, vectors))
+    index.add(video_id, vectors, metadatas, texts, title=f"Title {video_id}")
+    return topic
+
+
+def test_search_groups_chunks_by_video(tmp_path):
+    index = open_index(tmp_path)
+    topics = {vid: add_video(index, vid, seed) for seed, vid in enumerate(["a", "b", "c"])}
+
+    results = index.search(topics["b"], k=10)
+
+    assert results[0]["video_id"] == "b"
+    assert results[0]["video_title"] == "Title b"
+    chunk = results[0]["chunks"][0]
+    assert chunk["end"] == chunk["start"] + 10
+    assert chunk["text"].startswith("b chunk")
+
+
+def test_remove_and_replace_without_rebuild(tmp_path):
+    index = open_index(tmp_path)
+    add_video(index, "a", 0)
+    topic_b = add_video(index, "b", 1)
+    add_video(index, "b", 1, n=10)
+    assert index.ntotal == 40
+
+    assert index.remove("b") == 10
+    assert index.ntotal == 30
+    assert all(r["video_id"] != "b" for r in index.search(topic_b, k=10))
+
+
+def test_migrates_to_ivf_on_flush_and_persists(tmp_path):
+    index = open_index(tmp_path, train_threshold=200)
+    topics = [add_video(index, f"v{i}", i, n=50) for i in range(6)]
+    index.flush()
+    assert "IVF" in type(index.index).__name__
+    assert index.remove("v5") == 50
+    index.flush()
+
+    # The snapshot alone holds every vector: no lookup needed, and the log is empty
+    reopened = GlobalIndex(str(tmp_path))
+    assert reopened.ntotal == 250
+    assert reopened.search(topics[2], k=5)[0]["video_id"] == "v2"
+    assert len(list(tmp_path.glob("snapshot-*.faiss"))) == 1
+    with sqlite3.connect(reopened.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM log").fetchone()[0] == 0
+
+
+def test_changes_are_not_written_to_the_index_file_but_survive_a_crash(tmp_path):
+    index = open_index(tmp_path)
+    add_video(index, "a", 0)
+    index.flush()
+    topic_b = add_video(index, "b", 1)
+    index.remove("a")
+    assert [path.name for path in tmp_path.glob("snapshot-*.faiss")] == ["snapshot-1.faiss"]
+
+    # No flush() or shutdown: b's rows are replayed from the log, its vectors from the cache
+    reopened = open_index(tmp_path)
+    assert reopened.ntotal == 30
+    assert reopened.search(topic_b, k=5)[0]["video_id"] == "b"
+
+
+# A few hundred vectors are too few to train PQ, so pq falls back to SQ8 codes
+@pytest.mark.parametrize(
+    "quantization, codes", [("sq8", "IndexIVFScalarQuantizer"), ("pq", "IndexIVFScalarQuantizer")]
+)
+def test_migrates_to_quantized_ivf(tmp_path, quantization, codes):
+    index = open_index(tmp_path, train_threshold=200, quantization=quantization)
+    topics = [add_video(index, f"v{i}", i, n=50) for i in range(6)]
+    index.flush()
+    assert type(index.index).__name__ == codes
+    assert index.remove("v5") == 50
+    assert index.search(topics[3], k=5)[0]["video_id"] == "v3"
+
+
+def test_workers_sharing_a_directory_see_each_others_videos(tmp_path):
+    first, second = open_index(tmp_path), open_index(tmp_path)
+    topic_a = add_video(first, "a", 0)
+    topic_b = add_video(second, "b", 1)
+
+    # Each worker searches the other's video, and neither write lost the other's vectors
+    assert first.search(topic_b, k=5)[0]["video_id"] == "b"
+    assert second.search(topic_a, k=5)[0]["video_id"] == "a"
+    assert open_index(tmp_path).ntotal == 60
+
+    second.remove("a")
+    assert all(r["video_id"] != "a" for r in first.search(topic_a, k=10))
+
+    # After one worker flushes and the log is gone, the other reloads the snapshot
+    second.flush()
+    topic_c = add_video(second, "c", 2)
+    assert first.search(topic_c, k=5)[0]["video_id"] == "c"
+    assert first.ntotal == 60
+
+    # Concurrent writers never pick the same chunk ids
+    workers = [open_index(tmp_path) for _ in range(4)]
+    threads = [
+        threading.Thread(target=add_video, args=(index, f"w{i}", 10 + i))
+        for i, index in enumerate(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reopened = open_index(tmp_path)
+    assert reopened.ntotal == 60 + 4 * 30
+    assert {r["video_id"] for r in reopened.search(topic_b, k=200, max_videos=10)} == {
+        "b", "c", "w0", "w1", "w2", "w3"
+    }
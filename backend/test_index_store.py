@@ -0,0 +1,65 @@
+from langchain_community.vectorstores import FAISS
+
+from index_store import IndexStore
+from state import MemoryState
+from test_embedding import FakeEmbeddings
+
+
+def build_store(fake, n=12):
+    texts = [f"chunk {i}" for i in range(n)]
+    return FAISS.from_texts(
+        texts, embedding=fake, metadatas=[{"chunk": i, "start": i * 10.0} for i in range(n)]
+    )
+
+
+def test_save_and_lazy_load_roundtrip(tmp_path):
+    fake = FakeEmbeddings()
+    store = IndexStore(str(tmp_path), fake)
+    assert store.load("vid123") is None
+
+    store.save("vid123", build_store(fake), {"video_title": "Lecture"})
+    assert store.exists("vid123")
+
+    loaded = store.load("vid123")
+    doc = loaded.similarity_search("chunk 7", k=1)[0]
+    assert doc.page_content == "chunk 7"
+    assert doc.metadata == {"chunk": 7, "start": 70.0}
+    assert store.load_meta("vid123") == {"video_title": "Lecture"}
+
+
+def test_save_replaces_existing_index(tmp_path):
+    fake = FakeEmbeddings()
+    store = IndexStore(str(tmp_path), fake)
+    store.save("vid123", build_store(fake, n=3))
+    store.save("vid123", build_store(fake, n=5))
+
+    assert store.load("vid123").index.ntotal == 5
+    assert [p.name for p in tmp_path.iterdir()] == ["vid123"]
+
+
+def test_invalid_video_ids_never_touch_the_filesystem(tmp_path):
+    store = IndexStore(str(tmp_path), FakeEmbeddings())
+
+    assert not store.exists("../etc")
+    assert store.load("../../passwd") is None
+
+
+def test_shared_copies_follow_saves_and_deletes_on_other_nodes(tmp_path):
+    fake = FakeEmbeddings()
+    state = MemoryState()
+    writer = IndexStore(str(tmp_path / "node1"), fake, state=state)
+    reader = IndexStore(str(tmp_path / "node2"), fake, state=state)
+
+    writer.save("vid123", build_store(fake, n=3), {"video_title": "Old"})
+    assert reader.load("vid123").index.ntotal == 3
+
+    # A newer index saved elsewhere replaces the stale local copy
+    writer.save("vid123", build_store(fake, n=5), {"video_title": "New"})
+    assert reader.load("vid123").index.ntotal == 5
+    assert reader.load_meta("vid123") == {"video_title": "New"}
+
+    # A video deleted elsewhere is no longer served from the local copy
+    writer.delete("vid123")
+    assert not reader.exists("vid123")
+    assert reader.load("vid123") is None
+    assert not (tmp_path / "node2" / "vid123").exists()
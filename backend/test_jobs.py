@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+from jobs import JobManager, JobStore
+
+
+def test_priority_order_progress_and_results(tmp_path):
+    order = []
+
+    async def handler(payload, progress):
+        order.append(payload["n"])
+        progress("download")
+        # Reports may come from worker threads
+        await asyncio.to_thread(progress, "embed", 1, 2)
+        if payload["n"] == 3:
+            raise ValueError("bad input")
+        return {"n": payload["n"]}
+
+    manager = JobManager(JobStore(str(tmp_path / "jobs.db")), {"work": handler}, workers=1)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def blocker(payload, progress):
+            await gate.wait()
+
+        manager.handlers["block"] = blocker
+        await manager.submit("block", {})
+        low = await manager.submit("work", {"n": 1}, priority=0)
+        high = await manager.submit("work", {"n": 2}, priority=5)
+        failing = await manager.submit("work", {"n": 3}, priority=1)
+        gate.set()
+
+        done = await manager.wait(low["id"], since=0, timeout=5)
+        while done["status"] != "succeeded":
+            done = await manager.wait(low["id"], since=done["version"], timeout=5)
+        return await manager.get(high["id"]), await manager.get(failing["id"]), done
+
+    high, failing, low = asyncio.run(main())
+    assert order == [2, 3, 1]
+    assert high["status"] == "succeeded" and high["result"] == {"n": 2}
+    assert high["stages"]["download"]["status"] == "done"
+    assert high["stages"]["embed"] == {**high["stages"]["embed"], "done": 1, "total": 2}
+    assert failing["status"] == "failed" and failing["error"] == "bad input"
+    assert low["status"] == "succeeded"
+
+
+def test_duplicate_key_returns_the_unfinished_job(tmp_path):
+    release = threading.Event()
+
+    async def handler(payload, progress):
+        await asyncio.to_thread(release.wait, 5)
+
+    manager = JobManager(JobStore(str(tmp_path / "jobs.db")), {"work": handler})
+
+    async def main():
+        first = await manager.submit("work", {}, key="v1")
+        second = await manager.submit("work", {}, key="v1")
+        release.set()
+        await manager.wait(first["id"], since=first["version"] + 1, timeout=5)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first["id"] == second["id"]
+
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    ran = []
+
+    async def never(payload, progress):
+        await asyncio.sleep(3600)
+
+    async def handler(payload, progress):
+        ran.append(payload["n"])
+        return payload["n"]
+
+    async def before_restart():
+        manager = JobManager(store, {"work": never}, workers=1)
+        jobs = [await manager.submit("work", {"n": n}) for n in (1, 2)]
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return [job["id"] for job in jobs]
+
+    ids = asyncio.run(before_restart())
+    assert [job["status"] for job in store.unfinished()] == ["running", "queued"]
+
+    async def after_restart():
+        manager = JobManager(JobStore(store.path), {"work": handler}, workers=1)
+        await manager.start()
+        jobs = [await manager.wait(i, since=10**9, timeout=5) for i in ids]
+        await manager.drain()
+        return jobs
+
+    jobs = asyncio.run(after_restart())
+    assert sorted(ran) == [1, 2]
+    assert [job["status"] for job in jobs] == ["succeeded", "succeeded"]
+    assert store.unfinished() == []
+
+
+def test_store_is_never_touched_on_the_event_loop(tmp_path):
+    class RecordingStore(JobStore):
+        threads = set()
+
+        def save(self, record, *args):
+            self.threads.add(threading.get_ident())
+            super().save(record, *args)
+
+        def get(self, job_id):
+            self.threads.add(threading.get_ident())
+            return super().get(job_id)
+
+    async def handler(payload, progress):
+        progress("work")
+        return "ok"
+
+    store = RecordingStore(str(tmp_path / "jobs.db"))
+    manager = JobManager(store, {"work": handler}, workers=1)
+
+    async def main():
+        job = await manager.submit("work", {})
+        job = await manager.wait(job["id"], since=10**9, timeout=5)
+        assert await manager.get("missing") is None
+        await manager.drain()
+        return job
+
+    job = asyncio.run(main())
+    assert job["status"] == "succeeded"
+    assert RecordingStore.threads and threading.get_ident() not in RecordingStore.threads
+    assert JobStore(store.path).get(job["id"])["status"] == "succeeded"
+
+
+def test_finished_jobs_leave_memory_but_stay_readable(tmp_path):
+    async def handler(payload, progress):
+        return payload["n"]
+
+    manager = JobManager(
+        JobStore(str(tmp_path / "jobs.db")), {"work": handler}, workers=1, keep_finished=2
+    )
+
+    async def main():
+        jobs = [await manager.submit("work", {"n": n}) for n in range(5)]
+        for job in jobs:
+            await manager.wait(job["id"], since=10**9, timeout=5)
+        await manager.drain()
+        return jobs, [await manager.get(job["id"]) for job in jobs]
+
+    jobs, fetched = asyncio.run(main())
+    assert set(manager._jobs) == {jobs[3]["id"], jobs[4]["id"]}
+    assert [job["result"] for job in fetched] == [0, 1, 2, 3, 4]
+    assert all(job["status"] == "succeeded" for job in fetched)
+
+
+def test_workers_sharing_a_store_run_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    ran = []
+
+    async def hang(payload, progress):
+        ran.append(("crashed", payload["n"]))
+        await asyncio.sleep(3600)
+
+    async def handler(payload, progress):
+        ran.append(("sibling", payload["n"]))
+        return payload["n"]
+
+    async def main():
+        crashed = JobManager(JobStore(path), {"work": hang}, workers=1, lease=0.3)
+        jobs = [await crashed.submit("work", {"n": n}) for n in (1, 2)]
+        await asyncio.sleep(0.05)
+        # Simulate a dead process: its workers and lease renewal just stop
+        for task in crashed._tasks:
+            task.cancel()
+
+        sibling = JobManager(JobStore(path), {"work": handler}, workers=1, lease=0.3)
+        await sibling.start()
+        # Neither job is taken while the crashed worker's lease is still live
+        await asyncio.sleep(0.1)
+        assert ran == [("crashed", 1)]
+        jobs = [await sibling.wait(job["id"], since=10**9, timeout=5) for job in jobs]
+        await sibling.drain()
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert [job["status"] for job in jobs] == ["succeeded", "succeeded"]
+    assert sorted(ran) == [("crashed", 1), ("sibling", 1), ("sibling", 2)]
+    assert JobStore(path).unfinished() == []
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import threading
+import time
+
+from pools import WorkerPools
+
+
+def test_cpu_work_runs_in_another_process():
+    pools = WorkerPools(io_workers=2, cpu_workers=1)
+    try:
+        pid = asyncio.run(pools.run_cpu(os.getpid))
+        assert pid != os.getpid()
+        assert pools.stats()["cpu_started"]
+    finally:
+        pools.shutdown()
+
+
+def test_io_pool_is_bounded():
+    pools = WorkerPools(io_workers=2, cpu_workers=0)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(pools.run_io(work) for _ in range(8)))
+        # Without a process pool CPU work shares the I/O threads
+        assert await pools.run_cpu(threading.current_thread) is not threading.current_thread()
+
+    try:
+        asyncio.run(main())
+        assert peak[0] == 2
+    finally:
+        pools.shutdown()
@@ -0,0 +1,100 @@
+import warnings
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from quantization import PQ_MIN_TRAINING_POINTS, build_index, exact_distances, index_description
+from retrieval import retrieve_scored
+
+
+def clustered(n=300, d=64, topics=10, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, d))
+    return (centers[rng.integers(0, topics, n)] + 0.3 * rng.standard_normal((n, d))).astype(
+        np.float32
+    )
+
+
+def recall(exact, found, k):
+    return np.mean([len(set(e) & set(f)) / k for e, f in zip(exact, found)])
+
+
+def test_descriptions():
+    assert index_description("flat", 768, 100) == "Flat"
+    assert index_description("sq8", 768, 100) == "SQ8"
+    assert index_description("pq", 768, PQ_MIN_TRAINING_POINTS) == "PQ96x8"
+    # Too few points to train 256 centroids per sub-quantizer
+    assert index_description("pq", 768, PQ_MIN_TRAINING_POINTS - 1) == "SQ8"
+    assert index_description("pq", 768, 1) == "SQ8"
+    with pytest.raises(ValueError):
+        index_description("lsh", 768, 100)
+
+
+def test_sq8_is_smaller_and_accurate():
+    vectors = clustered()
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    index = build_index(vectors, "sq8")
+
+    assert index.ntotal == len(vectors)
+    assert recall(exact.search(vectors[:20], 7)[1], index.search(vectors[:20], 7)[1], 7) > 0.8
+    assert len(faiss.serialize_index(index)) < len(faiss.serialize_index(exact))
+
+
+def test_small_pq_collections_fall_back_without_training_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        index = build_index(clustered(n=500), "pq")
+    assert isinstance(index, faiss.IndexScalarQuantizer)
+
+
+def test_rerank_with_exact_vectors_recovers_pq_recall():
+    vectors = clustered(n=PQ_MIN_TRAINING_POINTS, topics=500)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    index = build_index(vectors, "pq")
+    assert isinstance(index, faiss.IndexPQ)
+    assert len(faiss.serialize_index(index)) < len(faiss.serialize_index(exact)) // 4
+
+    queries = vectors[:20]
+    expected = exact.search(queries, 7)[1]
+    distances, candidates = index.search(queries, 28)
+    reranked = []
+    for query, ids, approximate in zip(queries, candidates, distances):
+        rescored = exact_distances(query, [vectors[i] for i in ids], approximate)
+        reranked.append([ids[i] for i in np.argsort(rescored)[:7]])
+    assert recall(expected, candidates[:, :7], 7) < 0.8
+    assert recall(expected, reranked, 7) > 0.95
+
+
+def test_exact_distances_keep_approximate_ones_for_missing_vectors():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    vectors = [np.array([0.0, 0.0], dtype=np.float32), None]
+    assert exact_distances(query, vectors, [5.0, 3.0]) == [1.0, 3.0]
+
+
+def test_vector_retrieval_reranks_with_looked_up_vectors():
+    vectors = clustered(n=500)
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    vectorstore = FAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())),
+        embedding=None,
+        metadatas=[{"chunk": i} for i in range(len(vectors))],
+    )
+    vectorstore.index = build_index(vectors, "sq8")
+    by_text = dict(zip(texts, vectors))
+    lookups = []
+
+    def lookup(chunk_texts):
+        lookups.append(len(chunk_texts))
+        return [by_text[text] for text in chunk_texts]
+
+    query = vectors[3] + 0.01
+    hits = retrieve_scored(
+        {"vectorstore": vectorstore}, "q", k=5, embed_query=lambda _: query, rerank=(lookup, 4)
+    )
+    expected = np.argsort(((vectors - query) ** 2).sum(axis=1))[:5]
+    assert [doc.metadata["chunk"] for doc, _ in hits] == list(expected)
+    assert lookups == [20]
@@ -0,0 +1,41 @@
+from segments import TranscriptSegments
+
+ENTRIES = [
+    {"start": 0.0, "duration": 4.0, "text": "intro"},
+    {"start": 4.0, "duration": 6.5, "text": "main topic"},
+    {"start": 75.0, "duration": 3.0, "text": "outro"},
+]
+
+
+def test_render_matches_legacy_format():
+    segments = TranscriptSegments.from_entries(ENTRIES)
+    legacy = ""
+    for entry in ENTRIES:
+        minutes = int(entry["start"] // 60)
+        seconds = int(entry["start"] % 60)
+        legacy += f"[{minutes:02d}:{seconds:02d}] {entry['text']} "
+    assert segments.render() == legacy
+
+
+def test_time_and_offset_lookups():
+    segments = TranscriptSegments.from_entries(ENTRIES)
+    assert segments.text == "intro main topic outro"
+    assert segments.segment_text(1) == "main topic"
+
+    assert segments.time_to_index(0.0) == 0
+    assert segments.time_to_index(5.0) == 1
+    assert segments.time_to_index(1000.0) == 2
+    assert segments.time_to_offset(5.0) == segments.text.index("main")
+
+    assert segments.offset_to_index(segments.text.index("topic")) == 1
+    assert segments.offset_to_time(segments.text.index("outro")) == 75.0
+
+
+def test_payload_roundtrip_and_empty():
+    segments = TranscriptSegments.from_entries(ENTRIES)
+    restored = TranscriptSegments.from_payload(segments.to_payload())
+    assert restored.to_entries() == segments.to_entries()
+
+    empty = TranscriptSegments.from_entries([])
+    assert not empty
+    assert empty.render() == ""
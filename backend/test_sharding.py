@@ -0,0 +1,139 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from dispatcher import create_dispatcher
+from sharding import HashRing, request_video_id
+
+WORKERS = ["http://w1", "http://w2", "http://w3"]
+
+
+def test_ring_spreads_keys_and_rebalances_minimally():
+    keys = [f"video{i:05d}" for i in range(3000)]
+    ring = HashRing(WORKERS)
+    before = {key: ring.owner(key) for key in keys}
+    counts = [list(before.values()).count(worker) for worker in WORKERS]
+    assert min(counts) > 600
+
+    # A joining worker only takes keys; nothing moves between the old ones
+    ring.add("http://w4")
+    moved = [key for key in keys if ring.owner(key) != before[key]]
+    assert all(ring.owner(key) == "http://w4" for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.4
+
+    # A leaving worker only gives its own keys away
+    with_w4 = {key: ring.owner(key) for key in keys}
+    ring.set_nodes(["http://w1", "http://w3", "http://w4"])
+    moved = [key for key in keys if ring.owner(key) != with_w4[key]]
+    assert moved and all(with_w4[key] == "http://w2" for key in moved)
+    assert HashRing(reversed(WORKERS)).owner("abc") == HashRing(WORKERS).owner("abc")
+
+
+def test_request_video_id():
+    assert request_video_id("videos/abc/bundle", None) == "abc"
+    assert request_video_id("chat_with_video/", {"video_id": "abc", "query": "q"}) == "abc"
+    assert request_video_id("process_video/", {"video_url": "https://youtu.be/xyz"}) == "xyz"
+    assert request_video_id("search/", {"query": "q"}) is None
+
+
+def fake_worker(name):
+    worker = FastAPI()
+
+    @worker.post("/chat_with_video/")
+    async def chat(request: Request):
+        body = await request.json()
+        return {"worker": name, "video_id": body["video_id"]}
+
+    @worker.post("/summarize_video/stream")
+    async def stream(request: Request):
+        async def events():
+            for token in ("a", "b"):
+                yield f"data: {token}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @worker.get("/jobs/{job_id}")
+    async def job(job_id: str):
+        if job_id != name.replace("http://", "job-"):
+            return JSONResponse(content={"detail": "Job not found."}, status_code=404)
+        return {"id": job_id, "worker": name}
+
+    @worker.put("/shard/ring")
+    async def set_ring(request: Request):
+        worker.state.ring = (await request.json())["workers"]
+        return {"workers": worker.state.ring, "released": []}
+
+    @worker.get("/health/")
+    async def health():
+        return {"worker": name}
+
+    @worker.post("/search/")
+    async def search(request: Request):
+        body = await request.json()
+        if not body.get("query"):
+            return JSONResponse(content={"detail": "Query is required."}, status_code=400)
+        # Each worker's global index holds its own video, and all of them hold "shared"
+        score = 0.9 if name == "http://w2" else 0.5
+        return {
+            "results": [
+                {"video_id": name, "score": score, "chunks": []},
+                {"video_id": "shared", "score": score - 0.3, "chunks": []},
+            ],
+            "took_ms": 1.0,
+        }
+
+    @worker.delete("/videos/{video_id}")
+    async def delete(video_id: str):
+        worker.state.deleted = video_id
+        return {"video_id": video_id, "removed_chunks": 2 if name == "http://w1" else 0}
+
+    return worker
+
+
+def test_dispatcher_routes_by_video_and_rebalances():
+    workers = {url: fake_worker(url) for url in WORKERS + ["http://w4"]}
+    client = httpx.AsyncClient(
+        mounts={url: httpx.ASGITransport(app=app) for url, app in workers.items()}
+    )
+    dispatcher = create_dispatcher(WORKERS, client=client)
+    ring = HashRing(WORKERS)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=dispatcher)
+        async with httpx.AsyncClient(transport=transport, base_url="http://front") as ac:
+            for video_id in ("vidA", "vidB", "vidC", "vidD"):
+                response = await ac.post(
+                    "/chat_with_video/", json={"video_id": video_id, "query": "q"}
+                )
+                assert response.json() == {"worker": ring.owner(video_id), "video_id": video_id}
+
+            stream = await ac.post("/summarize_video/stream", json={"video_id": "vidA"})
+            assert stream.headers["content-type"].startswith("text/event-stream")
+            assert stream.text == "data: a\n\ndata: b\n\n"
+
+            seen = {(await ac.get("/health/")).json()["worker"] for _ in range(3)}
+            assert seen == set(WORKERS)
+
+            # Jobs are found on whichever worker has them
+            assert (await ac.get("/jobs/job-w2")).json()["worker"] == "http://w2"
+            assert (await ac.get("/jobs/missing")).status_code == 404
+
+            # Search and delete reach every worker
+            response = await ac.post("/search/", json={"query": "q", "max_videos": 3})
+            results = response.json()["results"]
+            assert [r["video_id"] for r in results] == ["http://w2", "shared", "http://w1"]
+            assert results[1]["score"] == pytest.approx(0.6) and response.json()["unavailable"] == []
+            assert (await ac.post("/search/", json={})).status_code == 400
+
+            response = await ac.delete("/videos/vidA")
+            assert response.json() == {"video_id": "vidA", "removed_chunks": 2}
+            assert all(workers[url].state.deleted == "vidA" for url in WORKERS)
+
+            response = await ac.put("/shard/workers", json={"workers": WORKERS + ["http://w4"]})
+            assert response.json()["workers"] == WORKERS + ["http://w4"]
+            assert all(w.state.ring == WORKERS + ["http://w4"] for w in workers.values())
+
+    asyncio.run(scenario())
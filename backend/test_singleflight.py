@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.02)
+        return value * 2
+
+    async def main():
+        results = await asyncio.gather(
+            *(flight.do("k", lambda: compute(21)) for _ in range(10)),
+            flight.do("other", lambda: compute(1)),
+        )
+        assert results == [42] * 10 + [2]
+        assert len(flight) == 0
+        assert "k" not in flight
+        # Finished keys are released, so a later call computes again
+        assert await flight.do("k", lambda: compute(5)) == 10
+
+    asyncio.run(main())
+    assert calls == [21, 1, 5]
+    assert flight.stats() == {"in_flight": 0, "started": 3, "coalesced": 9}
+
+
+def test_errors_reach_every_waiter_and_cancellation_does_not_spread():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        results = await asyncio.gather(
+            flight.do("k", fail), flight.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+        first = asyncio.ensure_future(flight.do("s", slow))
+        second = asyncio.ensure_future(flight.do("s", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+
+def test_wait_joins_a_call_in_flight_only():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        assert await flight.wait("k", "idle") == "idle"
+        running = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        assert await flight.wait("k") == "done"
+        assert await running == "done"
+        assert await flight.wait("k") is None
+
+    asyncio.run(main())
+    assert flight.stats()["started"] == 1 and flight.stats()["coalesced"] == 1
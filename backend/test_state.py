@@ -0,0 +1,166 @@
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from artifact_store import ArtifactStore
+from index_store import IndexStore
+from segments import TranscriptSegments
+from state import MemoryState, RedisState, SQLiteState, open_state
+from test_embedding import FakeEmbeddings
+from transcript_store import TranscriptStore
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of a Redis server (RESP2, one keyspace) for RedisState."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+        self.commands = []
+        super().__init__(("127.0.0.1", 0), RespHandler)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write_bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper().decode()
+            server.commands.append(name)
+            with server.lock:
+                now = time.time()
+                for key, (_, expires_at) in list(server.data.items()):
+                    if expires_at is not None and expires_at <= now:
+                        del server.data[key]
+                if name == "GET":
+                    reply = self.write_bulk(server.data.get(args[1], (None, None))[0])
+                elif name == "SET":
+                    expires_at = None
+                    if len(args) == 5 and args[3].upper() == b"PX":
+                        expires_at = now + int(args[4]) / 1000
+                    server.data[args[1]] = (args[2], expires_at)
+                    reply = b"+OK\r\n"
+                elif name in ("DEL", "EXISTS"):
+                    count = sum(key in server.data for key in args[1:])
+                    if name == "DEL":
+                        for key in args[1:]:
+                            server.data.pop(key, None)
+                    reply = b":%d\r\n" % count
+                elif name == "SCAN":
+                    pattern = args[3].decode().replace("\\", "")
+                    keys = [k for k in server.data if fnmatch.fnmatchcase(k.decode(), pattern)]
+                    reply = b"*2\r\n" + self.write_bulk(b"0") + b"*%d\r\n" % len(keys)
+                    reply += b"".join(self.write_bulk(k) for k in keys)
+                elif name == "SELECT":
+                    reply = b"+OK\r\n"
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture()
+def resp_server():
+    server = RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_state(request, tmp_path):
+    if request.param == "memory":
+        shared = MemoryState()
+        yield lambda: shared
+    elif request.param == "sqlite":
+        yield lambda: SQLiteState(str(tmp_path / "state.db"))
+    else:
+        server = request.getfixturevalue("resp_server")
+        host, port = server.server_address
+        yield lambda: RedisState(host, port)
+
+
+def test_backend_contract(make_state):
+    state, other = make_state(), make_state()
+    assert state.get("a:1") is None
+    state.set("a:1", b"one")
+    state.set("a:2", b"\x00\r\ntwo")
+    state.set("b:1", b"three")
+    state.set("a:tmp", b"gone", ttl=0.05)
+
+    # A second client (another worker) sees the same keys
+    assert other.get("a:2") == b"\x00\r\ntwo"
+    assert other.exists("a:1") and not other.exists("a:3")
+    time.sleep(0.1)
+    assert sorted(other.keys("a:")) == ["a:1", "a:2"]
+
+    other.delete_prefix("a:")
+    assert state.keys() == ["b:1"]
+    state.delete("b:1")
+    assert state.get("b:1") is None
+
+
+def test_stores_are_shared_through_one_backend(make_state, tmp_path):
+    segments = TranscriptSegments.from_entries([{"start": 0.0, "duration": 1.0, "text": "hello"}])
+    TranscriptStore(make_state()).put("vid", "youtube", segments)
+    cached = TranscriptStore(make_state()).get("vid")
+    assert cached["source"] == "youtube" and cached["segments"].text == segments.text
+
+    ArtifactStore(make_state()).put("vid", "summary", 1, "model", "a summary")
+    assert ArtifactStore(make_state()).get("vid", "summary", 1, "model") == "a summary"
+
+    # An index saved on one node is unpacked from the backend on another
+    fake = FakeEmbeddings()
+    vectorstore = FAISS.from_texts(["first chunk", "second chunk"], embedding=fake)
+    IndexStore(str(tmp_path / "node1"), fake, state=make_state()).save(
+        "vid", vectorstore, {"video_title": "Shared"}
+    )
+    other_node = IndexStore(str(tmp_path / "node2"), fake, state=make_state())
+    assert other_node.exists("vid")
+    assert other_node.load_meta("vid") == {"video_title": "Shared"}
+    assert other_node.load("vid").similarity_search("second chunk", k=1)[0].page_content == "second chunk"
+
+    other_node.delete("vid")
+    assert not IndexStore(str(tmp_path / "node3"), fake, state=make_state()).exists("vid")
+
+
+def test_redis_state_reconnects_and_selects_db(resp_server):
+    host, port = resp_server.server_address
+    state = open_state(f"redis://{host}:{port}/2")
+    state.set("k", b"v")
+    state._sock.shutdown(socket.SHUT_RDWR)
+    assert state.get("k") == b"v"
+    assert resp_server.commands.count("SELECT") == 2
+
+
+def test_open_state_urls(tmp_path):
+    assert isinstance(open_state("memory://"), MemoryState)
+    assert open_state(f"sqlite://{tmp_path}/s.db").path == f"{tmp_path}/s.db"
+    with pytest.raises(ValueError):
+        open_state("mongodb://localhost")
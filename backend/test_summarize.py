@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+from segments import TranscriptSegments
+from summarize import WindowSummarizer, format_notes, split_windows
+
+
+class CountingLLM:
+    def __init__(self):
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return SimpleNamespace(content=f"notes {len(self.prompts)}")
+
+
+def make_segments(n):
+    return TranscriptSegments.from_entries(
+        {"start": i * 10.0, "duration": 10.0, "text": f"segment {i} " + "word " * 20}
+        for i in range(n)
+    )
+
+
+def test_windows_cover_the_transcript_on_boundaries():
+    segments = make_segments(200)
+    windows = split_windows(segments.render(), segments, 2000)
+    assert all(len(w.text) <= 2000 for w in windows)
+    joined = " ".join(w.text for w in windows)
+    assert all(f"segment {i} " in joined for i in range(200))
+    assert all(a.end <= b.start for a, b in zip(windows, windows[1:]))
+
+    plain = split_windows("word " * 1000, None, 300)
+    assert all(len(w.text) <= 300 for w in plain)
+    assert sum(w.text.count("word") for w in plain) == 1000
+
+
+def test_window_notes_are_parallel_capped_and_cached():
+    segments = make_segments(200)
+    windows = split_windows(segments.render(), segments, 2000)
+    store = {}
+    summarizer = WindowSummarizer(store, max_concurrency=3)
+    llm = CountingLLM()
+
+    notes = asyncio.run(summarizer.notes(llm, "v1", "Title", windows))
+    assert len(notes) == len(windows) == len(llm.prompts)
+    assert llm.max_active == 3
+
+    again = asyncio.run(summarizer.notes(llm, "v1", "Title", windows))
+    assert again == notes and len(llm.prompts) == len(windows)
+
+    text = format_notes(windows, notes)
+    assert text.startswith("Part 1 [00:00 - ")
+
+    summarizer.forget("v1")
+    assert store == {}
+
+
+def test_concurrent_requests_share_in_flight_windows():
+    segments = make_segments(200)
+    windows = split_windows(segments.render(), segments, 2000)
+    summarizer = WindowSummarizer({}, max_concurrency=3)
+    llm = CountingLLM()
+
+    async def main():
+        # Summary and quiz asking for the same video at once
+        return await asyncio.gather(
+            summarizer.notes(llm, "v1", "Title", windows),
+            summarizer.notes(llm, "v1", "Title", windows),
+        )
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert len(llm.prompts) == len(windows)
+
+
+def test_condense_reduces_again_when_notes_are_too_long():
+    segments = make_segments(400)
+    windows = split_windows(segments.render(), segments, 1000)
+    summarizer = WindowSummarizer({}, max_concurrency=8)
+    llm = CountingLLM()
+    notes = asyncio.run(summarizer.condense(llm, "v1", "Title", windows, max_chars=1000))
+    assert len(notes) <= 1000
+    assert len(llm.prompts) > len(windows)
@@ -0,0 +1,45 @@
+from segments import TranscriptSegments
+from transcript_store import TranscriptStore
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    entries = [
+        {"start": 0.0, "duration": 2.5, "text": "hello"},
+        {"start": 65.25, "duration": 3.0, "text": "world"},
+    ]
+    store.put("abc", "youtube", TranscriptSegments.from_entries(entries), title="A Title")
+
+    cached = store.get("abc")
+    assert cached["source"] == "youtube"
+    assert cached["title"] == "A Title"
+    assert cached["segments"].to_entries() == entries
+    assert cached["segments"].render() == "[00:00] hello [01:05] world "
+
+
+def test_get_miss_returns_none(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    assert store.get("missing") is None
+    assert store.get("missing", "assemblyai") is None
+
+
+def test_youtube_source_preferred_over_assemblyai(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    audio = TranscriptSegments.from_entries([{"start": 0.0, "text": "from audio"}])
+    captions = TranscriptSegments.from_entries([{"start": 0.0, "text": "from captions"}])
+    store.put("abc", "assemblyai", audio)
+    store.put("abc", "youtube", captions)
+
+    assert store.get("abc")["source"] == "youtube"
+    assert store.get("abc", "assemblyai")["segments"].text == "from audio"
+
+
+def test_import_legacy_file(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    legacy = tmp_path / "abc.txt"
+    legacy.write_text("old transcript", encoding="utf-8")
+
+    assert store.import_legacy_file("abc", str(legacy))
+    assert store.get("abc", "assemblyai")["segments"].text == "old transcript"
+    assert not store.import_legacy_file("xyz", str(tmp_path / "xyz.txt"))
+
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+from video_metadata import VideoMetadataService, choose_audio_format, get_chapters
+
+
+def test_concurrent_callers_share_one_extraction():
+    calls = []
+
+    def extractor(url):
+        calls.append(url)
+        time.sleep(0.05)
+        return {"title": "Shared"}
+
+    service = VideoMetadataService(extractor=extractor)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.get_info("v1", "url")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [r["title"] for r in results] == ["Shared"] * 8
+    assert service.get_info("v1", "url")["title"] == "Shared"
+    assert len(calls) == 1
+
+
+def test_failed_extraction_is_not_cached():
+    attempts = []
+
+    def extractor(url):
+        attempts.append(url)
+        if len(attempts) == 1:
+            raise RuntimeError("network down")
+        return {"title": "Recovered"}
+
+    service = VideoMetadataService(extractor=extractor)
+    with pytest.raises(RuntimeError):
+        service.get_info("v1", "url")
+    assert service.get_info("v1", "url")["title"] == "Recovered"
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats()["hits"] == 1
+
+
+def test_ttl_cache_pop_matching():
+    cache = TTLCache(maxsize=8)
+    for key in [("v1", "a"), ("v1", "b"), ("v2", "a")]:
+        cache.set(key, 1)
+    assert cache.pop_matching(lambda key: key[0] == "v1") == 2
+    assert list(cache._data) == [("v2", "a")]
+
+
+def test_audio_format_and_chapters_from_info():
+    info = {
+        "formats": [
+            {"format_id": "18", "acodec": "mp4a", "vcodec": "avc1", "abr": 96},
+            {"format_id": "140", "acodec": "mp4a", "vcodec": "none", "abr": 128},
+            {"format_id": "251", "acodec": "opus", "vcodec": "none", "abr": 160},
+        ],
+        "chapters": [{"title": "Intro", "start_time": 0, "end_time": 30}],
+    }
+    assert choose_audio_format(info) == "251"
+    assert choose_audio_format({}) == "bestaudio/best"
+    assert get_chapters(info) == [{"title": "Intro", "start": 0.0, "end": 30.0}]
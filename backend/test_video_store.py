@@ -0,0 +1,57 @@
+import numpy as np
+
+from segments import TranscriptSegments
+from video_store import MemoryBoundedStore, estimate_size
+
+
+def test_evicts_least_recently_used_over_budget():
+    evicted = []
+    store = MemoryBoundedStore(
+        max_bytes=2500, sizer=lambda v: v["size"], on_evict=lambda k, v: evicted.append(k)
+    )
+    store["a"] = {"size": 1000}
+    store["b"] = {"size": 1000}
+    store["a"]  # a is now most recently used
+    store["c"] = {"size": 1000}
+
+    assert evicted == ["b"]
+    assert list(store) == ["a", "c"]
+    assert store.nbytes == 2000
+    assert store.stats()["evictions"] == 1
+
+
+def test_loader_pages_evicted_entries_back_in():
+    disk = {"a": {"size": 10}}
+    store = MemoryBoundedStore(
+        max_bytes=100, sizer=lambda v: v["size"], loader=lambda k: disk.get(k)
+    )
+
+    assert store["a"] == {"size": 10}
+    assert "missing" not in store
+    assert store.get("missing") is None
+    assert store.stats()["loads"] == 1
+
+
+def test_account_remeasures_mutated_entries():
+    store = MemoryBoundedStore(max_bytes=10**6)
+    store["a"] = {"transcript": ""}
+    before = store.nbytes
+    store["a"]["transcript"] = "x" * 10_000
+    store.account("a")
+
+    assert store.nbytes >= before + 10_000
+
+
+def test_single_oversized_entry_is_kept():
+    store = MemoryBoundedStore(max_bytes=10, sizer=lambda v: 100)
+    store["a"] = object()
+    assert len(store) == 1
+
+
+def test_estimate_size_counts_arrays_and_segments():
+    segments = TranscriptSegments.from_entries(
+        {"start": float(i), "text": "word " * 20} for i in range(100)
+    )
+    entry = {"segments": segments, "vectors": np.zeros((100, 768), dtype=np.float32)}
+
+    assert estimate_size(entry) >= segments.nbytes() + 100 * 768 * 4
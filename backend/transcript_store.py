@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Union
+
+from segments import TranscriptSegments
+from state import SQLiteState, StateBackend
+
+# Sources are tried in this order when a caller does not ask for a specific one:
+# the YouTube captions are cheaper and timestamped, AssemblyAI is the fallback.
+SOURCES = ("youtube", "assemblyai")
+
+
+class TranscriptStore:
+    """Transcripts keyed by (video_id, source) in a shared state backend.
+
+    Each entry holds the segment-level transcript (starts, durations, joined
+    text and offsets) and the title as one zlib-compressed JSON payload, so
+    a lookup is a single key read. A path opens a SQLite backend.
+    """
+
+    def __init__(self, state: Union[str, StateBackend]):
+        self._lock = threading.Lock()
+        if isinstance(state, str):
+            self.path = state
+            self.state: StateBackend = SQLiteState(state)
+        else:
+            self.state = state
+
+    @staticmethod
+    def key(video_id: str, source: str) -> str:
+        return f"transcript:{video_id}:{source}"
+
+    def get(
+        self, video_id: str, source: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the stored transcript for a video, or None on a miss.
+
+        Without an explicit source the first available one in SOURCES wins.
+        """
+        for name in [source] if source else SOURCES:
+            raw = self.state.get(self.key(video_id, name))
+            if raw is not None:
+                data = json.loads(zlib.decompress(raw))
+                return {
+                    "video_id": video_id,
+                    "source": name,
+                    "title": data["title"],
+                    "segments": TranscriptSegments.from_payload(data["segments"]),
+                }
+        return None
+
+    def put(
+        self,
+        video_id: str,
+        source: str,
+        segments: TranscriptSegments,
+        title: Optional[str] = None,
+    ) -> None:
+        """Insert or replace the transcript for (video_id, source)."""
+        if source not in SOURCES:
+            raise ValueError(f"Unknown transcript source: {source}")
+        self.state.set(self.key(video_id, source), _encode(title, segments.to_payload()))
+
+    def set_title(self, video_id: str, title: str) -> None:
+        with self._lock:
+            for source in SOURCES:
+                key = self.key(video_id, source)
+                raw = self.state.get(key)
+                if raw is not None:
+                    data = json.loads(zlib.decompress(raw))
+                    self.state.set(key, _encode(title, data["segments"]))
+
+    def delete(self, video_id: str) -> None:
+        self.state.delete_prefix(f"transcript:{video_id}:")
+
+    def import_legacy_file(self, video_id: str, path: str) -> bool:
+        """Import a pre-store `transcripts/{video_id}.txt` AssemblyAI cache file."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if not text:
+            return False
+        self.put(
+            video_id,
+            "assemblyai",
+            TranscriptSegments.from_entries([{"start": 0.0, "text": text}]),
+        )
+        return True
+
+
+def _encode(title: Optional[str], segments: Any) -> bytes:
+    return zlib.compress(
+        json.dumps(
+            {"title": title, "segments": segments, "created_at": time.time()},
+            ensure_ascii=False,
+        ).encode("utf-8")
+    )
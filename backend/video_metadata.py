@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import yt_dlp
+
+from cache import TTLCache
+
+
+def extract_video_info(video_url: str) -> Dict[str, Any]:
+    ydl_opts = {"quiet": True}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(video_url, download=False) or {}
+
+
+class VideoMetadataService:
+    """Runs one yt-dlp extraction per video and caches the whole info dict.
+
+    Concurrent callers asking for the same video while an extraction is in
+    flight wait on that extraction instead of starting their own. Failures
+    are not cached, so the next caller retries.
+    """
+
+    def __init__(
+        self,
+        extractor: Callable[[str], Dict[str, Any]] = extract_video_info,
+        maxsize: int = 256,
+        ttl: Optional[float] = 3600,
+    ):
+        self.extractor = extractor
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_info(self, video_id: str, video_url: str) -> Dict[str, Any]:
+        info = self.cache.get(video_id)
+        if info is not None:
+            return info
+
+        with self._lock:
+            future = self._inflight.get(video_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[video_id] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            info = self.extractor(video_url)
+            self.cache.set(video_id, info)
+            future.set_result(info)
+            return info
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(video_id, None)
+
+    def invalidate(self, video_id: str) -> None:
+        self.cache.pop(video_id)
+
+
+def get_title(info: Dict[str, Any]) -> str:
+    return info.get("title") or "Unknown Title"
+
+
+def get_chapters(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Normalised chapter list: [{"title", "start", "end"}] in seconds."""
+    return [
+        {
+            "title": chapter.get("title", ""),
+            "start": float(chapter.get("start_time", 0.0)),
+            "end": float(chapter.get("end_time", 0.0)),
+        }
+        for chapter in info.get("chapters") or []
+    ]
+
+
+def choose_audio_format(info: Dict[str, Any]) -> str:
+    """Pick the best audio-only format id from the cached format list.
+
+    Falls back to the yt-dlp selector used before when no audio-only format
+    is listed.
+    """
+    audio_formats = [
+        f
+        for f in info.get("formats") or []
+        if f.get("acodec") not in (None, "none") and f.get("vcodec") in (None, "none")
+    ]
+    if not audio_formats:
+        return "bestaudio/best"
+    best = max(audio_formats, key=lambda f: (f.get("abr") or 0, f.get("filesize") or 0))
+    return best["format_id"]
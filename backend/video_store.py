@@ -0,0 +1,172 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, MutableMapping, Optional
+
+import numpy as np
+
+
+def _index_nbytes(index: Any) -> int:
+    try:
+        return int(index.sa_code_size()) * int(index.ntotal)
+    except Exception:
+        return int(index.d) * 4 * int(index.ntotal)
+
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """Approximate resident bytes of a stored value.
+
+    Understands the things video entries hold: FAISS vector stores (index
+    codes plus docstore text), TranscriptSegments, NumPy arrays, strings and
+    nested dicts/lists. Anything else falls back to `sys.getsizeof`.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v, seen) for v in value)
+    if hasattr(value, "nbytes") and callable(value.nbytes):
+        return int(value.nbytes())
+    if hasattr(value, "index") and hasattr(value, "docstore"):
+        docs = getattr(value.docstore, "_dict", {})
+        return _index_nbytes(value.index) + sum(
+            sys.getsizeof(doc.page_content) + estimate_size(doc.metadata, seen)
+            for doc in docs.values()
+        )
+    return sys.getsizeof(value)
+
+
+class MemoryBoundedStore(MutableMapping):
+    """Dict-like LRU store that evicts entries to stay under a byte budget.
+
+    Every entry's size is estimated on insert (and again on `account(key)`
+    after an entry is mutated in place). When the total goes over
+    `max_bytes` the least recently used entries are evicted; `on_evict`
+    gets a chance to spill them to a persistent tier first. With a
+    `loader`, a lookup miss asks it to page the entry back in.
+    The most recently inserted entry is never evicted, even if it alone is
+    over budget.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizer: Callable[[Any], int] = estimate_size,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        loader: Optional[Callable[[Hashable], Any]] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self.on_evict = on_evict
+        self.loader = loader
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.loads = 0
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = self.loader(key) if self.loader else None
+        if value is None:
+            raise KeyError(key)
+        with self._lock:
+            if key in self._data:
+                # Someone else paged it in while we were loading
+                return self._data[key]
+            self.loads += 1
+            self._insert(key, value)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._insert(key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._data[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[Hashable]:
+        # Snapshot the keys so callers may mutate the store while iterating
+        with self._lock:
+            keys = list(self._data)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _insert(self, key: Hashable, value: Any) -> None:
+        if key in self._data:
+            self._bytes -= self._sizes[key]
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._sizes[key] = self.sizer(value)
+        self._bytes += self._sizes[key]
+        self._enforce()
+
+    def _enforce(self) -> None:
+        while self._bytes > self.max_bytes and len(self._data) > 1:
+            key, value = self._data.popitem(last=False)
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+            if self.on_evict:
+                try:
+                    self.on_evict(key, value)
+                except Exception as e:
+                    print(f"Failed to spill {key} on eviction: {e}")
+
+    def account(self, key: Hashable) -> None:
+        """Re-measure an entry after it was mutated in place."""
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._sizes[key]
+                self._sizes[key] = self.sizer(self._data[key])
+                self._bytes += self._sizes[key]
+                self._enforce()
+
+    def discard(self, key: Hashable) -> None:
+        """Drop an entry from memory without loading it or spilling it."""
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+                self._bytes -= self._sizes.pop(key)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Memory-only lookup that neither loads nor changes recency."""
+        with self._lock:
+            return self._data.get(key, default)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "loads": self.loads,
+        }
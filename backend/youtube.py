@@ -0,0 +1,11 @@
+from urllib.parse import parse_qs, urlparse
+
+
+# Helper function to extract YouTube video ID (reused by the API and the sharding dispatcher)
+def get_video_id(url):
+    parsed_url = urlparse(url)
+    if parsed_url.hostname in ["www.youtube.com", "youtube.com"]:
+        return parse_qs(parsed_url.query).get("v", [None])[0]
+    elif parsed_url.hostname == "youtu.be":
+        return parsed_url.path[1:]
+    return None
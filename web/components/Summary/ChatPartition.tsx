@@ -8,15 +8,11 @@ import { AvatarFallback } from "@/components/ui/avatar";
 import { useSummaryContext } from "./SummaryProvider";
 import Markdown from 'react-markdown';
 import { ModeToggle } from '../theme/mode-toggle';
+import { readEventStream } from '@/lib/stream';
 
 
 const USE_API = true;
 
-// Define the interface for the API response
-interface ChatResponse {
-  answer: string;
-}
-
 // Define message type
 interface Message {
   role: 'user' | 'ai';
@@ -90,7 +86,8 @@ export default function ChatPartition() {
         // process.env.NEXT_PUBLIC_API_LINK should be typed in a global d.ts file
         // or handled by Next.js environment typing.
         // Assuming videoId is string at this point due to the check above.
-        const response = await fetch(`${process.env.NEXT_PUBLIC_API_LINK}/chat_with_video/`, {
+        // Streamed endpoint: the answer is rendered token by token as it is generated
+        const response = await fetch(`${process.env.NEXT_PUBLIC_API_LINK}/chat_with_video/stream`, {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
@@ -107,10 +104,19 @@ export default function ChatPartition() {
           throw new Error(`API request failed with status ${response.status}: ${errorBody}`);
         }
 
-        const data: ChatResponse = await response.json();
-
-        // Add AI response
-        setMessages(prev => [...prev, { role: 'ai', content: data.answer }]);
+        // Add the AI response on the first token, then keep replacing it
+        let started = false;
+        const showAnswer = (text: string) => {
+          const replace = started;
+          started = true;
+          setMessages(prev => [
+            ...(replace ? prev.slice(0, -1) : prev),
+            { role: 'ai', content: text }
+          ]);
+          setIsLoading(false);
+        };
+        const answer = await readEventStream(response, showAnswer);
+        showAnswer(answer);
       } catch (error: any) { // Explicitly type error as any or more specific
         // Handle API error
         setMessages(prev => [
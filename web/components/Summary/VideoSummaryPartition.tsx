@@ -15,6 +15,7 @@ import Link from "next/link";
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert"; // Import Alert components
 import pb from "@/lib/db/pocket_base.config";
 import { useRouter } from "next/navigation";
+import { readEventStream } from "@/lib/stream";
 
 const USE_API = true; // Keep your flag
 
@@ -110,7 +111,8 @@ export default function VideoSummaryPartition() {
     async function fetchSummary() {
       try {
         setProcessingStep("summarizing");
-        const response = await fetch(`${process.env.NEXT_PUBLIC_API_LINK}/summarize_video/`, {
+        // Streamed endpoint: the summary is rendered as it is generated
+        const response = await fetch(`${process.env.NEXT_PUBLIC_API_LINK}/summarize_video/stream`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ video_id: videoId }),
@@ -125,8 +127,11 @@ export default function VideoSummaryPartition() {
           throw new Error(errorDetail);
         }
 
-        const data = await response.json();
-        setSummary(data.summary);
+        const finalSummary = await readEventStream(response, (text) => {
+          setSummary(text);
+          setIsLoading(false);
+        });
+        setSummary(finalSummary);
 
       } catch (err) {
         console.error("Summarizing error:", err);
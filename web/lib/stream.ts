@@ -0,0 +1,48 @@
+// Reads a server-sent event stream from the backend's `/stream` endpoints.
+// Calls `onToken` with the text received so far after every token event and
+// resolves with the final text from the `done` event.
+export async function readEventStream(
+  response: Response,
+  onToken: (text: string) => void
+): Promise<string> {
+  if (!response.body) {
+    throw new Error("Streaming is not supported by this browser.");
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let text = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === "error") {
+        throw new Error(payload.detail || "Streaming failed");
+      }
+      if (event === "done") {
+        return payload.answer;
+      }
+      text += payload.token;
+      onToken(text);
+    }
+  }
+  return text;
+}